@@ -3,6 +3,16 @@ from frappe import _
 from .utils.invoice_ninja_client import InvoiceNinjaClient
 from .utils.field_mapper import FieldMapper
 from .utils.entity_mapper import EntityMapper
+from .utils.change_set import get_change_set, update_changed_fields
+from .utils.child_rows import sync_child_rows
+from .utils.dashboard_stats import (
+	conditional, get_recent_logs, get_stats, increment_counter
+)
+from .utils.deferred_submit import submit_or_defer
+from .utils.party_resolver import PartyResolver
+from .utils.sync_state import MAX_SYNC_ATTEMPTS, SyncStateStore
+from .utils.task_linker import mark_tasks_invoiced, upsert_inline_tasks
+from functools import wraps
 import json
 
 
@@ -52,6 +62,179 @@ def safe_get_with_sync_hash(doctype, filters, fields=None):
 		raise
 
 
+def get_existing_synced(doctype, invoice_ninja_id, sync_state=None):
+	"""
+	Existing ERPNext document of an Invoice Ninja record and its stored hash
+
+	Reads the compact sync state if given, and falls back to the document's
+	invoice_ninja_sync_hash for records synced before the state existed.
+
+	Returns:
+		dict: {"name", "invoice_ninja_sync_hash"}, or None
+	"""
+	existing = sync_state.get_existing(invoice_ninja_id) if sync_state else None
+	if existing:
+		return existing
+
+	return safe_get_with_sync_hash(
+		doctype,
+		{"invoice_ninja_id": invoice_ninja_id},
+		["name", "invoice_ninja_sync_hash"]
+	)
+
+
+def is_unchanged_since_last_sync(doctype, existing, new_hash, doc_data, invoice_ninja_id, sync_state=None):
+	"""
+	Check whether a synced record's mapped data is unchanged, recording its state if so
+
+	A hash stored by an older hash scheme that still matches the data is
+	rewritten with the current scheme instead of being reported as a change.
+
+	Args:
+		doctype: ERPNext doctype
+		existing: get_existing_synced() result
+		new_hash: Current-scheme hash of doc_data
+		doc_data: Mapped document data
+		invoice_ninja_id: Invoice Ninja ID
+		sync_state: Optional SyncStateStore of the page
+
+	Returns:
+		bool: True if the record did not change since the last sync
+	"""
+	from invoice_ninja_integration.utils.sync_hash import SyncHashManager
+
+	unchanged, needs_migration = SyncHashManager.compare(
+		existing.invoice_ninja_sync_hash, new_hash, doc_data, doctype
+	)
+	if not unchanged:
+		return False
+
+	if sync_state:
+		sync_state.record(invoice_ninja_id, document_name=existing.name, mapped_hash=new_hash)
+	elif needs_migration:
+		frappe.db.set_value(
+			doctype, existing.name, "invoice_ninja_sync_hash", new_hash, update_modified=False
+		)
+	return True
+
+
+def keeps_sync_state(entity_type):
+	"""
+	Keep the sync state of records synced outside a page sync current
+
+	Page syncs pass their SyncStateStore and flush it themselves. Webhooks and
+	single-record syncs pass none, so the decorated sync function is given a
+	one-record store that is flushed after the write. Without a company the
+	state cannot be keyed, so the record's state is dropped instead and
+	rebuilt by its next page sync.
+
+	Args:
+		entity_type: Doctype the decorated function syncs
+	"""
+	def decorator(sync_function):
+		@wraps(sync_function)
+		def wrapper(data, invoice_ninja_company=None, force_full_sync=False, sync_state=None, **kwargs):
+			if sync_state is not None:
+				return sync_function(
+					data, invoice_ninja_company=invoice_ninja_company, force_full_sync=force_full_sync,
+					sync_state=sync_state, **kwargs
+				)
+
+			if not invoice_ninja_company:
+				result = sync_function(
+					data, invoice_ninja_company=invoice_ninja_company, force_full_sync=force_full_sync,
+					**kwargs
+				)
+				if result in ("created", "updated"):
+					frappe.db.delete(
+						"Invoice Ninja Sync State",
+						{"entity_type": entity_type, "invoice_ninja_id": str(data.get("id"))}
+					)
+					frappe.db.commit()
+				return result
+
+			sync_state = SyncStateStore(invoice_ninja_company, entity_type)
+			sync_state.preload([data])
+			result = sync_function(
+				data, invoice_ninja_company=invoice_ninja_company, force_full_sync=force_full_sync,
+				sync_state=sync_state, **kwargs
+			)
+			if result in ("created", "updated", "unchanged"):
+				sync_state.record_synced(data)
+				sync_state.flush()
+				frappe.db.commit()
+			return result
+		return wrapper
+	return decorator
+
+
+def ensure_customer_synced(in_client_id, invoice_ninja_company=None):
+	"""
+	Resolve an Invoice Ninja client to an ERPNext Customer, fetching it on demand
+
+	Used when a dependent document (invoice, quote) references a customer that
+	has not been synced yet, so the document is not skipped until the next run.
+
+	Args:
+		in_client_id: Invoice Ninja client ID
+		invoice_ninja_company: Invoice Ninja Company doc name
+
+	Returns:
+		str: Customer name or None
+	"""
+	customer = FieldMapper.get_customer_by_invoice_ninja_id(in_client_id)
+	if customer or not in_client_id or not invoice_ninja_company:
+		return customer
+
+	client = InvoiceNinjaClient(invoice_ninja_company=invoice_ninja_company)
+	response = client.get_customer(in_client_id)
+	if not response or response.get("error") or not response.get("data"):
+		return None
+
+	sync_customer_from_invoice_ninja(response["data"], invoice_ninja_company=invoice_ninja_company)
+	return FieldMapper.get_customer_by_invoice_ninja_id(in_client_id)
+
+
+def ensure_invoices_synced(payment_data, invoice_ninja_company=None):
+	"""
+	Fetch and sync invoices referenced by a payment that are missing in ERPNext
+
+	Args:
+		payment_data: Invoice Ninja payment data (with paymentables)
+		invoice_ninja_company: Invoice Ninja Company doc name
+
+	Returns:
+		list: Invoice Ninja invoice IDs that were fetched on demand
+	"""
+	invoice_ids = {
+		str(p.get("invoice_id")) for p in payment_data.get("paymentables") or [] if p.get("invoice_id")
+	}
+	if not invoice_ids or not invoice_ninja_company:
+		return []
+
+	existing = set(frappe.get_all(
+		"Sales Invoice",
+		filters={"invoice_ninja_id": ["in", list(invoice_ids)]},
+		pluck="invoice_ninja_id"
+	))
+	missing = invoice_ids - existing
+	if not missing:
+		return []
+
+	client = InvoiceNinjaClient(invoice_ninja_company=invoice_ninja_company)
+	fetched = []
+	for invoice_id in missing:
+		response = client.get_invoice(invoice_id, include="client,line_items.task")
+		if not response or response.get("error") or not response.get("data"):
+			continue
+
+		result = sync_invoice_from_invoice_ninja(response["data"], invoice_ninja_company=invoice_ninja_company)
+		if result in ("created", "updated", "unchanged"):
+			fetched.append(invoice_id)
+
+	return fetched
+
+
 @frappe.whitelist()
 def test_connection():
 	"""Test Invoice Ninja API connection (deprecated - use test_invoice_ninja_company_connection)"""
@@ -172,118 +355,92 @@ def sync_from_invoice_ninja(doctype, limit=50):
 	}
 
 
-def sync_customer_from_invoice_ninja(customer_data, invoice_ninja_company=None, force_full_sync=False):
-	"""Create/update ERPNext customer from Invoice Ninja data - with incremental sync"""
+@keeps_sync_state("Customer")
+def sync_customer_from_invoice_ninja(customer_data, invoice_ninja_company=None, force_full_sync=False,
+									party_resolver=None, sync_state=None):
+	"""
+	Create/update ERPNext customer from Invoice Ninja data - with incremental sync
+
+	Args:
+		party_resolver: Optional PartyResolver loaded for the whole page; its queued
+			contact links are flushed by the caller
+		sync_state: Optional SyncStateStore of the page; hashes are recorded there
+			instead of on the Customer and flushed by the caller
+	"""
 	from invoice_ninja_integration.utils.sync_hash import SyncHashManager
 
 	customer_id = str(customer_data.get('id'))
 
 	# Check if customer already exists - with safe sync hash field handling
-	existing = safe_get_with_sync_hash(
-		"Customer",
-		{"invoice_ninja_id": customer_id},
-		["name", "invoice_ninja_sync_hash"]
-	)
+	existing = get_existing_synced("Customer", customer_id, sync_state)
 
 	customer_doc_data, address_data, shipping_address_data, contact_data_list = FieldMapper.map_customer_from_invoice_ninja(customer_data, invoice_ninja_company)
 	if not customer_doc_data:
 		return "skipped"
 
-	# Calculate hash of new data
+	# Calculate hash of new data, and of each field to compute the change set of later updates
 	new_hash = SyncHashManager.calculate_hash(customer_doc_data, "Customer")
+	field_hashes = SyncHashManager.calculate_field_hashes(customer_doc_data) if sync_state else None
 
 	if existing:
 		# Compare hashes (skip if unchanged unless force_full_sync)
-		if not force_full_sync and existing.invoice_ninja_sync_hash == new_hash:
+		if not force_full_sync and is_unchanged_since_last_sync(
+			"Customer", existing, new_hash, customer_doc_data, customer_id, sync_state
+		):
 			# No changes, skip update
 			return "unchanged"
 
-		# Data changed, update customer
-		doc = frappe.get_doc("Customer", existing.name)
-		for key, value in customer_doc_data.items():
-			if key != 'doctype' and hasattr(doc, key):
-				setattr(doc, key, value)
-		doc.save()
-
-		# Update hash
-		SyncHashManager.store_hash(doc, new_hash)
+		# Data changed, update only the changed fields (saving only if a validated field changed)
+		changed = None if force_full_sync else get_change_set(existing.get("field_hashes"), field_hashes)
+		doc = update_changed_fields("Customer", existing.name, customer_doc_data, changed)
+		customer_name = existing.name
 		sync_result = "updated"
 	else:
 		# Create new customer
 		doc = frappe.get_doc(customer_doc_data)
 		doc.insert()
+		customer_name = doc.name
+		sync_result = "created"
 
-		# Store initial hash
+	# Store hash
+	if sync_state:
+		sync_state.record(
+			customer_id, document_name=customer_name, mapped_hash=new_hash, field_hashes=field_hashes
+		)
+	else:
+		# Without sync state there is no change set, so the document was saved
 		SyncHashManager.store_hash(doc, new_hash)
-		sync_result = "created"
 
-	# Handle address if provided
+	# Match address and contacts against the page's preloaded candidates
+	resolver = party_resolver
+	if resolver is None:
+		resolver = PartyResolver()
+		resolver.load([customer_data])
+
 	if address_data:
-		address_data['links'] = [{"link_doctype": "Customer", "link_name": doc.name}]
-		existing_address = frappe.db.exists("Address", {"address_title": address_data.get('address_title')})
-
-		if existing_address:
-			addr_doc = frappe.get_doc("Address", existing_address)
-			for key, value in address_data.items():
-				if key not in ['doctype', 'links'] and hasattr(addr_doc, key):
-					setattr(addr_doc, key, value)
-			addr_doc.save()
-		else:
-			addr_doc = frappe.get_doc(address_data)
-			addr_doc.insert()
+		resolver.sync_address(address_data, customer_name)
 
-	# Handle contacts
 	if contact_data_list:
-		for contact_data in contact_data_list:
-			existing_contact_name = None
-
-			# 1. Check by Invoice Ninja ID
-			if contact_data.get("invoice_ninja_contact_id"):
-				existing_contact_name = frappe.db.get_value("Contact",
-					{"invoice_ninja_contact_id": contact_data["invoice_ninja_contact_id"]}, "name")
-
-			# 2. Check by Email
-			if not existing_contact_name and contact_data.get("email_id"):
-				existing_contact_name = frappe.db.get_value("Contact",
-					{"email_id": contact_data["email_id"]}, "name")
-
-			# 3. Check by Phone
-			if not existing_contact_name and contact_data.get("phone"):
-				existing_contact_name = frappe.db.get_value("Contact",
-					{"phone": contact_data["phone"]}, "name")
-
-			if existing_contact_name:
-				# Link existing contact
-				contact_doc = frappe.get_doc("Contact", existing_contact_name)
-
-				# Check for existing link
-				is_linked = False
-				for link in contact_doc.links:
-					if link.link_doctype == "Customer" and link.link_name == doc.name:
-						is_linked = True
-						break
-
-				if not is_linked:
-					contact_doc.append("links", {"link_doctype": "Customer", "link_name": doc.name})
-					contact_doc.save()
-
-				# Optionally update Invoice Ninja ID if matched by email/phone
-				if not contact_doc.get("invoice_ninja_contact_id") and contact_data.get("invoice_ninja_contact_id"):
-					contact_doc.db_set("invoice_ninja_contact_id", contact_data["invoice_ninja_contact_id"])
+		resolver.sync_contacts(contact_data_list, customer_name)
 
-			else:
-				# Create new contact
-				# Ensure link points to the correct doc.name
-				contact_data["links"] = [{"link_doctype": "Customer", "link_name": doc.name}]
-				new_contact = frappe.get_doc(contact_data)
-				new_contact.insert()
+	# A page-level resolver is flushed once by the caller
+	if party_resolver is None:
+		resolver.flush()
 
 	frappe.db.commit()
 	return sync_result
 
 
-def sync_invoice_from_invoice_ninja(invoice_data, invoice_ninja_company=None, force_full_sync=False):
-	"""Create/update ERPNext sales invoice from Invoice Ninja data - with currency validation and incremental sync"""
+@keeps_sync_state("Sales Invoice")
+def sync_invoice_from_invoice_ninja(invoice_data, invoice_ninja_company=None, force_full_sync=False,
+									sync_state=None):
+	"""
+	Create/update ERPNext sales invoice from Invoice Ninja data - with currency validation
+	and incremental sync
+
+	Args:
+		sync_state: Optional SyncStateStore of the page, flushed by the caller
+	"""
 	from invoice_ninja_integration.utils.sync_hash import SyncHashManager
 
 	invoice_id = str(invoice_data.get('id'))
@@ -330,11 +487,10 @@ def sync_invoice_from_invoice_ninja(invoice_data, invoice_ninja_company=None, fo
 		return "skipped"
 
 	# Check if invoice already exists
-	existing = safe_get_with_sync_hash(
-		"Sales Invoice",
-		{"invoice_ninja_id": invoice_id},
-		["name", "invoice_ninja_sync_hash"]
-	)
+	existing = get_existing_synced("Sales Invoice", invoice_id, sync_state)
+	# Fetch the customer on demand if it has not been synced yet
+	ensure_customer_synced(invoice_data.get("client_id"), invoice_ninja_company)
+
 	invoice_doc_data = FieldMapper.map_invoice_from_invoice_ninja(invoice_data, invoice_ninja_company)
 	if not invoice_doc_data:
 		return "skipped"
@@ -342,9 +498,18 @@ def sync_invoice_from_invoice_ninja(invoice_data, invoice_ninja_company=None, fo
 	# Calculate hash of new data
 	new_hash = SyncHashManager.calculate_hash(invoice_doc_data, "Sales Invoice")
 
+	# Task IDs from line items, stored in the invoice custom field by the same save
+	task_ids = [
+		item["invoice_ninja_task_id"]
+		for item in invoice_doc_data.get("items") or []
+		if item.get("invoice_ninja_task_id")
+	]
+
 	if existing:
 		# Compare hashes (skip if unchanged unless force_full_sync)
-		if not force_full_sync and existing.invoice_ninja_sync_hash == new_hash:
+		if not force_full_sync and is_unchanged_since_last_sync(
+			"Sales Invoice", existing, new_hash, invoice_doc_data, invoice_id, sync_state
+		):
 			# No changes, skip update
 			return "unchanged"
 
@@ -353,76 +518,56 @@ def sync_invoice_from_invoice_ninja(invoice_data, invoice_ninja_company=None, fo
 		for key, value in invoice_doc_data.items():
 			if key != 'doctype' and key != 'items' and hasattr(doc, key):
 				setattr(doc, key, value)
-		# Update items
+		# Update only the line items that changed
 		if 'items' in invoice_doc_data:
-			doc.items = []
-			for item in invoice_doc_data['items']:
-				doc.append('items', item)
-		doc.save(ignore_permissions=True)
+			sync_child_rows(doc, "items", invoice_doc_data["items"])
 
-		# Update hash
-		SyncHashManager.store_hash(doc, new_hash)
+		doc.invoice_ninja_sync_hash = new_hash
+		if task_ids or doc.get("invoice_ninja_tasks"):
+			doc.invoice_ninja_tasks = ", ".join(task_ids)
+		doc.save(ignore_permissions=True)
 		sync_result = "updated"
 	else:
 		# Create new invoice
+		invoice_doc_data["invoice_ninja_sync_hash"] = new_hash
+		if task_ids:
+			invoice_doc_data["invoice_ninja_tasks"] = ", ".join(task_ids)
 		doc = frappe.get_doc(invoice_doc_data)
 		doc.insert()
 
-		# Check if auto-submit is enabled
-		settings = frappe.get_single("Invoice Ninja Settings")
-		if settings.get("auto_submit_invoices"):
-			doc.submit()
-
-		# Store initial hash
-		SyncHashManager.store_hash(doc, new_hash)
+		# Submit inline, or queue for the submission worker (per settings)
+		submit_or_defer(doc)
 		sync_result = "created"
 
-	frappe.db.commit()
-
-	# After invoice is created, update related tasks
-	# Collect task IDs from line items
-	task_ids = []
-	for item in doc.items:
-		if hasattr(item, 'invoice_ninja_task_id') and item.invoice_ninja_task_id:
-			task_ids.append(item.invoice_ninja_task_id)
-
-	# Update tasks with invoice link
+	# Link the billed tasks to the invoice in one statement
 	if task_ids:
-		# Store task IDs in the invoice custom field
-		doc.invoice_ninja_tasks = ", ".join(task_ids)
-		doc.save(ignore_permissions=True)
-
-		# Find and update task records
-		tasks = frappe.get_all(
-			"Invoice Ninja Task",
-			filters={"task_id": ["in", task_ids]},
-			fields=["name"]
-		)
+		mark_tasks_invoiced(task_ids, doc.name)
 
-		for task in tasks:
-			task_doc = frappe.get_doc("Invoice Ninja Task", task.name)
-			task_doc.status = "Invoiced"
-			task_doc.is_invoiced = 1
-			task_doc.sales_invoice = doc.name  # Link to ERPNext invoice
-			task_doc.save(ignore_permissions=True)
-
-		frappe.db.commit()
+	if sync_state:
+		sync_state.record(invoice_id, document_name=doc.name, mapped_hash=new_hash)
 
+	frappe.db.commit()
 	return sync_result
 
 
-def sync_quotation_from_invoice_ninja(quote_data, invoice_ninja_company=None, force_full_sync=False):
-	"""Create/update ERPNext quotation from Invoice Ninja data - with incremental sync"""
+@keeps_sync_state("Quotation")
+def sync_quotation_from_invoice_ninja(quote_data, invoice_ninja_company=None, force_full_sync=False,
+									sync_state=None):
+	"""
+	Create/update ERPNext quotation from Invoice Ninja data - with incremental sync
+
+	Args:
+		sync_state: Optional SyncStateStore of the page, flushed by the caller
+	"""
 	from invoice_ninja_integration.utils.sync_hash import SyncHashManager
 
 	quote_id = str(quote_data.get('id'))
 
 	# Check if quotation already exists
-	existing = safe_get_with_sync_hash(
-		"Quotation",
-		{"invoice_ninja_id": quote_id},
-		["name", "invoice_ninja_sync_hash"]
-	)
+	existing = get_existing_synced("Quotation", quote_id, sync_state)
+
+	# Fetch the customer on demand if it has not been synced yet
+	ensure_customer_synced(quote_data.get("client_id"), invoice_ninja_company)
 
 	quotation_doc_data = FieldMapper.map_quotation_from_invoice_ninja(quote_data, invoice_ninja_company)
 	if not quotation_doc_data:
@@ -433,7 +578,9 @@ def sync_quotation_from_invoice_ninja(quote_data, invoice_ninja_company=None, fo
 
 	if existing:
 		# Compare hashes (skip if unchanged unless force_full_sync)
-		if not force_full_sync and existing.invoice_ninja_sync_hash == new_hash:
+		if not force_full_sync and is_unchanged_since_last_sync(
+			"Quotation", existing, new_hash, quotation_doc_data, quote_id, sync_state
+		):
 			# No changes, skip update
 			return "unchanged"
 
@@ -442,46 +589,46 @@ def sync_quotation_from_invoice_ninja(quote_data, invoice_ninja_company=None, fo
 		for key, value in quotation_doc_data.items():
 			if key != 'doctype' and key != 'items' and hasattr(doc, key):
 				setattr(doc, key, value)
-		# Update items
+		# Update only the line items that changed
 		if 'items' in quotation_doc_data:
-			doc.items = []
-			for item in quotation_doc_data['items']:
-				doc.append('items', item)
-		doc.save(ignore_permissions=True)
+			sync_child_rows(doc, "items", quotation_doc_data["items"])
 
-		# Update hash
-		SyncHashManager.store_hash(doc, new_hash)
+		doc.invoice_ninja_sync_hash = new_hash
+		doc.save(ignore_permissions=True)
 		sync_result = "updated"
 	else:
 		# Create new quotation
+		quotation_doc_data["invoice_ninja_sync_hash"] = new_hash
 		doc = frappe.get_doc(quotation_doc_data)
 		doc.insert()
 
-		# Check if auto-submit is enabled
-		settings = frappe.get_single("Invoice Ninja Settings")
-		if settings.get("auto_submit_quotations"):
-			doc.submit()
-
-		# Store initial hash
-		SyncHashManager.store_hash(doc, new_hash)
+		# Submit inline, or queue for the submission worker (per settings)
+		submit_or_defer(doc)
 		sync_result = "created"
 
+	if sync_state:
+		sync_state.record(quote_id, document_name=doc.name, mapped_hash=new_hash)
+
 	frappe.db.commit()
 	return sync_result
 
 
-def sync_item_from_invoice_ninja(product_data, invoice_ninja_company=None, force_full_sync=False):
-	"""Create/update Item from Invoice Ninja product - with incremental sync"""
+@keeps_sync_state("Item")
+def sync_item_from_invoice_ninja(product_data, invoice_ninja_company=None, force_full_sync=False,
+								sync_state=None):
+	"""
+	Create/update Item from Invoice Ninja product - with incremental sync
+
+	Args:
+		sync_state: Optional SyncStateStore of the page; hashes are recorded there
+			instead of on the Item and flushed by the caller
+	"""
 	from invoice_ninja_integration.utils.sync_hash import SyncHashManager
 
 	product_id = str(product_data.get('id'))
 
 	# Check if item exists by invoice_ninja_id
-	existing = safe_get_with_sync_hash(
-		"Item",
-		{"invoice_ninja_id": product_id},
-		["name", "invoice_ninja_sync_hash"]
-	)
+	existing = get_existing_synced("Item", product_id, sync_state)
 
 	if not existing:
 		# Also check by item_code for backwards compatibility
@@ -498,50 +645,68 @@ def sync_item_from_invoice_ninja(product_data, invoice_ninja_company=None, force
 	if not item_data:
 		return "skipped"
 
-	# Calculate hash of new data
+	# Calculate hash of new data, and of each field to compute the change set of later updates
 	new_hash = SyncHashManager.calculate_hash(item_data, "Item")
+	field_hashes = SyncHashManager.calculate_field_hashes(item_data) if sync_state else None
 
 	if existing:
 		# Compare hashes (skip if unchanged unless force_full_sync)
-		if not force_full_sync and existing.invoice_ninja_sync_hash == new_hash:
+		if not force_full_sync and is_unchanged_since_last_sync(
+			"Item", existing, new_hash, item_data, product_id, sync_state
+		):
 			# No changes, skip update
 			return "unchanged"
 
-		# UPDATE existing item
-		doc = frappe.get_doc("Item", existing.name)
-		for key, value in item_data.items():
-			if key != 'doctype' and hasattr(doc, key):
-				setattr(doc, key, value)
-		doc.save(ignore_permissions=True)
-
-		# Update hash
-		SyncHashManager.store_hash(doc, new_hash)
+		# UPDATE existing item, only the changed fields (saving only if a validated field changed)
+		changed = None if force_full_sync else get_change_set(existing.get("field_hashes"), field_hashes)
+		doc = update_changed_fields(
+			"Item", existing.name, item_data, changed, save_kwargs={"ignore_permissions": True}
+		)
+		item_name = existing.name
 		sync_result = "updated"
 	else:
 		# CREATE new item
 		doc = frappe.get_doc(item_data)
 		doc.insert(ignore_permissions=True)
+		item_name = doc.name
+		sync_result = "created"
 
-		# Store initial hash
+	# Store hash
+	if sync_state:
+		sync_state.record(
+			product_id, document_name=item_name, mapped_hash=new_hash, field_hashes=field_hashes
+		)
+	else:
+		# Without sync state there is no change set, so the document was saved
 		SyncHashManager.store_hash(doc, new_hash)
-		sync_result = "created"
 
 	frappe.db.commit()
 	return sync_result
 
 
-def sync_payment_from_invoice_ninja(payment_data, invoice_ninja_company=None, force_full_sync=False):
-	"""Create/update ERPNext payment entry from Invoice Ninja data - with incremental sync"""
+@keeps_sync_state("Payment Entry")
+def sync_payment_from_invoice_ninja(payment_data, invoice_ninja_company=None, force_full_sync=False,
+									sync_state=None):
+	"""
+	Create/update ERPNext payment entry from Invoice Ninja data - with incremental sync
+
+	Args:
+		sync_state: Optional SyncStateStore; the hash is recorded there instead of
+			on the Payment Entry and flushed by the caller
+	"""
 	from invoice_ninja_integration.utils.sync_hash import SyncHashManager
 
 	payment_id = str(payment_data.get('id'))
 
-	# Check if payment already exists
-	existing = safe_get_with_sync_hash(
-		"Payment Entry",
-		{"invoice_ninja_id": payment_id},
-		["name", "invoice_ninja_sync_hash"]
-	)
+	# Payment entries are never updated after creation (they're typically
+	# submitted/locked), so an existing payment is done before any mapping work
+	if (sync_state and sync_state.get_existing(payment_id)) or frappe.db.exists(
+		"Payment Entry", {"invoice_ninja_id": payment_id}
+	):
+		return "unchanged"
+
+	# Fetch referenced invoices on demand instead of dropping the payment
+	ensure_invoices_synced(payment_data, invoice_ninja_company)
 
 	payment_doc_data = FieldMapper.map_payment_from_invoice_ninja(payment_data, invoice_ninja_company)
 	if not payment_doc_data:
@@ -550,31 +715,21 @@ def sync_payment_from_invoice_ninja(payment_data, invoice_ninja_company=None, fo
 	# Calculate hash of new data
 	new_hash = SyncHashManager.calculate_hash(payment_doc_data, "Payment Entry")
 
-	if existing:
-		# Compare hashes (skip if unchanged unless force_full_sync)
-		if not force_full_sync and existing.invoice_ninja_sync_hash == new_hash:
-			# No changes, skip update
-			return "unchanged"
+	# Create new payment entry
+	doc = frappe.get_doc(payment_doc_data)
+	doc.insert()
 
-		# For payment entries, we generally don't update after creation
-		# (they're typically submitted/locked), but we'll mark as unchanged
-		return "unchanged"
-	else:
-		# Create new payment entry
-		doc = frappe.get_doc(payment_doc_data)
-		doc.insert()
-
-		# Check if auto-submit is enabled
-		settings = frappe.get_single("Invoice Ninja Settings")
-		if settings.get("auto_submit_payments"):
-			doc.submit()
+	# Submit inline, or queue for the submission worker (per settings)
+	submit_or_defer(doc)
 
-		# Store initial hash
+	# Store initial hash
+	if sync_state:
+		sync_state.record(payment_id, document_name=doc.name, mapped_hash=new_hash)
+	else:
 		SyncHashManager.store_hash(doc, new_hash)
-		sync_result = "created"
 
-		frappe.db.commit()
-		return sync_result
+	frappe.db.commit()
+	return "created"
 
 
 @frappe.whitelist()
@@ -907,135 +1062,111 @@ def _sync_payments_for_paid_invoices(invoice_ninja_company, limit=100):
 
 
 # Company-Specific Sync API Methods
-@frappe.whitelist()
-def sync_company_entities(invoice_ninja_company, entity_type, limit=100, force_full_sync=False):
+# Map entity types to their sync functions
+ENTITY_SYNC_FUNCTIONS = {
+	"Customer": "sync_customer_from_invoice_ninja",
+	"Sales Invoice": "sync_invoice_from_invoice_ninja",
+	"Quotation": "sync_quotation_from_invoice_ninja",
+	"Item": "sync_item_from_invoice_ninja",
+	"Payment Entry": "sync_payment_from_invoice_ninja"
+}
+
+
+def sync_entity_batch(entities, entity_type, invoice_ninja_company, force_sync, sync_stats, skipped_details,
+					synced_ids=None, failed_ids=None):
 	"""
-	Sync specific entity type for a single Invoice Ninja Company with incremental sync
+	Create/update ERPNext docs for a batch of fetched Invoice Ninja entities
 
 	Args:
-		invoice_ninja_company: Name of Invoice Ninja Company doc
+		entities: Invoice Ninja entity dicts
 		entity_type: Customer, Sales Invoice, Quotation, Item, Payment Entry
-		limit: Number of records to sync
-		force_full_sync: If True, re-sync all records regardless of changes (default: False)
+		invoice_ninja_company: Name of Invoice Ninja Company doc
+		force_sync: Re-sync records even if their hash is unchanged
+		sync_stats: Statistics dict updated in place
+		skipped_details: List that skipped invoice details are appended to
+		synced_ids: Optional list that IDs of created, updated and unchanged records are appended to
+		failed_ids: Optional list that IDs of records that failed to sync are appended to, unless
+			they failed MAX_SYNC_ATTEMPTS times in a row (see the Failed Attempts of their sync state)
 
 	Returns:
-		{success, message, synced_count, failed_count, statistics, skipped_details}
+		tuple: (synced_count, failed_count)
 	"""
-	from .utils.sync_manager import SyncManager
-	from datetime import datetime
-
-	start_time = datetime.now()
-
-	# try:
-	# Validate company
-	company_doc = frappe.get_doc("Invoice Ninja Company", invoice_ninja_company)
-	if not company_doc.enabled:
-		return {"success": False, "message": "Company is disabled"}
-
-	# Get company mapping
-	sync_manager = SyncManager()
-	mapping = sync_manager.company_mapper.get_company_mapping(
-		invoice_ninja_company_id=company_doc.name
-	)
-
-	if not mapping:
-		return {"success": False, "message": "No company mapping found for this Invoice Ninja Company"}
+	from .invoice_ninja_integration.doctype.invoice_ninja_sync_logs.invoice_ninja_sync_logs import InvoiceNinjaSyncLogs
+	from .utils.tombstones import apply_remote_states, get_remote_state
 
-	# Perform sync with pagination (fetch from Invoice Ninja)
-	all_entities = []
-	current_page = 1
-	per_page = min(int(limit), 100)  # Max 100 per page for API limits
-	total_to_fetch = int(limit)
-
-	while len(all_entities) < total_to_fetch:
-		result = sync_manager.fetch_entities_for_company(
-			entity_type,
-			invoice_ninja_company_id=company_doc.name,
-			page=current_page,
-			per_page=per_page
-		)
-
-		# Check for errors
-		if not result.get("success"):
-			error_message = result.get("message", "Unknown error")
-			frappe.log_error(
-				f"Failed to fetch {entity_type} page {current_page}: {error_message}",
-				"Entity Sync Error"
-			)
-			# If first page fails, return error; otherwise continue with what we have
-			if current_page == 1:
-				return {
-					"success": False,
-					"message": error_message,
-					"error_details": result.get("error_details")
-				}
-			break
-
-		entities = result.get("entities", [])
-
-		# No more entities to fetch
-		if not entities:
-			break
-
-		all_entities.extend(entities)
-
-		# Check if we've fetched enough or if this was the last page
-		if len(entities) < per_page or len(all_entities) >= total_to_fetch:
-			break
-
-		current_page += 1
-
-	# Trim to limit if we fetched more
-	all_entities = all_entities[:total_to_fetch]
-
-	# Process fetched entities and create/update ERPNext docs
+	sync_function = globals()[ENTITY_SYNC_FUNCTIONS[entity_type]]
 	synced_count = 0
 	failed_count = 0
+	created_count = 0
 
-	if all_entities:
-		entities = all_entities
-
-		# Map entity types to their sync functions
-		sync_function_map = {
-			"Customer": sync_customer_from_invoice_ninja,
-			"Sales Invoice": sync_invoice_from_invoice_ninja,
-			"Quotation": sync_quotation_from_invoice_ninja,
-			"Item": sync_item_from_invoice_ninja,
-			"Payment Entry": sync_payment_from_invoice_ninja
-		}
-
-		sync_function = sync_function_map.get(entity_type)
-
-		if not sync_function:
-			return {
-				"success": False,
-				"message": f"No sync function found for entity type: {entity_type}"
-			}
-
-	# Track sync statistics
-	sync_stats = {
-		"new_records": 0,
-		"updated_records": 0,
-		"unchanged_records": 0,
-		"skipped_records": 0,
-		"failed_records": 0
+	# Sync state of the page in one query; records whose payload did not change are not mapped at all
+	sync_state = SyncStateStore(invoice_ninja_company, entity_type)
+	sync_state.preload(entities)
+	unchanged_ids = set() if force_sync else {
+		str(e.get("id")) for e in entities if sync_state.is_unchanged(e)
 	}
+	pending_entities = [
+		e for e in entities
+		if get_remote_state(e) != "deleted" and str(e.get("id")) not in unchanged_ids
+	]
+
+	# Resolve the Items of every line item on the page in one query, creating the missing ones,
+	# and upsert the page's inline tasks in one batch
+	if entity_type in ("Sales Invoice", "Quotation"):
+		page_line_items = [
+			line_item
+			for entity in pending_entities
+			for line_item in entity.get("line_items") or []
+		]
+		try:
+			FieldMapper.prepare_line_items(page_line_items, invoice_ninja_company)
+			if entity_type == "Sales Invoice":
+				upsert_inline_tasks(page_line_items, invoice_ninja_company)
+		except Exception as e:
+			# Each document resolves its own line items (and reports its own errors) instead
+			frappe.db.rollback()
+			frappe.log_error(
+				f"Failed to prepare line items for {entity_type} page: {e!s}", "Item Mapping Error"
+			)
 
-	skipped_details = []  # Track skipped invoices for currency mapping issues
+	# Contacts and addresses of a customer page are matched against candidates loaded once
+	sync_kwargs = {"sync_state": sync_state}
+	if entity_type == "Customer":
+		sync_kwargs["party_resolver"] = PartyResolver()
+		sync_kwargs["party_resolver"].load(pending_entities)
 
-	# Convert force_full_sync to boolean
-	force_sync = bool(int(force_full_sync)) if isinstance(force_full_sync, (str, int)) else force_full_sync
+	# Payments are ingested page-at-a-time: existing IDs filtered first, lookups loaded once
+	page_results = None
+	if entity_type == "Payment Entry":
+		from .utils.payment_ingest import PaymentIngestor
+
+		page_results = PaymentIngestor(invoice_ninja_company, sync_state=sync_state).ingest(pending_entities)
 
 	# Process each entity
 	for entity in entities:
+		# Deleted records are tombstoned below, never created or updated
+		if get_remote_state(entity) == "deleted":
+			continue
+
 		try:
-			# Call the appropriate sync function to create/update ERPNext doc
-			result = sync_function(entity, invoice_ninja_company=invoice_ninja_company, force_full_sync=force_sync)
+			if str(entity.get("id")) in unchanged_ids:
+				result = "unchanged"
+			elif page_results is not None:
+				result = page_results.get(str(entity.get("id")), "skipped")
+				if isinstance(result, Exception):
+					raise result
+			else:
+				# Call the appropriate sync function to create/update ERPNext doc
+				result = sync_function(
+					entity, invoice_ninja_company=invoice_ninja_company, force_full_sync=force_sync,
+					**sync_kwargs
+				)
 
 			# Track statistics based on result
 			if result == "created":
 				sync_stats["new_records"] += 1
 				synced_count += 1
+				created_count += 1
 			elif result == "updated":
 				sync_stats["updated_records"] += 1
 				synced_count += 1
@@ -1053,9 +1184,14 @@ def sync_company_entities(invoice_ninja_company, entity_type, limit=100, force_f
 						"reason": "Missing currency mapping"
 					})
 
+			if synced_ids is not None and result in ["created", "updated", "unchanged"]:
+				synced_ids.append(str(entity.get("id")))
+
+			if result in ["created", "updated", "unchanged"] and str(entity.get("id")) not in unchanged_ids:
+				sync_state.record_synced(entity)
+
 			# Create success/info log for created and updated records
 			if result in ["created", "updated"]:
-				from .invoice_ninja_integration.doctype.invoice_ninja_sync_logs.invoice_ninja_sync_logs import InvoiceNinjaSyncLogs
 				InvoiceNinjaSyncLogs.create_log(
 					sync_type="Manual",
 					sync_direction="Invoice Ninja to ERPNext",
@@ -1071,13 +1207,17 @@ def sync_company_entities(invoice_ninja_company, entity_type, limit=100, force_f
 		except Exception as e:
 			sync_stats["failed_records"] += 1
 			failed_count += 1
+			# A record that keeps failing stops holding back the watermark; it keeps its failed
+			# attempts in the sync state and is retried on its next change or reconciliation
+			failed_attempts = sync_state.record_failure(entity.get("id"))
+			if failed_ids is not None and failed_attempts < MAX_SYNC_ATTEMPTS:
+				failed_ids.append(str(entity.get("id")))
 			frappe.log_error(
 				f"Failed to sync {entity_type} {entity.get('id')}: {str(e)}",
 				"Entity Sync Error"
 			)
 
 			# Create failure log
-			from .invoice_ninja_integration.doctype.invoice_ninja_sync_logs.invoice_ninja_sync_logs import InvoiceNinjaSyncLogs
 			InvoiceNinjaSyncLogs.create_log(
 				sync_type="Manual",
 				sync_direction="Invoice Ninja to ERPNext",
@@ -1091,28 +1231,157 @@ def sync_company_entities(invoice_ninja_company, entity_type, limit=100, force_f
 				error_details=str(e)
 			)
 
+	# Write the contact links and contact IDs queued by the page's customers in one batch
+	if "party_resolver" in sync_kwargs:
+		sync_kwargs["party_resolver"].flush()
+
+	# Write the page's sync state in one upsert
+	sync_state.flush()
 	frappe.db.commit()
 
-	duration = (datetime.now() - start_time).total_seconds()
+	# Keep the dashboard totals current without recounting
+	increment_counter(entity_type, created_count)
 
-	# Update company sync stats with actual synced count
-	if synced_count > 0:
-		update_company_sync_stats(
-			invoice_ninja_company,
-			entity_type,
-			synced_count,
-			"Success" if failed_count == 0 else "Partial",
-			duration
+	# Propagate archive/delete state of the whole batch in one statement
+	state_counts = apply_remote_states(entity_type, entities, invoice_ninja_company)
+	sync_stats["archived_records"] = sync_stats.get("archived_records", 0) + state_counts["archived"]
+	sync_stats["deleted_records"] = sync_stats.get("deleted_records", 0) + state_counts["deleted"]
+
+	return synced_count, failed_count
+
+
+@frappe.whitelist()
+def sync_company_entities(invoice_ninja_company, entity_type, limit=100, force_full_sync=False,
+						updated_since=None, time_budget=None, progress_id=None):
+	"""
+	Sync specific entity type for a single Invoice Ninja Company with incremental sync
+
+	Args:
+		invoice_ninja_company: Name of Invoice Ninja Company doc
+		entity_type: Customer, Sales Invoice, Quotation, Item, Payment Entry
+		limit: Number of records to sync
+		force_full_sync: If True, re-sync all records regardless of changes (default: False)
+		updated_since: Only sync records updated at or after this Unix timestamp, oldest first;
+			the result's watermark stops before the oldest record that failed to sync
+		time_budget: Stop after this many seconds; the result's watermark tells where to resume
+		progress_id: Publish realtime progress to the subscribers of this sync run ID
+
+	Returns:
+		{success, message, synced_count, failed_count, statistics, skipped_details}
+	"""
+	from .utils.company_stats import CompanySyncStats
+	from .utils.sync_manager import SyncManager
+	from .utils.sync_pipeline import SyncPipeline
+	from .utils.sync_progress import SyncProgress
+	from .utils.tombstones import DELTA_FILTERS
+
+	# try:
+	# Validate company
+	company_doc = frappe.get_doc("Invoice Ninja Company", invoice_ninja_company)
+	if not company_doc.enabled:
+		return {"success": False, "message": "Company is disabled"}
+
+	# Get company mapping
+	sync_manager = SyncManager()
+	mapping = sync_manager.company_mapper.get_company_mapping(
+		invoice_ninja_company_id=company_doc.name
+	)
+
+	if not mapping:
+		return {"success": False, "message": "No company mapping found for this Invoice Ninja Company"}
+
+	if not sync_manager.settings.enabled:
+		return {"success": False, "message": "Invoice Ninja integration is not enabled"}
+
+	if entity_type not in ENTITY_SYNC_FUNCTIONS:
+		return {
+			"success": False,
+			"message": f"No sync function found for entity type: {entity_type}"
+		}
+
+	client, _ = sync_manager.get_client_for_mapping(mapping)
+
+	# Track sync statistics
+	sync_stats = {
+		"new_records": 0,
+		"updated_records": 0,
+		"unchanged_records": 0,
+		"skipped_records": 0,
+		"failed_records": 0,
+		"archived_records": 0,
+		"deleted_records": 0
+	}
+
+	skipped_details = []  # Track skipped invoices for currency mapping issues
+
+	# Convert force_full_sync to boolean
+	force_sync = bool(int(force_full_sync)) if isinstance(force_full_sync, (str, int)) else force_full_sync
+
+	synced_count = failed_count = 0
+	watermark = None
+	# updated_at of the oldest record that failed to sync
+	oldest_failed = None
+	progress = SyncProgress(progress_id, invoice_ninja_company, entity_type) if progress_id else None
+	# Company counters of this run, written once at the end
+	company_stats = CompanySyncStats(invoice_ninja_company)
+
+	def write_page(entities):
+		nonlocal synced_count, failed_count, watermark, oldest_failed
+		failed_ids = []
+		synced, failed = sync_entity_batch(
+			entities, entity_type, invoice_ninja_company, force_sync, sync_stats, skipped_details,
+			failed_ids=failed_ids,
 		)
-	else:
-		update_company_sync_stats(
-			invoice_ninja_company,
-			entity_type,
-			0,
-			"Failed",
-			duration
+		synced_count += synced
+		company_stats.add(entity_type, synced)
+		failed_count += failed
+		frappe.db.commit()
+		watermark = max([watermark or 0] + [e.get("updated_at") or 0 for e in entities])
+
+		failed_ids = set(failed_ids)
+		for e in entities:
+			if str(e.get("id")) in failed_ids:
+				updated_at = e.get("updated_at") or 0
+				oldest_failed = updated_at if oldest_failed is None else min(oldest_failed, updated_at)
+
+		if progress:
+			progress.total = pipeline.expected_records()
+			progress.page_done(len(entities), sync_stats)
+
+	params = dict(DELTA_FILTERS)
+	if updated_since is not None:
+		# Oldest first, so an interrupted delta can resume from the last written record
+		params.update({"updated_at": int(updated_since), "sort": "updated_at|asc"})
+
+	# Fetch pages concurrently while earlier pages are mapped and written
+	pipeline = SyncPipeline(
+		client, entity_type, per_page=limit, max_records=limit, params=params, time_budget=time_budget
+	)
+	total_fetched = pipeline.run(write_page)
+
+	for error in pipeline.errors:
+		frappe.log_error(
+			f"Failed to fetch {entity_type} page {error['page']}: {error['message']}",
+			"Entity Sync Error"
 		)
 
+	# If the first page fails there is nothing to sync; otherwise continue with what we have
+	if not total_fetched and any(e["page"] == 1 for e in pipeline.errors):
+		if progress:
+			progress.finish(sync_stats, "Failed")
+		return {"success": False, "message": pipeline.errors[0]["message"]}
+
+	# Update company sync stats; a sync that only found unchanged records succeeded
+	if failed_count == 0:
+		company_stats.add(entity_type, 0, "Success")
+	else:
+		company_stats.add(entity_type, 0, "Partial" if synced_count > 0 else "Failed")
+	company_stats.flush()
+
+	# Records that failed are fetched again by the next delta sync, up to MAX_SYNC_ATTEMPTS times
+	if oldest_failed is not None and watermark is not None:
+		watermark = max(min(watermark, oldest_failed - 1), int(updated_since or 0))
+
 	# Build message with statistics
 	msg = f"✓ {sync_stats['new_records']} new, {sync_stats['updated_records']} updated, " \
 	      f"○ {sync_stats['unchanged_records']} unchanged"
@@ -1120,15 +1389,23 @@ def sync_company_entities(invoice_ninja_company, entity_type, limit=100, force_f
 		msg += f", ⚠ {sync_stats['skipped_records']} skipped"
 	if sync_stats['failed_records'] > 0:
 		msg += f", ✗ {sync_stats['failed_records']} failed"
+	if sync_stats['archived_records'] or sync_stats['deleted_records']:
+		msg += f", {sync_stats['archived_records']} archived, {sync_stats['deleted_records']} deleted"
+
+	if progress:
+		progress.finish(sync_stats, "Completed" if failed_count == 0 else "Partial")
 
 	return {
-		"success": synced_count > 0 or len(all_entities) == 0,
+		"success": synced_count > 0 or failed_count == 0,
 		"message": msg,
 		"synced_count": synced_count,
 		"failed_count": failed_count,
-		"total_fetched": len(all_entities),
-		"pages_fetched": current_page,
+		"total_fetched": total_fetched,
+		"pages_fetched": pipeline.pages_fetched,
+		"complete": not pipeline.exhausted and not pipeline.errors and total_fetched < int(limit),
+		"watermark": watermark,
 		"statistics": sync_stats,
+		"pipeline_metrics": pipeline.metrics(),
 		"skipped_details": skipped_details if skipped_details else None
 	}
 
@@ -1150,9 +1427,61 @@ def sync_company_entities(invoice_ninja_company, entity_type, limit=100, force_f
 	# 	}
 
 
+@frappe.whitelist()
+def start_backfill(invoice_ninja_company, entity_type, max_records=0, per_page=100, force_full_sync=0):
+	"""
+	Start a resumable, checkpointed backfill for one entity type
+
+	The backfill runs as a chain of time-budgeted jobs tracked by an
+	Invoice Ninja Sync Run record (see its controller for details).
+
+	Args:
+		invoice_ninja_company: Name of Invoice Ninja Company doc
+		entity_type: Customer, Sales Invoice, Quotation, Item, Payment Entry
+		max_records: Stop after this many records (0 = all)
+		per_page: Records per API page
+		force_full_sync: Re-sync records even if unchanged
+
+	Returns:
+		{success, message, sync_run}
+	"""
+	if entity_type not in ENTITY_SYNC_FUNCTIONS:
+		return {"success": False, "message": f"Invalid entity type: {entity_type}"}
+
+	if not frappe.db.get_value("Invoice Ninja Company", invoice_ninja_company, "enabled"):
+		return {"success": False, "message": "Company is disabled"}
+
+	sync_run = frappe.get_doc({
+		"doctype": "Invoice Ninja Sync Run",
+		"invoice_ninja_company": invoice_ninja_company,
+		"entity_type": entity_type,
+		"max_records": int(max_records or 0),
+		"per_page": int(per_page or 100),
+		"force_full_sync": int(force_full_sync or 0)
+	}).insert(ignore_permissions=True)
+	frappe.db.commit()
+
+	return {
+		"success": True,
+		"message": f"Backfill of {entity_type} started",
+		"sync_run": sync_run.name
+	}
+
+
 @frappe.whitelist()
 def sync_company_all_entities(invoice_ninja_company, entity_types=None, limit=100):
-	"""Sync multiple entity types for a single company"""
+	"""
+	Sync multiple entity types for a single company
+
+	Entity types are scheduled as a dependency graph of background jobs:
+	independent types run concurrently, dependent types start once their
+	prerequisites have finished (see utils/sync_scheduler.py).
+
+	Returns:
+		{success, message, run_id, entity_types}
+	"""
+	from .utils.sync_scheduler import SyncScheduler
+
 	if not entity_types:
 		entity_types = EntityMapper.get_all_erpnext_doctypes()
 
@@ -1160,97 +1489,147 @@ def sync_company_all_entities(invoice_ninja_company, entity_types=None, limit=10
 		import json
 		entity_types = json.loads(entity_types)
 
-	results = {}
-	total_synced = 0
-	total_failed = 0
+	# Tasks are synced inline with invoices and through their own endpoint
+	entity_types = [e for e in entity_types if e != "Invoice Ninja Task"]
 
-	for entity_type in entity_types:
-		result = sync_company_entities(invoice_ninja_company, entity_type, limit)
-		results[entity_type] = result
-		if result.get("success"):
-			total_synced += result.get("total_fetched", 0)
-		else:
-			total_failed += 1
+	run_id = SyncScheduler.start(invoice_ninja_company, entity_types, limit=limit, priority="interactive")
 
 	return {
-		"success": total_failed == 0,
-		"message": f"Synced {total_synced} records across {len(entity_types)} entity types",
-		"total_synced": total_synced,
-		"total_failed": total_failed,
-		"details": results
+		"success": True,
+		"message": f"Sync started for {len(entity_types)} entity types",
+		"run_id": run_id,
+		"entity_types": entity_types
 	}
 
 
+@frappe.whitelist()
+def get_sync_run_status(run_id):
+	"""Get progress of a dependency-ordered sync run"""
+	from .utils.sync_scheduler import SyncScheduler
+
+	status = SyncScheduler.get_run_status(run_id)
+	if not status:
+		return {"success": False, "message": f"Sync run {run_id} not found or expired"}
+
+	return {"success": True, **status}
+
+
+@frappe.whitelist()
+def subscribe_sync_progress(run_id):
+	"""
+	Realtime channel and latest progress of a sync run
+
+	The client subscribes to the task room of the run (frappe.realtime.task_subscribe)
+	and listens to the returned event; the latest progress lets it render the current
+	state before the next event arrives.
+
+	Args:
+		run_id: Sync run ID (scheduler run ID or Invoice Ninja Sync Run name)
+
+	Returns:
+		{success, event, task_id, progress}
+	"""
+	from .utils.sync_progress import PROGRESS_EVENT, get_latest_progress
+
+	return {
+		"success": True,
+		"event": PROGRESS_EVENT,
+		"task_id": run_id,
+		"progress": get_latest_progress(run_id),
+	}
+
+
+@frappe.whitelist()
+def start_reconciliation(invoice_ninja_company, entity_type, resync=1, max_resync=0):
+	"""
+	Start a digest-based reconciliation of one entity type in the background
+
+	Args:
+		invoice_ninja_company: Name of Invoice Ninja Company doc
+		entity_type: Customer, Sales Invoice, Quotation, Item, Payment Entry
+		resync: Re-sync missing and stale records
+		max_resync: Maximum records to re-sync (0 = all)
+
+	Returns:
+		{success, message}
+	"""
+	from .utils.job_queues import enqueue_job
+	from .utils.sync_scheduler import NODE_TIMEOUT
+
+	if entity_type not in ENTITY_SYNC_FUNCTIONS:
+		return {"success": False, "message": f"Invalid entity type: {entity_type}"}
+
+	enqueue_job(
+		"invoice_ninja_integration.utils.reconciliation.run_reconciliation",
+		"bulk",
+		timeout=NODE_TIMEOUT,
+		job_id=f"invoice_ninja_reconciliation::{invoice_ninja_company}::{entity_type}",
+		invoice_ninja_company=invoice_ninja_company,
+		entity_type=entity_type,
+		resync=bool(int(resync)),
+		max_resync=int(max_resync) or None
+	)
+
+	return {"success": True, "message": f"Reconciliation of {entity_type} started"}
+
+
+@frappe.whitelist()
+def get_reconciliation_report(invoice_ninja_company, entity_type):
+	"""Get the last reconciliation report (missing, extra and stale counts)"""
+	from .utils.reconciliation import get_reconciliation_report as get_report
+
+	report = get_report(invoice_ninja_company, entity_type)
+	if not report:
+		return {"success": False, "message": f"No recent reconciliation of {entity_type} found"}
+
+	return report
+
+
 @frappe.whitelist()
 def get_company_sync_statistics(invoice_ninja_company, days=7):
 	"""Get sync statistics for a specific company"""
 	from frappe.utils import add_days, now_datetime
 
+	from .utils.sync_rollup import get_totals
+
 	start_date = add_days(now_datetime(), -int(days))
 
-	# Get sync logs for this company
-	logs = frappe.get_all(
-		"Invoice Ninja Sync Logs",
-		filters={
-			"invoice_ninja_company": invoice_ninja_company,
-			"sync_timestamp": [">=", start_date]
-		},
-		fields=["status", "duration", "record_type"]
-	)
+	# Hourly rollup rows of this company, grouped by entity type and status
+	totals = get_totals(start_date, invoice_ninja_company=invoice_ninja_company)
+
+	total_records = sum(int(row.sync_count or 0) for row in totals)
+	total_duration = sum(row.total_duration or 0 for row in totals)
 
 	stats = {
-		"successful_syncs": len([l for l in logs if l.status == "Success"]),
-		"failed_syncs": len([l for l in logs if l.status == "Failed"]),
-		"total_records": len(logs),
-		"avg_duration": round(sum([l.duration or 0 for l in logs]) / len(logs) if logs else 0, 2),
+		"successful_syncs": sum(int(row.sync_count or 0) for row in totals if row.status == "Success"),
+		"failed_syncs": sum(int(row.sync_count or 0) for row in totals if row.status == "Failed"),
+		"total_records": total_records,
+		"avg_duration": round(total_duration / total_records if total_records else 0, 2),
 		"by_entity": {}
 	}
 
 	# Group by entity type
-	for log in logs:
-		entity = log.record_type
+	for row in totals:
+		entity = row.entity_type
 		if entity not in stats["by_entity"]:
 			stats["by_entity"][entity] = {"success": 0, "failed": 0}
 
-		if log.status == "Success":
-			stats["by_entity"][entity]["success"] += 1
-		elif log.status == "Failed":
-			stats["by_entity"][entity]["failed"] += 1
+		if row.status == "Success":
+			stats["by_entity"][entity]["success"] += int(row.sync_count or 0)
+		elif row.status == "Failed":
+			stats["by_entity"][entity]["failed"] += int(row.sync_count or 0)
 
 	return stats
 
 
 def update_company_sync_stats(invoice_ninja_company, entity_type, count, status, duration):
-	"""Update sync statistics on Invoice Ninja Company doc"""
-	try:
-		company_doc = frappe.get_doc("Invoice Ninja Company", invoice_ninja_company)
-
-		# Update last sync info
-		company_doc.last_sync_time = frappe.utils.now()
-		company_doc.last_sync_status = status
-
-		# Update entity-specific counters
-		entity_field_map = {
-			"Customer": "customers_synced",
-			"Sales Invoice": "invoices_synced",
-			"Quotation": "quotations_synced",
-			"Item": "items_synced",
-			"Payment Entry": "payments_synced"
-		}
-
-		if entity_type in entity_field_map:
-			field = entity_field_map[entity_type]
-			current = company_doc.get(field) or 0
-			company_doc.set(field, current + count)
+	"""Update sync statistics on Invoice Ninja Company doc with atomic counter increments"""
+	from .utils.company_stats import CompanySyncStats
 
-		# Update total
-		company_doc.total_synced_records = (company_doc.total_synced_records or 0) + count
-
-		# Update failed count if applicable
-		if status == "Failed":
-			company_doc.failed_syncs_count = (company_doc.failed_syncs_count or 0) + 1
-
-		company_doc.save(ignore_permissions=True)
+	try:
+		company_stats = CompanySyncStats(invoice_ninja_company)
+		company_stats.add(entity_type, count, status)
+		company_stats.flush()
 		frappe.db.commit()
 
 	except Exception as e:
@@ -1284,47 +1663,9 @@ def get_configuration():
 
 @frappe.whitelist()
 def get_dashboard_stats():
-	"""Get dashboard statistics"""
+	"""Get dashboard statistics (cached and shared across pollers)"""
 	try:
-		# Count synced invoices
-		total_invoices = frappe.db.count("Sales Invoice", {
-			"invoice_ninja_id": ["!=", ""]
-		})
-
-		# Count synced customers
-		total_clients = frappe.db.count("Customer", {
-			"invoice_ninja_id": ["!=", ""]
-		})
-
-		# Count pending payments (unpaid invoices)
-		pending_payments = frappe.db.count("Sales Invoice", {
-			"invoice_ninja_id": ["!=", ""],
-			"status": ["in", ["Draft", "Unpaid", "Partially Paid"]]
-		})
-
-		# Count overdue invoices
-		overdue_invoices = frappe.db.count("Sales Invoice", {
-			"invoice_ninja_id": ["!=", ""],
-			"status": ["in", ["Unpaid", "Partially Paid"]],
-			"due_date": ["<", frappe.utils.today()]
-		})
-
-		# Get last sync time
-		last_sync_log = frappe.db.get_value(
-			"Invoice Ninja Sync Logs",
-			{"status": "Success"},
-			"creation",
-			order_by="creation desc"
-		)
-
-		return {
-			"totalInvoices": total_invoices,
-			"totalClients": total_clients,
-			"pendingPayments": pending_payments,
-			"overdueInvoices": overdue_invoices,
-			"lastSyncTime": last_sync_log,
-			"syncStatus": "idle"
-		}
+		return get_stats()["data"]
 	except Exception as e:
 		frappe.log_error(f"Error getting dashboard stats: {str(e)}")
 		return {
@@ -1341,60 +1682,96 @@ def get_dashboard_stats():
 def get_recent_activity(limit=10):
 	"""Get recent sync activity"""
 	try:
-		# Get recent sync logs
-		activities = frappe.db.get_all(
-			"Invoice Ninja Sync Logs",
-			fields=["name", "sync_type", "entity_type", "status", "message", "creation"],
-			order_by="creation desc",
-			limit=int(limit)
-		)
-
-		return [{
-			"id": activity.name,
-			"type": f"{activity.sync_type}_{activity.entity_type}".lower() if activity.sync_type and activity.entity_type else "sync",
-			"description": activity.message or f"Synchronized {activity.entity_type or 'data'}",
-			"status": activity.status.lower() if activity.status else "unknown",
-			"created_at": activity.creation
-		} for activity in activities]
-
+		return _format_recent_activity(get_recent_logs(limit)["data"])
 	except Exception as e:
 		frappe.log_error(f"Error getting recent activity: {str(e)}")
 		return []
 
 
+def _format_recent_activity(activities):
+	return [{
+		"id": activity.name,
+		"type": f"{activity.sync_type}_{activity.entity_type}".lower() if activity.sync_type and activity.entity_type else "sync",
+		"description": activity.message or f"Synchronized {activity.entity_type or 'data'}",
+		"status": activity.status.lower() if activity.status else "unknown",
+		"created_at": activity.creation
+	} for activity in activities]
+
+
 @frappe.whitelist()
 def get_sync_logs(limit=5):
 	"""Get sync logs"""
 	try:
-		logs = frappe.db.get_all(
-			"Invoice Ninja Sync Logs",
-			fields=["name", "sync_type", "entity_type", "status", "message", "creation"],
-			order_by="creation desc",
-			limit=int(limit)
-		)
-
-		return [{
-			"id": log.name,
-			"sync_type": log.sync_type or "manual",
-			"entity_type": log.entity_type or "unknown",
-			"status": log.status.lower() if log.status else "unknown",
-			"message": log.message or f"Synchronized {log.entity_type or 'data'}",
-			"created_at": log.creation
-		} for log in logs]
-
+		return _format_sync_logs(get_recent_logs(limit)["data"])
 	except Exception as e:
 		frappe.log_error(f"Error getting sync logs: {str(e)}")
 		return []
 
 
+def _format_sync_logs(logs):
+	return [{
+		"id": log.name,
+		"sync_type": log.sync_type or "manual",
+		"entity_type": log.entity_type or "unknown",
+		"status": log.status.lower() if log.status else "unknown",
+		"message": log.message or f"Synchronized {log.entity_type or 'data'}",
+		"created_at": log.creation
+	} for log in logs]
+
+
+@frappe.whitelist()
+def get_dashboard_snapshot(etags=None, activity_limit=10, logs_limit=5):
+	"""
+	Get dashboard statistics, recent activity and sync logs in one call
+
+	Each section carries an ETag; sections whose ETag the client sent back
+	unchanged are answered with not_modified instead of their payload.
+
+	Args:
+		etags: {"stats", "activity", "logs"} ETags from the previous response (JSON)
+		activity_limit: Number of recent activity entries, at most MAX_RECENT_LOGS
+		logs_limit: Number of sync log entries, at most MAX_RECENT_LOGS
+
+	Returns:
+		{stats, activity, logs} - each {etag, data} or {etag, not_modified}
+	"""
+	etags = frappe.parse_json(etags) if etags else {}
+	activity = get_recent_logs(activity_limit)
+	logs = get_recent_logs(logs_limit)
+
+	return {
+		"stats": conditional(get_stats(), etags.get("stats")),
+		"activity": conditional(
+			{"etag": activity["etag"], "data": _format_recent_activity(activity["data"])},
+			etags.get("activity")
+		),
+		"logs": conditional(
+			{"etag": logs["etag"], "data": _format_sync_logs(logs["data"])}, etags.get("logs")
+		),
+	}
+
+
 @frappe.whitelist()
 def trigger_manual_sync(sync_type="all"):
 	"""
 	Trigger manual synchronization - syncs all enabled companies
 
+	Enqueues one job per (company, entity) on the sync queue; poll
+	get_sync_run_status with the returned run_id for the aggregated summary.
+
 	Args:
 		sync_type: "customers", "invoices", "quotations", "items", "payments", "all"
 	"""
+	from .utils.sync_scheduler import SyncScheduler
+
+	sync_type_map = {
+		"customers": "Customer",
+		"invoices": "Sales Invoice",
+		"quotations": "Quotation",
+		"items": "Item",
+		"payments": "Payment Entry",
+	}
+
 	try:
 		companies = frappe.get_all(
 			"Invoice Ninja Company",
@@ -1408,43 +1785,21 @@ def trigger_manual_sync(sync_type="all"):
 				"message": "No enabled Invoice Ninja companies found"
 			}
 
-		results = []
-		results_objects = []
-
-		for company in companies:
-			company_results = []
-
-			if sync_type == "customers" or sync_type == "all":
-				result = sync_company_entities(company.name, "Customer", limit=100)
-				company_results.append(f"Customers: {result.get('synced_count', 0)}")
-				results_objects.append(result)
-
-			if sync_type == "invoices" or sync_type == "all":
-				result = sync_company_entities(company.name, "Sales Invoice", limit=100)
-				company_results.append(f"Invoices: {result.get('synced_count', 0)}")
-				results_objects.append(result)
-
-			if sync_type == "quotations" or sync_type == "all":
-				result = sync_company_entities(company.name, "Quotation", limit=100)
-				company_results.append(f"Quotations: {result.get('synced_count', 0)}")
-				results_objects.append(result)
-
-			if sync_type == "items" or sync_type == "all":
-				result = sync_company_entities(company.name, "Item", limit=100)
-				company_results.append(f"Items: {result.get('synced_count', 0)}")
-				results_objects.append(result)
-
-			if sync_type == "payments" or sync_type == "all":
-				result = sync_company_entities(company.name, "Payment Entry", limit=100)
-				company_results.append(f"Payments: {result.get('synced_count', 0)}")
-				results_objects.append(result)
+		if sync_type == "all":
+			entity_types = list(sync_type_map.values())
+		elif sync_type in sync_type_map:
+			entity_types = [sync_type_map[sync_type]]
+		else:
+			return {"success": False, "message": f"Invalid sync type: {sync_type}"}
 
-			results.append(f"{company.name}: {', '.join(company_results)}")
+		run_id = SyncScheduler.start(
+			[c.name for c in companies], entity_types, limit=100, priority="interactive"
+		)
 
 		return {
 			"success": True,
-			"results": results_objects,
-			"message": f"Manual {sync_type} sync completed: {'; '.join(results)}"
+			"run_id": run_id,
+			"message": f"Manual {sync_type} sync started for {len(companies)} companies"
 		}
 
 	except Exception as e:
@@ -2257,7 +2612,7 @@ def sync_payments_for_invoice(invoice_doc_name, invoice_ninja_id, invoice_ninja_
 def _update_payment_tracking(invoice_name, status, payment_count=0, paid_amount: float=0,
                              skip_reason=None, error_msg=None):
 	"""
-	Update payment tracking fields on Sales Invoice
+	Update payment tracking fields on Sales Invoice and schedule its next payment check
 
 	Args:
 		invoice_name: Sales Invoice name
@@ -2268,11 +2623,29 @@ def _update_payment_tracking(invoice_name, status, payment_count=0, paid_amount:
 		error_msg: Error message if failed
 	"""
 	try:
-		from frappe.utils import now
+		from datetime import timedelta
+
+		from frappe.utils import now_datetime
+
+		from invoice_ninja_integration.utils.payment_check_schedule import MAX_INTERVAL, next_payment_check
+
+		checked_at = now_datetime()
+		backoff, due_date = frappe.db.get_value(
+			"Sales Invoice", invoice_name, ["invoice_ninja_payment_check_backoff", "due_date"]
+		) or (0, None)
+
+		if status == "Not Eligible":
+			next_check, backoff = checked_at + timedelta(seconds=MAX_INTERVAL), backoff
+		else:
+			next_check, backoff = next_payment_check(
+				backoff, due_date, found_payment=payment_count > 0, failed=status == "Failed", now=checked_at
+			)
 
 		update_dict = {
 			"invoice_ninja_payment_status": status,
-			"invoice_ninja_last_payment_check": now(),
+			"invoice_ninja_last_payment_check": checked_at,
+			"invoice_ninja_next_payment_check": next_check,
+			"invoice_ninja_payment_check_backoff": backoff,
 		}
 
 		if payment_count > 0:
@@ -2288,7 +2661,8 @@ def _update_payment_tracking(invoice_name, status, payment_count=0, paid_amount:
 		if error_msg:
 			update_dict["invoice_ninja_payment_error"] = error_msg[:140]  # Limit length
 
-		frappe.db.set_value("Sales Invoice", invoice_name, update_dict)
+		# Leave modified alone: a newer modified marks the invoice as changed since its last check
+		frappe.db.set_value("Sales Invoice", invoice_name, update_dict, update_modified=False)
 		frappe.db.commit()
 
 	except Exception as e:
@@ -0,0 +1,30 @@
+import json
+import os
+
+import click
+
+
+@click.command("setup-invoice-ninja-workers")
+def setup_invoice_ninja_workers():
+	"""Add the Invoice Ninja priority queues to common_site_config.json"""
+	from frappe.utils import get_bench_path
+
+	from invoice_ninja_integration.utils.job_queues import get_workers_config
+
+	config_path = os.path.join(get_bench_path(), "sites", "common_site_config.json")
+	with open(config_path) as f:
+		common_config = json.load(f)
+
+	workers = common_config.setdefault("workers", {})
+	for queue, queue_config in get_workers_config().items():
+		# Keep timeouts and worker counts that were tuned by hand
+		workers[queue] = {**queue_config, **workers.get(queue, {})}
+
+	with open(config_path, "w") as f:
+		json.dump(common_config, f, indent=1, sort_keys=True)
+
+	click.echo(f"Configured queues: {', '.join(get_workers_config())}")
+	click.echo("Run `bench setup supervisor` (or add `bench worker --queue <name>` to the Procfile) to start them.")
+
+
+commands = [setup_invoice_ninja_workers]
@@ -78,22 +78,31 @@ doc_events = {
     "Customer": {
         "after_insert": "invoice_ninja_integration.sync_hooks.on_customer_save",
         "on_update": "invoice_ninja_integration.sync_hooks.on_customer_save",
+        "on_trash": "invoice_ninja_integration.utils.sync_state.delete_sync_state",
     },
     "Sales Invoice": {
         "on_submit": "invoice_ninja_integration.sync_hooks.on_invoice_submit",
         "on_update_after_submit": "invoice_ninja_integration.sync_hooks.on_invoice_save",
+        "on_trash": "invoice_ninja_integration.utils.sync_state.delete_sync_state",
     },
     "Quotation": {
         "after_insert": "invoice_ninja_integration.sync_hooks.on_quotation_save",
         "on_update": "invoice_ninja_integration.sync_hooks.on_quotation_save",
+        "on_trash": "invoice_ninja_integration.utils.sync_state.delete_sync_state",
     },
     "Item": {
         "after_insert": "invoice_ninja_integration.sync_hooks.on_item_save",
         "on_update": "invoice_ninja_integration.sync_hooks.on_item_save",
+        "on_trash": "invoice_ninja_integration.utils.sync_state.delete_sync_state",
     },
     "Payment Entry": {
         "on_submit": "invoice_ninja_integration.sync_hooks.on_payment_save",
         "on_update_after_submit": "invoice_ninja_integration.sync_hooks.on_payment_save",
+        "on_trash": "invoice_ninja_integration.utils.sync_state.delete_sync_state",
+    },
+    "Error Log": {
+        # Tag this app's errors so log retention finds them through an index
+        "before_insert": "invoice_ninja_integration.utils.log_retention.tag_error_log",
     }
 }
 
@@ -105,12 +114,27 @@ scheduler_events = {
     # "hourly": [
     #     "invoice_ninja_integration.tasks.sync_from_invoice_ninja"
     # ],
-    "daily": [
-        "invoice_ninja_integration.tasks.cleanup_sync_logs",
-        # Daily reconciliation sync to catch any missed webhook events
-        "invoice_ninja_integration.tasks.sync_from_invoice_ninja",
-        # Check unpaid invoices for new payments
+    "cron": {
+        # Delta-poll each company/entity on its adaptive interval (catches missed webhook events)
+        "*/5 * * * *": [
+            "invoice_ninja_integration.tasks.dispatch_adaptive_polls"
+        ],
+        # Resume checkpointed backfills whose job was lost, and queued submissions
+        "*/10 * * * *": [
+            "invoice_ninja_integration.tasks.resume_stalled_sync_runs",
+            "invoice_ninja_integration.tasks.resume_deferred_submissions"
+        ]
+    },
+    "hourly": [
+        # Check unpaid invoices whose adaptive payment check is due
         "invoice_ninja_integration.tasks.check_unpaid_invoices_for_payments"
+    ],
+    "daily": [
+        "invoice_ninja_integration.tasks.cleanup_sync_logs"
+    ],
+    "weekly": [
+        # Digest-based reconciliation: re-sync only records that drifted
+        "invoice_ninja_integration.tasks.reconcile_with_invoice_ninja"
     ]
 }
 
@@ -422,15 +422,14 @@ function sync_all_entities(frm) {
 					limit: values.limit
 				},
 				freeze: true,
-				freeze_message: __('Syncing all entities...'),
+				freeze_message: __('Scheduling sync...'),
 				callback: function(r) {
 					if (r.message && r.message.success) {
 						frappe.msgprint({
-							title: __('Sync Complete'),
-							indicator: 'green',
-							message: __('Synced {0} total records', [r.message.total_synced])
+							title: __('Sync Started'),
+							indicator: 'blue',
+							message: __('{0}. Independent entity types run in parallel; invoices, quotations and payments start once their prerequisites finish. Run ID: {1}', [r.message.message, r.message.run_id])
 						});
-						frm.reload_doc();
 					}
 				}
 			});
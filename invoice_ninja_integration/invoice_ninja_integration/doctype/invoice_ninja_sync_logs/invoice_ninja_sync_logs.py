@@ -5,11 +5,26 @@ import frappe
 from frappe.model.document import Document
 from datetime import datetime
 
+from invoice_ninja_integration.utils import sync_rollup
+
 class InvoiceNinjaSyncLogs(Document):
 	def before_insert(self):
 		if not self.sync_timestamp:
 			self.sync_timestamp = frappe.utils.now()
 
+	def after_insert(self):
+		sync_rollup.add_log(self)
+
+	def on_update(self):
+		# Move the log to its new rollup bucket when its status or duration changed
+		previous = self.get_doc_before_save()
+		if previous and any(
+			previous.get(field) != self.get(field)
+			for field in ("status", "duration", "record_type", "sync_direction", "invoice_ninja_company")
+		):
+			sync_rollup.add_log(previous, sign=-1)
+			sync_rollup.add_log(self)
+
 	@staticmethod
 	def create_log(sync_type, sync_direction, record_type, status="In Progress",
 				   record_id=None, record_name=None, message=None, error_details=None,
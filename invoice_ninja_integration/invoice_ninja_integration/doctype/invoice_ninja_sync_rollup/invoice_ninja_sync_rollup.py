@@ -0,0 +1,20 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class InvoiceNinjaSyncRollup(Document):
+	"""
+	Sync log counts of one hour, keyed by (hour, company, entity type, direction, status)
+
+	Maintained incrementally as sync logs are written; see utils/sync_rollup.py.
+	"""
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Invoice Ninja Sync Rollup", ["hour"])
+	frappe.db.add_index("Invoice Ninja Sync Rollup", ["invoice_ninja_company", "hour"])
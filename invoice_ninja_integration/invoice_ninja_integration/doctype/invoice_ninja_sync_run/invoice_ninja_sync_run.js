@@ -0,0 +1,22 @@
+// Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Invoice Ninja Sync Run', {
+	refresh: function(frm) {
+		if (frm.is_new()) {
+			return;
+		}
+
+		if (['Failed', 'Cancelled'].includes(frm.doc.status)) {
+			frm.add_custom_button(__('Resume from Checkpoint'), function() {
+				frm.call('resume').then(() => frm.reload_doc());
+			});
+		}
+
+		if (['Queued', 'Running'].includes(frm.doc.status)) {
+			frm.add_custom_button(__('Stop'), function() {
+				frm.call('stop').then(() => frm.reload_doc());
+			});
+		}
+	}
+});
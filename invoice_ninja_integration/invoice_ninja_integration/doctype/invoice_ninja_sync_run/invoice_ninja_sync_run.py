@@ -0,0 +1,286 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import time
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime, time_diff_in_seconds
+
+from invoice_ninja_integration.utils.sync_progress import publish_progress, publish_run_finished
+
+
+# Extra job timeout on top of the time budget so the page in flight can finish
+SLICE_TIMEOUT_MARGIN = 300
+
+
+class InvoiceNinjaSyncRun(Document):
+	"""
+	Resumable backfill of one entity type for one Invoice Ninja Company
+
+	Each background job processes pages until its time budget is used up,
+	checkpointing after every page, then re-enqueues itself from the
+	checkpoint. A backfill survives job timeouts and worker restarts and
+	never re-syncs a record that was already checkpointed.
+
+	Records are fetched oldest first by updated_at and the checkpoint is a
+	cursor on it: the updated_at of the last synced records plus the IDs
+	synced at exactly that time. Records created or updated while the run
+	is in progress only ever appear after the cursor, so unlike a page
+	number the checkpoint never skips or repeats records.
+	"""
+
+	def validate(self):
+		# Invoice Ninja caps per_page at 100
+		self.per_page = min(max(int(self.per_page or 100), 1), 100)
+		self.time_budget = max(int(self.time_budget or 240), 30)
+
+	def after_insert(self):
+		self.enqueue_slice()
+
+	@frappe.whitelist()
+	def resume(self):
+		"""Resume a failed or cancelled run from its checkpoint"""
+		if self.status == "Completed":
+			frappe.throw("This sync run has already completed")
+
+		self.db_set({"status": "Queued", "error_message": None, "finished_at": None})
+		self.enqueue_slice(resume=True)
+
+	@frappe.whitelist()
+	def stop(self):
+		"""Stop the run after the page currently being processed"""
+		if self.status in ("Queued", "Running"):
+			self.db_set("status", "Cancelled")
+
+	def enqueue_slice(self, resume=False):
+		"""
+		Enqueue the next time-budgeted slice of this run
+
+		Args:
+			resume: Restarting a stopped or stalled run; its job ID is made unique so a
+				previous job stuck as queued or running does not swallow it through dedup
+				(the run lock still keeps a single slice running)
+		"""
+		from invoice_ninja_integration.utils.job_queues import enqueue_job
+
+		job_id = f"invoice_ninja_sync_run::{self.name}::{self.slices_run or 0}"
+		if resume:
+			job_id += f"::resume::{frappe.generate_hash(length=8)}"
+		enqueue_job(
+			"invoice_ninja_integration.invoice_ninja_integration.doctype.invoice_ninja_sync_run"
+			".invoice_ninja_sync_run.run_sync_run_slice",
+			"bulk",
+			timeout=self.time_budget + SLICE_TIMEOUT_MARGIN,
+			job_id=job_id,
+			enqueue_after_commit=True,
+			sync_run=self.name,
+		)
+		self.db_set("job_id", job_id, update_modified=False)
+
+	def get_cursor_ids(self):
+		"""IDs of the records already synced at the cursor time"""
+		return set(filter(None, (self.cursor_ids or "").split(",")))
+
+	def checkpoint(self, entities, sync_stats):
+		"""Persist progress and move the cursor past a fully processed page"""
+		cursor = max([self.cursor_updated_at or 0] + [int(e.get("updated_at") or 0) for e in entities])
+		cursor_ids = {str(e.get("id")) for e in entities if int(e.get("updated_at") or 0) == cursor}
+		if cursor == (self.cursor_updated_at or 0):
+			# The whole page shares the cursor time; the rest of it is on the next page
+			cursor_ids |= self.get_cursor_ids()
+			next_page = self.next_page + 1
+		else:
+			next_page = 1
+
+		self.db_set(
+			{
+				"cursor_updated_at": cursor,
+				"cursor_ids": ",".join(sorted(cursor_ids)),
+				"next_page": next_page,
+				"pages_completed": self.pages_completed + 1,
+				"fetched_count": self.fetched_count + len(entities),
+				"created_count": self.created_count + sync_stats["new_records"],
+				"updated_count": self.updated_count + sync_stats["updated_records"],
+				"unchanged_count": self.unchanged_count + sync_stats["unchanged_records"],
+				"skipped_count": self.skipped_count + sync_stats["skipped_records"],
+				"failed_count": self.failed_count + sync_stats["failed_records"],
+				"last_checkpoint_at": now_datetime(),
+			},
+			update_modified=False,
+		)
+		frappe.db.commit()
+		self.publish_progress()
+
+	def publish_progress(self):
+		"""Publish the checkpointed progress to the subscribers of this run"""
+		elapsed = time_diff_in_seconds(now_datetime(), self.started_at) if self.started_at else 0
+		rate = self.fetched_count / elapsed if elapsed > 0 else 0
+		publish_progress(
+			self.name,
+			{
+				"run_id": self.name,
+				"invoice_ninja_company": self.invoice_ninja_company,
+				"entity_type": self.entity_type,
+				"status": self.status,
+				"pages_done": self.pages_completed,
+				"records_done": self.fetched_count,
+				"total": self.max_records or None,
+				"records_per_second": round(rate, 1),
+				"eta_seconds": (
+					round(max(self.max_records - self.fetched_count, 0) / rate)
+					if self.max_records and rate else None
+				),
+				"elapsed_seconds": round(elapsed, 1),
+				"counts": {
+					"created": self.created_count,
+					"updated": self.updated_count,
+					"unchanged": self.unchanged_count,
+					"skipped": self.skipped_count,
+					"failed": self.failed_count,
+				},
+			},
+		)
+
+	def complete(self):
+		"""Mark the run completed and roll its counts into the company stats"""
+		from invoice_ninja_integration.api import update_company_sync_stats
+
+		finished_at = now_datetime()
+		self.db_set({"status": "Completed", "finished_at": finished_at})
+
+		synced = self.created_count + self.updated_count
+		update_company_sync_stats(
+			self.invoice_ninja_company,
+			self.entity_type,
+			synced,
+			"Success" if not self.failed_count else "Partial",
+			time_diff_in_seconds(finished_at, self.started_at),
+		)
+		frappe.db.commit()
+		publish_run_finished(self.name, {"status": "Completed"})
+
+	def fail(self, error_message):
+		"""Mark the run failed; it can be resumed from the last checkpoint"""
+		self.db_set({"status": "Failed", "error_message": error_message, "finished_at": now_datetime()})
+		frappe.db.commit()
+		publish_run_finished(self.name, {"status": "Failed", "error_message": error_message})
+
+
+def run_sync_run_slice(sync_run):
+	"""
+	Background job: process one time-budgeted slice of a sync run from its checkpoint
+
+	Args:
+		sync_run: Invoice Ninja Sync Run name
+	"""
+	run = frappe.get_doc("Invoice Ninja Sync Run", sync_run)
+	if run.status not in ("Queued", "Running"):
+		return
+
+	# Never process the same run in two jobs at once (e.g. after a stalled-run requeue)
+	cache = frappe.cache()
+	lock = cache.lock(
+		cache.make_key(f"invoice_ninja_sync_run_lock|{sync_run}"),
+		timeout=run.time_budget + SLICE_TIMEOUT_MARGIN,
+	)
+	if not lock.acquire(blocking=False):
+		return
+
+	try:
+		finished = _process_slice(run)
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(f"Sync run {sync_run} failed: {e!s}", "Sync Run Error")
+		run.fail(str(e))
+		finished = True
+	finally:
+		try:
+			lock.release()
+		except Exception:
+			# Lock expired while the slice was running
+			pass
+
+	if not finished:
+		# Time budget used up: continue from the checkpoint in a fresh job
+		run.enqueue_slice()
+		frappe.db.commit()
+
+
+def _process_slice(run):
+	"""
+	Sync pages from the checkpoint until the time budget is used up
+
+	Returns:
+		bool: True if the run reached a final state
+	"""
+	from invoice_ninja_integration.api import sync_entity_batch
+	from invoice_ninja_integration.utils.sync_manager import SyncManager
+	from invoice_ninja_integration.utils.tombstones import DELTA_FILTERS
+
+	run.db_set(
+		{
+			"status": "Running",
+			"started_at": run.started_at or now_datetime(),
+			"slices_run": (run.slices_run or 0) + 1,
+		},
+		update_modified=False,
+	)
+	frappe.db.commit()
+
+	deadline = time.monotonic() + run.time_budget
+	sync_manager = SyncManager()
+
+	while time.monotonic() < deadline:
+		# Stopped from the UI between pages
+		if frappe.db.get_value("Invoice Ninja Sync Run", run.name, "status") == "Cancelled":
+			return True
+
+		cursor = run.cursor_updated_at or 0
+		result = sync_manager.fetch_entities_for_company(
+			run.entity_type,
+			invoice_ninja_company_id=run.invoice_ninja_company,
+			page=run.next_page,
+			per_page=run.per_page,
+			filters={**DELTA_FILTERS, "updated_at": cursor, "sort": "updated_at|asc"},
+		)
+		if not result.get("success"):
+			run.fail(
+				f"Failed to fetch page {run.next_page} after updated_at {cursor}: "
+				f"{result.get('message', 'Unknown error')}"
+			)
+			return True
+
+		fetched = result.get("entities") or []
+		is_last_page = len(fetched) < run.per_page
+
+		# The updated_at filter is inclusive: skip the records synced at the cursor time
+		synced_ids = run.get_cursor_ids()
+		entities = [
+			e for e in fetched
+			if int(e.get("updated_at") or 0) != cursor or str(e.get("id")) not in synced_ids
+		]
+
+		if run.max_records:
+			remaining = run.max_records - run.fetched_count
+			if len(entities) >= remaining:
+				entities = entities[:remaining]
+				is_last_page = True
+
+		sync_stats = {
+			"new_records": 0,
+			"updated_records": 0,
+			"unchanged_records": 0,
+			"skipped_records": 0,
+			"failed_records": 0,
+		}
+		sync_entity_batch(
+			entities, run.entity_type, run.invoice_ninja_company, bool(run.force_full_sync), sync_stats, []
+		)
+		run.checkpoint(entities, sync_stats)
+
+		if is_last_page:
+			run.complete()
+			return True
+
+	return False
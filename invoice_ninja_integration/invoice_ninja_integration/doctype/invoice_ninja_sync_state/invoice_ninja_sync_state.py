@@ -0,0 +1,24 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class InvoiceNinjaSyncState(Document):
+	"""
+	Sync state of one Invoice Ninja record, keyed by (company, entity type, Invoice Ninja ID)
+
+	Written in bulk by SyncStateStore; see utils/sync_state.py.
+	"""
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"Invoice Ninja Sync State",
+		["invoice_ninja_company", "entity_type", "invoice_ninja_id"],
+		constraint_name="unique_sync_state_key",
+	)
+	frappe.db.add_index("Invoice Ninja Sync State", ["entity_type", "document_name"])
@@ -2,6 +2,8 @@ import frappe
 from frappe import _
 import json
 from datetime import datetime, timedelta
+from invoice_ninja_integration.utils.job_queues import enqueue_job
+from invoice_ninja_integration.utils.log_retention import APP_ERROR_LOGS, purge
 
 def get_context(context):
     context.no_cache = 1
@@ -54,11 +56,11 @@ def get_sync_logs():
         limit=50
     )
 
-    # Get error logs
+    # Get error logs tagged as raised by Invoice Ninja
     error_logs = frappe.get_list(
         "Error Log",
         filters={
-            "error": ["like", "%invoice_ninja%"]
+            "invoice_ninja_log": 1
         },
         fields=["name", "creation", "error", "method"],
         order_by="creation desc",
@@ -72,40 +74,23 @@ def get_sync_logs():
 
 def get_sync_statistics():
     """Get sync statistics for the dashboard"""
-    today = datetime.now().date()
-    week_ago = today - timedelta(days=7)
-
-    # Count successful syncs by type (from background jobs)
-    successful_jobs = frappe.db.sql("""
-        SELECT
-            CASE
-                WHEN job_name LIKE '%customer%' THEN 'Customer'
-                WHEN job_name LIKE '%invoice%' THEN 'Invoice'
-                WHEN job_name LIKE '%quote%' THEN 'Quotation'
-                WHEN job_name LIKE '%product%' OR job_name LIKE '%item%' THEN 'Product'
-                WHEN job_name LIKE '%payment%' THEN 'Payment'
-                ELSE 'Other'
-            END as sync_type,
-            COUNT(*) as count
-        FROM `tabRQ Job`
-        WHERE job_name LIKE '%invoice_ninja%'
-            AND status = 'finished'
-            AND DATE(creation) >= %s
-        GROUP BY sync_type
-    """, [week_ago], as_dict=1)
-
-    # Count failed syncs
-    failed_jobs = frappe.db.sql("""
-        SELECT COUNT(*) as count
-        FROM `tabRQ Job`
-        WHERE job_name LIKE '%invoice_ninja%'
-            AND status = 'failed'
-            AND DATE(creation) >= %s
-    """, [week_ago], as_dict=1)
+    from invoice_ninja_integration.utils.sync_rollup import get_totals
+
+    week_ago = datetime.now() - timedelta(days=7)
+
+    # Count syncs by entity type and status from the hourly rollup
+    totals = get_totals(week_ago)
+
+    successful_syncs = [
+        {"sync_type": row.entity_type or "Other", "count": int(row.sync_count or 0)}
+        for row in totals
+        if row.status == "Success"
+    ]
+    failed_syncs = sum(int(row.sync_count or 0) for row in totals if row.status == "Failed")
 
     return {
-        "successful_syncs": successful_jobs,
-        "failed_syncs": failed_jobs[0]["count"] if failed_jobs else 0,
+        "successful_syncs": successful_syncs,
+        "failed_syncs": failed_syncs,
         "period": "Last 7 days"
     }
 
@@ -161,26 +146,30 @@ def manual_sync(sync_type, sync_direction, record_id=None):
 
         # Enqueue the sync job
         job_name = f"manual_sync_{sync_type.lower()}_{sync_direction.replace(' ', '_').lower()}"
+        # Identical requests collapse into the job that is already queued
+        job_id = f"invoice_ninja_{job_name}::{record_id}" if record_id else f"invoice_ninja_{job_name}"
 
         if sync_direction == "ERPNext to Invoice Ninja":
             # Sync from ERPNext to Invoice Ninja
-            frappe.enqueue(
-                method="invoice_ninja_integration.tasks.sync_erpnext_to_invoice_ninja",
-                queue="default",
+            enqueue_job(
+                "invoice_ninja_integration.tasks.sync_erpnext_to_invoice_ninja",
+                "interactive",
+                job_id=job_id,
+                timeout=600,
                 sync_type=sync_type,
                 record_id=record_id,
-                job_name=job_name,
-                timeout=600
+                job_name=job_name
             )
         else:
             # Sync from Invoice Ninja to ERPNext
-            frappe.enqueue(
-                method="invoice_ninja_integration.tasks.sync_invoice_ninja_to_erpnext",
-                queue="default",
+            enqueue_job(
+                "invoice_ninja_integration.tasks.sync_invoice_ninja_to_erpnext",
+                "interactive",
+                job_id=job_id,
+                timeout=600,
                 sync_type=sync_type,
                 record_id=record_id,
-                job_name=job_name,
-                timeout=600
+                job_name=job_name
             )
 
         return {
@@ -232,15 +221,11 @@ def clear_sync_logs():
                 AND creation < %s
         """, [thirty_days_ago])
 
-        # Delete Error Logs older than 30 days
-        frappe.db.sql("""
-            DELETE FROM `tabError Log`
-            WHERE error LIKE '%invoice_ninja%'
-                AND creation < %s
-        """, [thirty_days_ago])
-
         frappe.db.commit()
 
+        # Delete Error Logs older than 30 days in short chunks
+        purge("Error Log", thirty_days_ago, conditions=[APP_ERROR_LOGS])
+
         return {
             "success": True,
             "message": "Old sync logs have been cleared"
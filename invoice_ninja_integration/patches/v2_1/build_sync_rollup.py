@@ -0,0 +1,13 @@
+# Patches v2.1
+
+import frappe
+
+
+def execute():
+	"""Build the hourly sync statistics rollup from the existing sync logs"""
+	frappe.reload_doctype("Invoice Ninja Sync Rollup")
+
+	from invoice_ninja_integration.utils.sync_rollup import rebuild
+
+	rebuild()
+	frappe.db.commit()
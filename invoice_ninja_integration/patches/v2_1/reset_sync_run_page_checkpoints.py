@@ -0,0 +1,17 @@
+# Patches v2.1
+
+import frappe
+
+
+def execute():
+	"""Restart unfinished sync runs checkpointed on a page number from the start of the updated_at cursor"""
+	# The old page numbers do not address the updated_at ordered pages; re-walking from
+	# the start is safe since records synced already are reported unchanged
+	frappe.db.sql("""
+		UPDATE `tabInvoice Ninja Sync Run`
+		SET next_page = 1
+		WHERE status != 'Completed'
+		AND COALESCE(cursor_updated_at, 0) = 0
+		AND next_page > 1
+	""")
+	frappe.db.commit()
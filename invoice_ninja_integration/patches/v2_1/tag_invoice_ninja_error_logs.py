@@ -0,0 +1,18 @@
+# Patches v2.1
+
+import frappe
+
+
+def execute():
+	"""Tag existing Error Log rows of Invoice Ninja so log retention can select them by index"""
+	if not frappe.db.has_column("Error Log", "invoice_ninja_log"):
+		return
+
+	# One-off text match; new rows are tagged on insert
+	frappe.db.sql("""
+		UPDATE `tabError Log`
+		SET invoice_ninja_log = 1
+		WHERE invoice_ninja_log = 0
+		AND (error LIKE %s OR error LIKE %s OR method LIKE %s)
+	""", ("%Invoice Ninja%", "%invoice_ninja_integration%", "%Invoice Ninja%"))
+	frappe.db.commit()
@@ -1,6 +1,68 @@
+from functools import partial
+
 import frappe
+from invoice_ninja_integration.utils.job_queues import PRIORITY_QUEUES, enqueue_job, is_job_running
 from invoice_ninja_integration.utils.sync_manager import SyncManager
 
+
+# Seconds a push waits for the running push of the same document
+PUSH_LOCK_WAIT = 120
+
+
+def enqueue_document_push(doc):
+    """
+    Queue a real-time push of a saved document once the save is committed
+
+    Repeated saves collapse into one queued job. A save made while the push of the
+    document is already running queues one follow-up push, which waits for the
+    running one and then pushes the latest version.
+    """
+    frappe.db.after_commit.add(partial(_enqueue_push, doc.doctype, doc.name))
+
+
+def _enqueue_push(doctype, name):
+    job_id = f"invoice_ninja_push::{doctype}::{name}"
+    if is_job_running(job_id):
+        # The running push may have loaded the document before this save
+        job_id = f"{job_id}::next"
+
+    enqueue_job(
+        'invoice_ninja_integration.sync_hooks.push_document_to_invoice_ninja',
+        'realtime',
+        job_id=job_id,
+        timeout=PRIORITY_QUEUES["realtime"]["timeout"] + PUSH_LOCK_WAIT,
+        doctype=doctype,
+        name=name
+    )
+
+
+def push_document_to_invoice_ninja(doctype, name):
+    """Background job: push the latest saved version of a document to Invoice Ninja"""
+    cache = frappe.cache()
+    # Pushes of the same document run one at a time; the document is loaded once the lock is held
+    lock = cache.lock(
+        cache.make_key(f"invoice_ninja_push_lock|{doctype}|{name}"),
+        timeout=PRIORITY_QUEUES["realtime"]["timeout"],
+    )
+    if not lock.acquire(blocking_timeout=PUSH_LOCK_WAIT):
+        frappe.log_error(
+            f"Push of {doctype} {name} gave up waiting for the running push", "Invoice Ninja Push Error"
+        )
+        return
+
+    try:
+        if not frappe.db.exists(doctype, name):
+            return
+
+        SyncManager().sync_document_to_invoice_ninja(frappe.get_doc(doctype, name))
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            # Lock expired while the push was running
+            pass
+
+
 def on_customer_save(doc, method):
     """Handle Customer save events for sync to Invoice Ninja"""
     # Skip if document is being created by sync process
@@ -12,13 +74,7 @@ def on_customer_save(doc, method):
     # Only sync if ERPNext to Invoice Ninja sync is enabled
     if sync_manager.should_sync_from_erpnext("Customer"):
         # Run sync in background to avoid blocking the user
-        frappe.enqueue(
-            method=sync_manager.sync_document_to_invoice_ninja,
-            queue='default',
-            doc=doc,
-            timeout=300,
-            is_async=True
-        )
+        enqueue_document_push(doc)
 
 def on_invoice_save(doc, method):
     """Handle Sales Invoice save events for sync to Invoice Ninja"""
@@ -28,13 +84,7 @@ def on_invoice_save(doc, method):
     sync_manager = SyncManager()
 
     if sync_manager.should_sync_from_erpnext("Sales Invoice"):
-        frappe.enqueue(
-            method=sync_manager.sync_document_to_invoice_ninja,
-            queue='default',
-            doc=doc,
-            timeout=300,
-            is_async=True
-        )
+        enqueue_document_push(doc)
 
 
 def on_invoice_submit(doc, method):
@@ -53,14 +103,13 @@ def on_invoice_submit(doc, method):
         return
 
     # Enqueue payment sync for this specific invoice
-    frappe.enqueue(
-        method='invoice_ninja_integration.api.sync_payments_for_invoice',
-        queue='default',
+    enqueue_job(
+        'invoice_ninja_integration.api.sync_payments_for_invoice',
+        'realtime',
+        job_id=f"invoice_ninja_payment_check::{doc.name}",
         invoice_doc_name=doc.name,
         invoice_ninja_id=doc.invoice_ninja_id,
-        invoice_ninja_company=doc.invoice_ninja_company,
-        timeout=300,
-        is_async=True
+        invoice_ninja_company=doc.invoice_ninja_company
     )
 
     frappe.logger().info(
@@ -76,13 +125,7 @@ def on_quotation_save(doc, method):
     sync_manager = SyncManager()
 
     if sync_manager.should_sync_from_erpnext("Quotation"):
-        frappe.enqueue(
-            method=sync_manager.sync_document_to_invoice_ninja,
-            queue='default',
-            doc=doc,
-            timeout=300,
-            is_async=True
-        )
+        enqueue_document_push(doc)
 
 def on_item_save(doc, method):
     """Handle Item save events for sync to Invoice Ninja"""
@@ -92,13 +135,7 @@ def on_item_save(doc, method):
     sync_manager = SyncManager()
 
     if sync_manager.should_sync_from_erpnext("Item"):
-        frappe.enqueue(
-            method=sync_manager.sync_document_to_invoice_ninja,
-            queue='default',
-            doc=doc,
-            timeout=300,
-            is_async=True
-        )
+        enqueue_document_push(doc)
 
 def on_payment_save(doc, method):
     """Handle Payment Entry save events for sync to Invoice Ninja"""
@@ -108,10 +145,4 @@ def on_payment_save(doc, method):
     sync_manager = SyncManager()
 
     if sync_manager.should_sync_from_erpnext("Payment Entry"):
-        frappe.enqueue(
-            method=sync_manager.sync_document_to_invoice_ninja,
-            queue='default',
-            doc=doc,
-            timeout=300,
-            is_async=True
-        )
+        enqueue_document_push(doc)
@@ -2,10 +2,22 @@ import frappe
 from frappe.utils import add_days, now_datetime
 from .api import get_client
 
+# Entity type -> Invoice Ninja Settings checkbox that enables its sync
+ENTITY_SYNC_SETTINGS = {
+	"Customer": "enable_customer_sync",
+	"Sales Invoice": "enable_invoice_sync",
+	"Quotation": "enable_quote_sync",
+	"Item": "enable_product_sync",
+	"Payment Entry": "enable_payment_sync",
+}
+
+# Companies with at least this many due payment checks get one discovery job instead of per-invoice checks
+PAYMENT_DISCOVERY_THRESHOLD = 20
+
 
 def sync_from_invoice_ninja():
-	"""Hourly scheduled task to sync data from Invoice Ninja to ERPNext"""
-	from .api import sync_company_entities
+	"""Scheduled task to sync data from Invoice Ninja to ERPNext"""
+	from .utils.sync_scheduler import SyncScheduler
 
 	# Get all enabled companies
 	companies = frappe.get_all(
@@ -22,73 +34,103 @@ def sync_from_invoice_ninja():
 	if not settings.enabled:
 		return
 
-	# Sync each company's data
-	total_synced = 0
-	for company in companies:
-		try:
-			# Sync each entity type that's enabled in settings
-			if settings.enable_customer_sync:
-				result = sync_company_entities(company.name, "Customer", limit=100)
-				total_synced += result.get("synced_count", 0)
+	entity_types = get_enabled_entity_types(settings)
+	if not entity_types:
+		return
 
-			if settings.enable_invoice_sync:
-				result = sync_company_entities(company.name, "Sales Invoice", limit=100)
-				total_synced += result.get("synced_count", 0)
+	# Fan out one job per (company, entity) across the sync workers
+	try:
+		SyncScheduler.start([c.name for c in companies], entity_types, limit=100)
+	except Exception as e:
+		frappe.log_error(f"Scheduled sync error: {str(e)}", "Scheduled Sync Error")
 
-			if settings.enable_quote_sync:
-				result = sync_company_entities(company.name, "Quotation", limit=100)
-				total_synced += result.get("synced_count", 0)
 
-			if settings.enable_product_sync:
-				result = sync_company_entities(company.name, "Item", limit=100)
-				total_synced += result.get("synced_count", 0)
+def get_enabled_entity_types(settings):
+	"""Entity types whose sync is enabled in Invoice Ninja Settings"""
+	return [entity for entity, field in ENTITY_SYNC_SETTINGS.items() if settings.get(field)]
 
-			if settings.enable_payment_sync:
-				result = sync_company_entities(company.name, "Payment Entry", limit=100)
-				total_synced += result.get("synced_count", 0)
 
+def dispatch_adaptive_polls():
+	"""Enqueue delta polls for every company/entity pair that is due"""
+	from .utils.adaptive_scheduler import AdaptivePollScheduler
+
+	settings = frappe.get_single("Invoice Ninja Settings")
+	if not settings.enabled:
+		return
+
+	try:
+		AdaptivePollScheduler.dispatch()
+	except Exception as e:
+		frappe.log_error(f"Adaptive poll dispatch error: {str(e)}", "Scheduled Sync Error")
+
+
+def resume_stalled_sync_runs():
+	"""Re-enqueue backfill runs whose job was lost (worker restart, deploy, hard timeout)"""
+	from .invoice_ninja_integration.doctype.invoice_ninja_sync_run.invoice_ninja_sync_run import (
+		SLICE_TIMEOUT_MARGIN,
+	)
+
+	# A run is stalled when it has not checkpointed within one full job timeout
+	stalled_runs = frappe.db.sql("""
+		SELECT name
+		FROM `tabInvoice Ninja Sync Run`
+		WHERE status IN ('Queued', 'Running')
+		AND COALESCE(last_checkpoint_at, started_at, creation)
+			< NOW() - INTERVAL (time_budget + %s) SECOND
+	""", (SLICE_TIMEOUT_MARGIN * 2,), as_dict=True)
+
+	for run in stalled_runs:
+		try:
+			frappe.get_doc("Invoice Ninja Sync Run", run.name).enqueue_slice(resume=True)
+			frappe.db.commit()
 		except Exception as e:
-			frappe.log_error(
-				f"Scheduled sync error for {company.name}: {str(e)}",
-				"Scheduled Sync Error"
-			)
+			frappe.log_error(f"Failed to resume sync run {run.name}: {str(e)}", "Sync Run Error")
+
+
+def resume_deferred_submissions():
+	"""Restart the submission worker while synced drafts are still queued for submission"""
+	from .utils.deferred_submit import SUBMIT_ORDER, enqueue_submission_worker
+
+	for doctype in SUBMIT_ORDER:
+		if frappe.db.exists(doctype, {"docstatus": 0, "invoice_ninja_submit_status": "Queued"}):
+			enqueue_submission_worker()
+			return
 
-	if total_synced > 0:
-		frappe.log_error(
-			f"Hourly sync completed successfully: {total_synced} records synced across {len(companies)} companies",
-			"Invoice Ninja Sync Success"
-		)
 
+def reconcile_with_invoice_ninja():
+	"""Weekly reconciliation of every enabled entity type to catch drift the delta sync missed"""
+	from .api import start_reconciliation
 
+	settings = frappe.get_single("Invoice Ninja Settings")
+	if not settings.enabled:
+		return
+
+	for company in frappe.get_all("Invoice Ninja Company", filters={"enabled": 1}, pluck="name"):
+		for entity_type in get_enabled_entity_types(settings):
+			start_reconciliation(company, entity_type)
 
 
 def cleanup_sync_logs():
 	"""Daily cleanup of old sync logs"""
+	from .utils.log_retention import APP_ERROR_LOGS, purge
+
 	try:
 		settings = frappe.get_single("Invoice Ninja Settings")
 		cleanup_days = settings.cleanup_logs_after_days or 30
+		archive = bool(settings.get("archive_logs_before_cleanup"))
 
 		# Delete sync logs older than configured days
 		cutoff_date = add_days(now_datetime(), -cleanup_days)
 
-		# Delete old Invoice Ninja Sync Logs
-		frappe.db.sql("""
-			DELETE FROM `tabInvoice Ninja Sync Logs`
-			WHERE creation < %s
-		""", cutoff_date)
+		# Delete old Invoice Ninja Sync Logs in short, primary key ordered chunks
+		deleted_logs = purge("Invoice Ninja Sync Logs", cutoff_date, archive=archive)
 
-		# Delete old error logs related to Invoice Ninja
-		frappe.db.sql("""
-			DELETE FROM `tabError Log`
-			WHERE creation < %s
-			AND error LIKE '%%Invoice Ninja%%'
-		""", cutoff_date)
-
-		frappe.db.commit()
+		# Delete old error logs tagged as raised by Invoice Ninja
+		deleted_errors = purge("Error Log", cutoff_date, conditions=[APP_ERROR_LOGS], archive=archive)
 
 		frappe.logger().info(
 			f"Sync logs cleanup completed: "
-			f"Deleted logs older than {cleanup_days} days"
+			f"Deleted {deleted_logs} sync logs and {deleted_errors} error logs older than {cleanup_days} days"
 		)
 
 	except Exception as e:
@@ -146,6 +188,7 @@ def sync_payments_from_invoice_ninja():
 def _create_payment_entry_from_invoice_ninja(payment_data):
 	"""Create ERPNext payment entry from Invoice Ninja payment data"""
 	try:
+		from .utils.deferred_submit import submit_or_defer
 		from .utils.field_mapper import FieldMapper
 
 		payment_doc_data = FieldMapper.map_payment_from_invoice_ninja(payment_data)
@@ -155,10 +198,8 @@ def _create_payment_entry_from_invoice_ninja(payment_data):
 		doc = frappe.get_doc(payment_doc_data)
 		doc.insert()
 
-		# Check if auto-submit is enabled
-		settings = frappe.get_single("Invoice Ninja Settings")
-		if settings.get("auto_submit_payments"):
-			doc.submit()
+		# Submit inline, or queue for the submission worker (per settings)
+		submit_or_defer(doc)
 
 		frappe.db.commit()
 
@@ -171,68 +212,60 @@ def _create_payment_entry_from_invoice_ninja(payment_data):
 
 def check_unpaid_invoices_for_payments():
 	"""
-	Daily task to check unpaid Invoice Ninja invoices for new payments
-
-	This task finds submitted invoices from Invoice Ninja that:
-	- Have outstanding amounts
-	- Haven't been checked in the last 24 hours (or never checked)
-	- And checks if payments are now available in Invoice Ninja
+	Hourly task to check unpaid Invoice Ninja invoices for new payments
+
+	Picks the invoices whose adaptive payment check is due, across all
+	companies and highest priority first (see utils.payment_check_schedule).
+	Companies with many due invoices get one payment discovery job that
+	matches recently changed payments against all of their outstanding
+	invoices at once (see utils.payment_discovery); the others get one
+	targeted check per due invoice.
 	"""
 	try:
-		from frappe.utils import add_to_date
-
-		# Get invoices that need payment check
-		cutoff_time = add_to_date(now_datetime(), hours=-24)
-
-		invoices = frappe.db.sql("""
-			SELECT
-				name,
-				invoice_ninja_id,
-				invoice_ninja_company,
-				outstanding_amount
-			FROM `tabSales Invoice`
-			WHERE invoice_ninja_id IS NOT NULL
-			AND invoice_ninja_id != ''
-			AND invoice_ninja_company IS NOT NULL
-			AND invoice_ninja_company != ''
-			AND docstatus = 1
-			AND outstanding_amount > 0
-			AND (
-				invoice_ninja_last_payment_check IS NULL
-				OR invoice_ninja_last_payment_check < %s
-			)
-			ORDER BY modified DESC
-			LIMIT 100
-		""", (cutoff_time,), as_dict=True)
+		from .utils.job_queues import enqueue_job
+		from .utils.payment_check_schedule import get_due_payment_checks
+		from .utils.sync_scheduler import NODE_TIMEOUT
 
-		if not invoices:
-			frappe.logger().info("No unpaid invoices to check for payments")
+		due = get_due_payment_checks()
+		if not due:
+			frappe.logger().info("No unpaid invoices due for a payment check")
 			return
 
-		checked_count = 0
-
-		for invoice in invoices:
-			try:
-				# Queue payment sync for this invoice
-				frappe.enqueue(
-					method='invoice_ninja_integration.api.sync_payments_for_invoice',
-					queue='default',
+		due_by_company = {}
+		for invoice in due:
+			due_by_company.setdefault(invoice.invoice_ninja_company, []).append(invoice)
+
+		discovery_jobs = 0
+		invoice_jobs = 0
+		for company, invoices in due_by_company.items():
+			if len(invoices) >= PAYMENT_DISCOVERY_THRESHOLD:
+				enqueue_job(
+					'invoice_ninja_integration.utils.payment_discovery.discover_payments_for_company',
+					'bulk',
+					job_id=f"invoice_ninja_payment_discovery::{company}",
+					timeout=NODE_TIMEOUT,
+					invoice_ninja_company=company,
+					due_invoices=[invoice.name for invoice in invoices]
+				)
+				discovery_jobs += 1
+				continue
+
+			for invoice in invoices:
+				# Throttled checks stay due and are picked up by the next run
+				if enqueue_job(
+					'invoice_ninja_integration.api.sync_payments_for_invoice',
+					'bulk',
+					job_id=f"invoice_ninja_payment_check::{invoice.name}",
+					throttle=True,
 					invoice_doc_name=invoice.name,
 					invoice_ninja_id=invoice.invoice_ninja_id,
-					invoice_ninja_company=invoice.invoice_ninja_company,
-					timeout=300,
-					is_async=True
-				)
-				checked_count += 1
-
-			except Exception as e:
-				frappe.log_error(
-					f"Error queuing payment check for invoice {invoice.name}: {str(e)}",
-					"Payment Check Queue Error"
-				)
+					invoice_ninja_company=company
+				):
+					invoice_jobs += 1
 
 		frappe.logger().info(
-			f"Queued payment checks for {checked_count} unpaid invoices"
+			f"Queued payment checks for {len(due)} due invoices: "
+			f"{discovery_jobs} discovery jobs, {invoice_jobs} invoice checks"
 		)
 
 	except Exception as e:
@@ -0,0 +1,256 @@
+"""
+Adaptive polling scheduler for Invoice Ninja Integration
+
+Replaces the fixed daily "100 records per type" sync. Every (company, entity
+type) pair is polled on its own interval, derived from the change rate
+observed on previous polls:
+
+- each poll syncs records updated since the pair's watermark, oldest first,
+  within a fixed time budget, and advances the watermark to the last record
+  written, so a poll that runs out of budget resumes where it stopped; the
+  watermark never moves past a record that failed to sync, so it is retried;
+- the interval aims for TARGET_CHANGES_PER_POLL changes per poll, so busy
+  pairs are polled every few minutes and idle ones back off to once a day;
+- a pair that is behind (budget exhausted) is polled again at the minimum
+  interval until it catches up.
+
+The dispatcher runs from cron and enqueues due pairs round-robin across
+companies, with a per-company cap per tick, so one busy company cannot
+starve the others. Polls go to the throttled bulk queue; pairs skipped
+while the queues are backed up stay due for the next tick. Reference data (customer groups, tax rates) has no
+delta API and is refreshed daily.
+"""
+
+import time
+
+import frappe
+
+from invoice_ninja_integration.utils.job_queues import enqueue_job
+from invoice_ninja_integration.utils.sync_scheduler import NODE_TIMEOUT, _node_key
+
+
+# Polling interval bounds (seconds)
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 24 * 60 * 60
+DEFAULT_INTERVAL = 60 * 60
+
+# Reference data is fully refreshed on this interval
+REFERENCE_INTERVAL = 24 * 60 * 60
+REFERENCE_ENTITIES = ["Customer Group", "Tax Rate"]
+
+# Changes a poll should pick up on average; drives the interval
+TARGET_CHANGES_PER_POLL = 50
+
+# Weight of the newest observation in the change-rate moving average
+CHANGE_RATE_ALPHA = 0.3
+
+# Work limits per poll
+POLL_TIME_BUDGET = 120
+MAX_RECORDS_PER_POLL = 5000
+
+# Fairness limits per dispatcher tick
+MAX_POLLS_PER_COMPANY = 2
+MAX_POLLS_PER_TICK = 20
+
+# Redis hash holding the poll state of every (company, entity) pair
+POLL_STATE_KEY = "invoice_ninja_poll_state"
+
+
+class AdaptivePollScheduler:
+	"""Schedules delta polls per (company, entity type) from observed change rates"""
+
+	@staticmethod
+	def get_state(invoice_ninja_company, entity_type):
+		"""
+		Get the poll state of a pair
+
+		Returns:
+			dict: {watermark, interval, change_rate, next_due, last_polled, last_changes, behind, dispatched_at}
+		"""
+		state = frappe.cache().hget(POLL_STATE_KEY, _node_key(invoice_ninja_company, entity_type))
+		return state or {
+			"watermark": None,
+			"interval": DEFAULT_INTERVAL,
+			"change_rate": None,
+			"next_due": 0,
+			"last_polled": None,
+			"last_changes": 0,
+			"behind": False,
+			"dispatched_at": None,
+		}
+
+	@staticmethod
+	def save_state(invoice_ninja_company, entity_type, state):
+		frappe.cache().hset(POLL_STATE_KEY, _node_key(invoice_ninja_company, entity_type), state)
+
+	@staticmethod
+	def get_due_polls(now=None):
+		"""
+		Pick the pairs to poll this tick, fairly across companies
+
+		Returns:
+			list: (invoice_ninja_company, entity_type) tuples in dispatch order
+		"""
+		from invoice_ninja_integration.tasks import get_enabled_entity_types
+
+		now = now or time.time()
+		settings = frappe.get_single("Invoice Ninja Settings")
+		entity_types = REFERENCE_ENTITIES + get_enabled_entity_types(settings)
+
+		due_by_company = {}
+		for company in frappe.get_all("Invoice Ninja Company", filters={"enabled": 1}, pluck="name"):
+			due = []
+			for entity_type in entity_types:
+				state = AdaptivePollScheduler.get_state(company, entity_type)
+
+				# Already dispatched and not finished yet
+				if state.get("dispatched_at") and now - state["dispatched_at"] < NODE_TIMEOUT:
+					continue
+
+				if state["next_due"] <= now:
+					# Most overdue (relative to its own interval) first
+					overdue = (now - state["next_due"]) / max(state["interval"], 1)
+					due.append((overdue, entity_type))
+
+			if due:
+				due.sort(reverse=True)
+				due_by_company[company] = [entity_type for _, entity_type in due[:MAX_POLLS_PER_COMPANY]]
+
+		# Round-robin: every company gets its most overdue pair before any gets a second
+		selected = []
+		for round_index in range(MAX_POLLS_PER_COMPANY):
+			for company, entities in due_by_company.items():
+				if round_index < len(entities):
+					selected.append((company, entities[round_index]))
+
+		return selected[:MAX_POLLS_PER_TICK]
+
+	@staticmethod
+	def dispatch():
+		"""Enqueue one poll job per due pair"""
+		now = time.time()
+
+		for company, entity_type in AdaptivePollScheduler.get_due_polls(now):
+			job = enqueue_job(
+				"invoice_ninja_integration.utils.adaptive_scheduler.run_poll",
+				"bulk",
+				job_id=f"invoice_ninja_poll::{_node_key(company, entity_type)}",
+				throttle=True,
+				timeout=NODE_TIMEOUT,
+				invoice_ninja_company=company,
+				entity_type=entity_type,
+			)
+			if not job:
+				# Throttled or already queued
+				continue
+
+			state = AdaptivePollScheduler.get_state(company, entity_type)
+			state["dispatched_at"] = now
+			AdaptivePollScheduler.save_state(company, entity_type, state)
+
+	@staticmethod
+	def next_interval(state, changes, elapsed, complete):
+		"""
+		Compute the change rate and interval after a poll
+
+		Args:
+			state: Poll state before the poll
+			changes: Records returned by the poll
+			elapsed: Seconds covered by the poll (since the previous poll)
+			complete: False if the poll ran out of budget
+
+		Returns:
+			tuple: (change_rate per second, interval in seconds)
+		"""
+		observed_rate = changes / max(elapsed, 1)
+		previous_rate = state.get("change_rate")
+		if previous_rate is None:
+			change_rate = observed_rate
+		else:
+			change_rate = CHANGE_RATE_ALPHA * observed_rate + (1 - CHANGE_RATE_ALPHA) * previous_rate
+
+		if not complete:
+			# Behind: keep polling until caught up
+			return change_rate, MIN_INTERVAL
+
+		if changes == 0:
+			# Idle: back off exponentially
+			interval = state["interval"] * 2
+		elif change_rate > 0:
+			interval = TARGET_CHANGES_PER_POLL / change_rate
+		else:
+			interval = state["interval"]
+
+		return change_rate, int(min(max(interval, MIN_INTERVAL), MAX_INTERVAL))
+
+
+def run_poll(invoice_ninja_company, entity_type):
+	"""
+	Background job: delta-sync one (company, entity type) pair and reschedule it
+
+	Args:
+		invoice_ninja_company: Name of Invoice Ninja Company doc
+		entity_type: Entity type to poll
+	"""
+	from invoice_ninja_integration.api import sync_company_entities
+	from invoice_ninja_integration.utils.sync_scheduler import _execute_node
+
+	cache = frappe.cache()
+	node = _node_key(invoice_ninja_company, entity_type)
+
+	# Shares the lock with scheduled runs so the same pair never syncs twice at once
+	lock = cache.lock(cache.make_key(f"invoice_ninja_sync_lock|{node}"), timeout=NODE_TIMEOUT)
+	state = AdaptivePollScheduler.get_state(invoice_ninja_company, entity_type)
+	if not lock.acquire(blocking=False):
+		# Another run is syncing the pair; it stays due and is dispatched again on a later tick
+		state["dispatched_at"] = None
+		AdaptivePollScheduler.save_state(invoice_ninja_company, entity_type, state)
+		return
+
+	started = time.time()
+
+	try:
+		if entity_type in REFERENCE_ENTITIES:
+			_execute_node(entity_type, invoice_ninja_company, None)
+			state.update({"interval": REFERENCE_INTERVAL, "last_changes": 0, "behind": False})
+		else:
+			result = sync_company_entities(
+				invoice_ninja_company,
+				entity_type,
+				limit=MAX_RECORDS_PER_POLL,
+				updated_since=state["watermark"] or 0,
+				time_budget=POLL_TIME_BUDGET,
+			)
+			if not result.get("success") and "total_fetched" not in result:
+				raise Exception(result.get("message") or "Poll failed")
+
+			changes = result.get("total_fetched", 0)
+			complete = result.get("complete", True)
+			elapsed = started - (state["last_polled"] or started - state["interval"])
+			change_rate, interval = AdaptivePollScheduler.next_interval(state, changes, elapsed, complete)
+
+			state.update({
+				"watermark": result.get("watermark") or state["watermark"],
+				"change_rate": change_rate,
+				"interval": interval,
+				"last_changes": changes,
+				"behind": not complete,
+			})
+	except Exception as e:
+		frappe.log_error(
+			f"Adaptive poll of {entity_type} failed for {invoice_ninja_company}: {e!s}", "Sync Scheduler Error"
+		)
+		# Retry later without touching the watermark
+		state["interval"] = min(max(state["interval"], MIN_INTERVAL) * 2, MAX_INTERVAL)
+	finally:
+		state.update({
+			"last_polled": started,
+			"next_due": started + state["interval"],
+			"dispatched_at": None,
+		})
+		AdaptivePollScheduler.save_state(invoice_ninja_company, entity_type, state)
+		try:
+			lock.release()
+		except Exception:
+			# Lock expired while the poll was running
+			pass
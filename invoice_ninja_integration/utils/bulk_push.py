@@ -0,0 +1,392 @@
+"""
+Bulk Push Engine for Invoice Ninja Integration
+
+Pushes large numbers of unsynced ERPNext records to Invoice Ninja. Records are
+loaded in name-ordered batches, grouped by Invoice Ninja Company, enriched with
+batch-loaded reference data and sent over a bounded thread pool that shares the
+pooled HTTP session of the company client. Returned IDs are written back with a
+single UPDATE per batch.
+
+Worker threads only perform HTTP calls; all database access (loading, mapping,
+write-back and error logging) happens on the calling thread.
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+from frappe.utils import now_datetime
+
+from invoice_ninja_integration.utils.company_mapper import CompanyMapper
+from invoice_ninja_integration.utils.entity_mapper import EntityMapper
+from invoice_ninja_integration.utils.field_mapper import FieldMapper
+from invoice_ninja_integration.utils.invoice_ninja_client import DEFAULT_POOL_SIZE, InvoiceNinjaClient
+
+
+class BulkPushEngine:
+	"""Bulk ERPNext to Invoice Ninja push with batch preloading and concurrent requests"""
+
+	# Parent fields needed to build the outbound payload
+	DOCTYPE_FIELDS = {
+		"Customer": [
+			"name", "invoice_ninja_company", "customer_name", "email_id", "mobile_no",
+			"website", "tax_id", "customer_details", "customer_type", "customer_group",
+		],
+		"Sales Invoice": [
+			"name", "invoice_ninja_company", "company", "customer", "posting_date", "due_date",
+			"remarks", "terms", "currency", "conversion_rate",
+		],
+		"Quotation": [
+			"name", "invoice_ninja_company", "company", "party_name", "transaction_date",
+			"valid_till", "terms", "currency", "conversion_rate",
+		],
+		"Item": ["name", "invoice_ninja_company", "item_code", "description", "item_name", "standard_rate"],
+		"Payment Entry": [
+			"name", "invoice_ninja_company", "company", "paid_amount", "posting_date",
+			"reference_no", "remarks",
+		],
+	}
+
+	# Child tables loaded in one query per batch: doctype -> (table field, child doctype, fields)
+	CHILD_TABLES = {
+		"Sales Invoice": (
+			"items", "Sales Invoice Item",
+			["item_code", "item_name", "description", "qty", "rate", "discount_percentage"],
+		),
+		"Quotation": (
+			"items", "Quotation Item",
+			["item_code", "item_name", "description", "qty", "rate", "discount_percentage"],
+		),
+		"Payment Entry": ("references", "Payment Entry Reference", ["reference_doctype", "reference_name"]),
+	}
+
+	# Additional filters for pushable records
+	BASE_FILTERS = {
+		"Sales Invoice": {"docstatus": 1},
+		"Quotation": {"status": ["!=", "Cancelled"]},
+		"Payment Entry": {"docstatus": 1},
+	}
+
+	DEFAULT_BATCH_SIZE = 500
+	DEFAULT_MAX_WORKERS = 8
+
+	def __init__(self, doc_type, max_workers=None, batch_size=None):
+		"""
+		Args:
+			doc_type: ERPNext doctype to push (Customer, Sales Invoice, Quotation, Item, Payment Entry)
+			max_workers: Concurrent requests per company (capped at the HTTP pool size)
+			batch_size: Records loaded and written back per batch
+		"""
+		if doc_type not in self.DOCTYPE_FIELDS:
+			frappe.throw(f"Bulk push is not supported for {doc_type}")
+
+		self.doc_type = doc_type
+		self.endpoint = EntityMapper.get_entity_config(doc_type)["invoice_ninja_endpoint"]
+		self.max_workers = min(max_workers or self.DEFAULT_MAX_WORKERS, DEFAULT_POOL_SIZE)
+		self.batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+		self.company_mapper = CompanyMapper()
+		self.clients = {}
+
+		# ERPNext company -> mapping, resolved once for the whole run
+		self.mappings = {m["erpnext_company"]: m for m in self.company_mapper.get_all_mappings()}
+		self.default_mapping = self.company_mapper.get_default_mapping()
+
+	def run(self, limit=100):
+		"""
+		Push up to `limit` unsynced records
+
+		Returns:
+			dict: {"synced": int, "failed": int, "total": int, "errors": list}
+		"""
+		stats = {"synced": 0, "failed": 0, "total": 0, "errors": []}
+		cursor = None
+		remaining = limit
+
+		while remaining > 0:
+			rows = self._load_batch(cursor, min(self.batch_size, remaining))
+			if not rows:
+				break
+
+			cursor = rows[-1].name
+			remaining -= len(rows)
+			stats["total"] += len(rows)
+
+			self._push_batch(rows, stats)
+
+		if stats["errors"]:
+			frappe.log_error(
+				f"{stats['failed']} of {stats['total']} {self.doc_type} records failed to push:\n"
+				+ "\n".join(stats["errors"][:100]),
+				"Bulk Push Error",
+			)
+
+		return stats
+
+	def _load_batch(self, cursor, size):
+		"""Load the next batch of unsynced records with their child rows"""
+		filters = {"invoice_ninja_id": ["is", "not set"]}
+		filters.update(self.BASE_FILTERS.get(self.doc_type, {}))
+		if cursor:
+			filters["name"] = [">", cursor]
+
+		rows = frappe.get_all(
+			self.doc_type,
+			filters=filters,
+			fields=self.DOCTYPE_FIELDS[self.doc_type],
+			order_by="name asc",
+			limit_page_length=size,
+		)
+
+		child_table = self.CHILD_TABLES.get(self.doc_type)
+		if rows and child_table:
+			table_field, child_doctype, child_fields = child_table
+			children = defaultdict(list)
+			for child in frappe.get_all(
+				child_doctype,
+				filters={"parenttype": self.doc_type, "parent": ["in", [r.name for r in rows]]},
+				fields=["parent", *child_fields],
+				order_by="parent asc, idx asc",
+			):
+				children[child.parent].append(child)
+
+			for row in rows:
+				row[table_field] = children.get(row.name, [])
+
+		return rows
+
+	def _push_batch(self, rows, stats):
+		"""Map, push and write back one batch of records"""
+		pushed = {}
+
+		for in_company_doc, company_rows in self._group_by_company(rows, stats).items():
+			mapping = frappe._dict(self._get_mapping_for_company_doc(in_company_doc))
+			prefetched = self._prefetch(company_rows, in_company_doc, mapping)
+
+			payloads = []
+			for row in company_rows:
+				try:
+					payload = self._map_row(row, prefetched)
+					if payload:
+						payloads.append((row.name, payload))
+					else:
+						self._record_failure(stats, row.name, "Could not map record")
+				except Exception as e:
+					self._record_failure(stats, row.name, str(e))
+
+			ids = self._post_concurrently(self._get_client(in_company_doc), payloads, stats)
+			pushed.update({name: (in_id, in_company_doc) for name, in_id in ids.items()})
+
+		if pushed:
+			self._write_back_ids(pushed)
+			stats["synced"] += len(pushed)
+
+	def _group_by_company(self, rows, stats):
+		"""Group rows by Invoice Ninja Company doc name"""
+		groups = defaultdict(list)
+
+		for row in rows:
+			in_company_doc = row.get("invoice_ninja_company")
+			if not in_company_doc:
+				mapping = self.mappings.get(row.get("company")) or self.default_mapping
+				in_company_doc = mapping and mapping["invoice_ninja_company_id"]
+
+			if not in_company_doc:
+				self._record_failure(stats, row.name, "No company mapping found")
+				continue
+
+			groups[in_company_doc].append(row)
+
+		return groups
+
+	def _get_mapping_for_company_doc(self, in_company_doc):
+		"""Get mapping dict for an Invoice Ninja Company doc"""
+		for mapping in self.mappings.values():
+			if mapping["invoice_ninja_company_id"] == in_company_doc:
+				return mapping
+
+		return {"invoice_ninja_company_id": in_company_doc}
+
+	def _get_client(self, in_company_doc):
+		"""Get cached client for an Invoice Ninja Company"""
+		if in_company_doc not in self.clients:
+			self.clients[in_company_doc] = InvoiceNinjaClient(invoice_ninja_company=in_company_doc)
+
+		return self.clients[in_company_doc]
+
+	def _prefetch(self, rows, in_company_doc, mapping):
+		"""
+		Batch-load reference data used by the payload mappers
+
+		Returns:
+			dict: Shared lookups plus per-record maps keyed by record name
+		"""
+		prefetched = {"company_mapping": mapping}
+
+		if self.doc_type == "Customer":
+			prefetched["group_ids"] = self._get_customer_group_ids(in_company_doc)
+			prefetched["addresses"] = self._get_primary_addresses([r.name for r in rows])
+
+		elif self.doc_type in ("Sales Invoice", "Quotation"):
+			party_field = "customer" if self.doc_type == "Sales Invoice" else "party_name"
+			customers = list({r.get(party_field) for r in rows if r.get(party_field)})
+			prefetched["client_ids"] = dict(
+				frappe.get_all(
+					"Customer",
+					filters={"name": ["in", customers]},
+					fields=["name", "invoice_ninja_id"],
+					as_list=True,
+				)
+			) if customers else {}
+
+		elif self.doc_type == "Payment Entry":
+			invoices = list({
+				ref.reference_name
+				for r in rows
+				for ref in r.references
+				if ref.reference_doctype == "Sales Invoice"
+			})
+			prefetched["invoice_ninja_ids"] = dict(
+				frappe.get_all(
+					"Sales Invoice",
+					filters={"name": ["in", invoices]},
+					fields=["name", "invoice_ninja_id"],
+					as_list=True,
+				)
+			) if invoices else {}
+
+		return prefetched
+
+	def _get_customer_group_ids(self, in_company_doc):
+		"""Map ERPNext Customer Group -> Invoice Ninja group_id for a company"""
+		group_mappings = frappe.get_all(
+			"Invoice Ninja Customer Group Mapping",
+			filters={"parenttype": "Invoice Ninja Company", "parent": in_company_doc},
+			fields=["customer_group", "invoice_ninja_customer_group"],
+		)
+		linked_groups = [m.invoice_ninja_customer_group for m in group_mappings if m.invoice_ninja_customer_group]
+		if not linked_groups:
+			return {}
+
+		group_ids = dict(
+			frappe.get_all(
+				"Invoice Ninja Customer Group",
+				filters={"name": ["in", linked_groups]},
+				fields=["name", "group_id"],
+				as_list=True,
+			)
+		)
+
+		return {
+			m.customer_group: group_ids.get(m.invoice_ninja_customer_group)
+			for m in group_mappings
+			if m.invoice_ninja_customer_group
+		}
+
+	def _get_primary_addresses(self, customer_names):
+		"""Map Customer name -> primary address row"""
+		if not customer_names:
+			return {}
+
+		addresses = frappe.db.sql("""
+			SELECT
+				dl.link_name,
+				addr.address_line1,
+				addr.address_line2,
+				addr.city,
+				addr.state,
+				addr.pincode,
+				addr.country
+			FROM `tabAddress` addr
+			INNER JOIN `tabDynamic Link` dl
+				ON dl.parent = addr.name AND dl.parenttype = 'Address'
+			WHERE dl.link_doctype = 'Customer'
+				AND dl.link_name IN %(customers)s
+				AND addr.is_primary_address = 1
+		""", {"customers": tuple(customer_names)}, as_dict=True)
+
+		return {address.link_name: address for address in addresses}
+
+	def _map_row(self, row, prefetched):
+		"""Build the Invoice Ninja payload for one row"""
+		if self.doc_type == "Customer":
+			return FieldMapper.map_customer_to_invoice_ninja(row, prefetched={
+				"company_mapping": prefetched["company_mapping"],
+				"group_id": prefetched["group_ids"].get(row.customer_group),
+				"address": prefetched["addresses"].get(row.name),
+			})
+		elif self.doc_type == "Sales Invoice":
+			return FieldMapper.map_invoice_to_invoice_ninja(row, prefetched={
+				"company_mapping": prefetched["company_mapping"],
+				"client_id": prefetched["client_ids"].get(row.customer),
+			})
+		elif self.doc_type == "Quotation":
+			return FieldMapper.map_quotation_to_invoice_ninja(row, prefetched={
+				"company_mapping": prefetched["company_mapping"],
+				"client_id": prefetched["client_ids"].get(row.party_name),
+			})
+		elif self.doc_type == "Item":
+			return FieldMapper.map_item_to_invoice_ninja(row)
+		elif self.doc_type == "Payment Entry":
+			return FieldMapper.map_payment_to_invoice_ninja(row, prefetched=prefetched)
+
+	def _post_concurrently(self, client, payloads, stats):
+		"""
+		POST payloads over a bounded thread pool
+
+		Returns:
+			dict: Record name -> Invoice Ninja ID for successful creates
+		"""
+		ids = {}
+		if not payloads:
+			return ids
+
+		def push(item):
+			name, payload = item
+			return name, client.post(self.endpoint, data=payload, log_errors=False)
+
+		with ThreadPoolExecutor(max_workers=min(self.max_workers, len(payloads))) as executor:
+			for name, result in executor.map(push, payloads):
+				if not result or result.get("error"):
+					self._record_failure(stats, name, (result or {}).get("message", "Empty response"))
+					continue
+
+				record = result.get("data") or result
+				if record.get("id"):
+					ids[name] = record["id"]
+				else:
+					self._record_failure(stats, name, "No ID returned")
+
+		return ids
+
+	def _write_back_ids(self, pushed):
+		"""
+		Write Invoice Ninja IDs back with a single UPDATE
+
+		Args:
+			pushed: dict of record name -> (invoice_ninja_id, Invoice Ninja Company doc name)
+		"""
+		names = list(pushed)
+		cases = " ".join(["WHEN %s THEN %s"] * len(names))
+
+		values = [v for name in names for v in (name, pushed[name][0])]
+		values += [v for name in names for v in (name, pushed[name][1])]
+		values.append(now_datetime())
+		values += names
+
+		frappe.db.sql(f"""
+			UPDATE `tab{self.doc_type}`
+			SET
+				invoice_ninja_id = CASE name {cases} END,
+				invoice_ninja_company = CASE name {cases} END,
+				invoice_ninja_sync_status = 'Synced',
+				invoice_ninja_last_sync = %s
+			WHERE name IN ({", ".join(["%s"] * len(names))})
+		""", values)
+
+		frappe.db.commit()
+
+	@staticmethod
+	def _record_failure(stats, name, message):
+		"""Track a failed record"""
+		stats["failed"] += 1
+		stats["errors"].append(f"{name}: {message}")
@@ -0,0 +1,68 @@
+"""
+Per-field change sets for inbound updates
+
+When a record's mapped hash changes, its per-field hashes (stored in the sync
+state) tell exactly which mapped fields changed. Fields that no validation or
+hook depends on are written with one multi-field set_value; the full
+doc.save(), with every validation and hook, only runs when a validated field
+is in the change set or the previous field hashes are unknown.
+"""
+
+import frappe
+
+
+# Doctype -> mapped fields that are safe to write without running validations or hooks
+DIRECT_WRITE_FIELDS = {
+	"Customer": {"website", "tax_id", "customer_details", "invoice_ninja_sync_status"},
+	"Item": {"description", "invoice_ninja_sync_status"},
+}
+
+
+def get_change_set(stored_field_hashes, field_hashes):
+	"""
+	Mapped fields whose value changed since the last sync
+
+	Fields no longer mapped are not part of the change set, so they keep their
+	value like in a full update.
+
+	Args:
+		stored_field_hashes: Field hashes stored at the last sync, or None
+		field_hashes: SyncHashManager.calculate_field_hashes() of the new mapped data
+
+	Returns:
+		list: Changed fields, or None if the stored field hashes are unknown
+	"""
+	if not stored_field_hashes:
+		return None
+
+	return [field for field, value in field_hashes.items() if stored_field_hashes.get(field) != value]
+
+
+def update_changed_fields(doctype, name, doc_data, changed=None, save_kwargs=None):
+	"""
+	Write the changed mapped fields of an existing document
+
+	Args:
+		doctype: ERPNext doctype
+		name: Document name
+		doc_data: Mapped document data
+		changed: get_change_set() result; None saves every mapped field
+		save_kwargs: Keyword arguments of doc.save()
+
+	Returns:
+		Document: The saved document, or None if the change set was written directly
+	"""
+	if changed is not None:
+		meta = frappe.get_meta(doctype)
+		changed = [field for field in changed if meta.has_field(field)]
+		if set(changed) <= DIRECT_WRITE_FIELDS.get(doctype, set()):
+			if changed:
+				frappe.db.set_value(doctype, name, {field: doc_data[field] for field in changed})
+			return None
+
+	doc = frappe.get_doc(doctype, name)
+	for key in changed if changed is not None else doc_data:
+		if key != "doctype" and hasattr(doc, key):
+			setattr(doc, key, doc_data[key])
+	doc.save(**(save_kwargs or {}))
+	return doc
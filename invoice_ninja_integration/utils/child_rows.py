@@ -0,0 +1,73 @@
+"""
+Keyed child-table diffing for inbound document updates
+
+Instead of clearing a child table and appending every row again, incoming rows
+are matched to the existing rows on their Invoice Ninja line identity (the
+line item's _id). Rows without one, including rows synced before the identity
+was stored, are matched by position. Matched rows keep their name and only get
+the fields that changed; unmatched incoming rows are inserted and leftover
+existing rows are removed when the parent is saved.
+"""
+
+from frappe.utils import cstr, flt
+
+
+# Incoming keys that are not compared
+IGNORED_FIELDS = ("doctype", "idx")
+
+
+def sync_child_rows(doc, fieldname, rows, key_field="invoice_ninja_line_id"):
+	"""
+	Apply mapped child rows to a document's child table in place
+
+	Args:
+		doc: Parent document (saved by the caller)
+		fieldname: Child table field, e.g. "items"
+		rows: Mapped child row dicts in their new order
+		key_field: Child field holding the Invoice Ninja line identity
+
+	Returns:
+		dict: {"inserted": int, "updated": int, "deleted": int, "unchanged": int}
+	"""
+	by_line_id = {}
+	by_position = {}
+	for row in doc.get(fieldname) or []:
+		if row.get(key_field):
+			by_line_id.setdefault(cstr(row.get(key_field)), []).append(row)
+		else:
+			by_position[row.idx] = row
+
+	counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+	table = []
+	for idx, values in enumerate(rows, 1):
+		matches = by_line_id.get(cstr(values.get(key_field)))
+		row = matches.pop(0) if matches else by_position.pop(values.get("idx") or idx, None)
+		if row is None:
+			table.append(values)
+			counts["inserted"] += 1
+			continue
+
+		changed = [
+			field for field, value in values.items()
+			if field not in IGNORED_FIELDS and _differs(row.get(field), value)
+		]
+		for field in changed:
+			row.set(field, values[field])
+
+		counts["updated" if changed else "unchanged"] += 1
+		table.append(row)
+
+	counts["deleted"] = len(by_position) + sum(len(rows_left) for rows_left in by_line_id.values())
+
+	# Existing rows keep their name, so the save updates them instead of reinserting
+	doc.set(fieldname, table)
+	for idx, row in enumerate(doc.get(fieldname), 1):
+		row.idx = idx
+
+	return counts
+
+
+def _differs(current, new):
+	if isinstance(new, (int, float)) and not isinstance(new, bool):
+		return flt(current) != flt(new)
+	return cstr(current) != cstr(new)
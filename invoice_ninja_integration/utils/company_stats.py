@@ -0,0 +1,83 @@
+"""
+Atomic sync counters on Invoice Ninja Company
+
+The per-company counters (records synced per entity type, total synced
+records, failed syncs) used to be updated with a read-modify-write of the
+whole company document, so concurrent sync jobs lost each other's updates
+and every call rewrote the company and its child tables.
+
+A CompanySyncStats accumulator collects the counts of one sync run in
+memory and flushes them once, as a single UPDATE that increments the
+counters in SQL. Concurrent jobs of the same company never overwrite each
+other, and the company document (and its modified timestamp) is left alone.
+"""
+
+import frappe
+from frappe.utils import now
+
+
+# Entity type -> Invoice Ninja Company counter
+ENTITY_COUNTERS = {
+	"Customer": "customers_synced",
+	"Sales Invoice": "invoices_synced",
+	"Quotation": "quotations_synced",
+	"Item": "items_synced",
+	"Payment Entry": "payments_synced",
+}
+
+
+class CompanySyncStats:
+	"""Counter increments of one sync run of an Invoice Ninja Company"""
+
+	def __init__(self, invoice_ninja_company):
+		self.invoice_ninja_company = invoice_ninja_company
+		# Counter field -> increment
+		self.increments = {}
+		self.last_sync_status = None
+
+	def add(self, entity_type, count, status=None):
+		"""
+		Count synced records of an entity type
+
+		Args:
+			entity_type: Synced entity type
+			count: Number of records synced
+			status: Sync status (Success, Partial, Failed); a failed sync is counted once
+		"""
+		counters = ["total_synced_records"]
+		if entity_type in ENTITY_COUNTERS:
+			counters.append(ENTITY_COUNTERS[entity_type])
+
+		for field in counters:
+			self.increments[field] = self.increments.get(field, 0) + int(count or 0)
+
+		if status:
+			self.last_sync_status = status
+			if status == "Failed":
+				self.increments["failed_syncs_count"] = self.increments.get("failed_syncs_count", 0) + 1
+
+	def flush(self):
+		"""Apply the accumulated increments and last sync status with one atomic UPDATE"""
+		if not self.last_sync_status and not any(self.increments.values()):
+			return
+
+		assignments = ["last_sync_time = %(now)s"]
+		values = {"name": self.invoice_ninja_company, "now": now()}
+
+		for field, increment in self.increments.items():
+			if increment:
+				assignments.append(f"`{field}` = COALESCE(`{field}`, 0) + %({field})s")
+				values[field] = increment
+
+		if self.last_sync_status:
+			assignments.append("last_sync_status = %(last_sync_status)s")
+			values["last_sync_status"] = self.last_sync_status
+
+		frappe.db.sql(f"""
+			UPDATE `tabInvoice Ninja Company`
+			SET {", ".join(assignments)}
+			WHERE name = %(name)s
+		""", values)
+
+		self.increments = {}
+		self.last_sync_status = None
@@ -0,0 +1,164 @@
+"""
+Cached dashboard statistics
+
+The dashboard polls its statistics, recent activity and sync logs every 30
+seconds per open browser. Instead of counting the synced Sales Invoices and
+Customers on every poll:
+
+- the totals are Redis counters, seeded with one count when missing and
+  incremented by the sync pipeline as records are created; they expire
+  periodically so deletions and out-of-band inserts are picked up;
+- pending and overdue invoices are counted with one grouped query;
+- each composite result (stats, activity, logs) is cached for a few seconds
+  with an ETag, so every poller shares one computation and a client that
+  already has the current payload gets a "not modified" answer instead.
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe.utils import cint, today
+
+
+# Doctype -> dashboard counter
+COUNTERS = {
+	"Sales Invoice": "totalInvoices",
+	"Customer": "totalClients",
+}
+
+# Seconds before counters are reseeded from the database
+COUNTER_EXPIRY = 6 * 60 * 60
+
+# Seconds composite results are cached
+STATS_EXPIRY = 30
+LOGS_EXPIRY = 15
+
+# Maximum number of log rows a poller may request
+MAX_RECENT_LOGS = 50
+
+STATS_KEY = "invoice_ninja_dashboard_stats"
+LOGS_KEY = "invoice_ninja_dashboard_logs"
+
+
+def _counter_key(counter):
+	# Stored as raw integers (not pickled) so they can be incremented atomically
+	return frappe.cache().make_key(f"invoice_ninja_dashboard_counter|{counter}")
+
+
+def get_counter(doctype):
+	"""Number of synced documents of a doctype, seeded from the database when missing"""
+	cache = frappe.cache()
+	key = _counter_key(COUNTERS[doctype])
+
+	value = cache.get(key)
+	if value is None:
+		count = frappe.db.count(doctype, {"invoice_ninja_id": ["!=", ""]})
+		# Another worker may have seeded (and incremented) it meanwhile
+		cache.set(key, count, ex=COUNTER_EXPIRY, nx=True)
+		value = cache.get(key)
+
+	return int(value or 0)
+
+
+def increment_counter(doctype, amount):
+	"""
+	Count newly synced documents; called by the sync pipeline
+
+	Args:
+		doctype: Synced doctype; doctypes without a dashboard counter are ignored
+		amount: Number of documents created
+	"""
+	if doctype not in COUNTERS or not amount:
+		return
+
+	cache = frappe.cache()
+	key = _counter_key(COUNTERS[doctype])
+	# An unseeded counter is seeded with the full count on its next read. The key is
+	# already prefixed, so it is checked with the raw get rather than cache.exists
+	if cache.get(key) is not None:
+		cache.incrby(key, amount)
+	cache.delete_value(STATS_KEY)
+
+
+def get_stats():
+	"""
+	Dashboard statistics, shared by every poller for STATS_EXPIRY seconds
+
+	Returns:
+		dict: {"data": stats dict, "etag": str}
+	"""
+	cached = frappe.cache().get_value(STATS_KEY)
+	if cached:
+		return cached
+
+	outstanding = frappe.db.sql("""
+		SELECT COUNT(*) AS pending,
+			SUM(status != 'Draft' AND due_date < %s) AS overdue
+		FROM `tabSales Invoice`
+		WHERE invoice_ninja_id != ''
+		AND status IN ('Draft', 'Unpaid', 'Partially Paid')
+	""", (today(),), as_dict=True)[0]
+
+	data = {
+		"totalInvoices": get_counter("Sales Invoice"),
+		"totalClients": get_counter("Customer"),
+		"pendingPayments": int(outstanding.pending or 0),
+		"overdueInvoices": int(outstanding.overdue or 0),
+		"lastSyncTime": frappe.db.get_value(
+			"Invoice Ninja Sync Logs",
+			{"status": "Success"},
+			"creation",
+			order_by="creation desc"
+		),
+		"syncStatus": "idle",
+	}
+
+	return _cache_result(STATS_KEY, data, STATS_EXPIRY)
+
+
+def get_recent_logs(limit):
+	"""
+	Most recent sync log rows, shared by every poller for LOGS_EXPIRY seconds
+
+	Args:
+		limit: Number of rows, clamped to 1..MAX_RECENT_LOGS
+
+	Returns:
+		dict: {"data": list of log rows, "etag": str}
+	"""
+	limit = min(max(cint(limit), 1), MAX_RECENT_LOGS)
+	key = f"{LOGS_KEY}|{limit}"
+	cached = frappe.cache().get_value(key)
+	if cached:
+		return cached
+
+	logs = frappe.db.get_all(
+		"Invoice Ninja Sync Logs",
+		fields=["name", "sync_type", "entity_type", "status", "message", "creation"],
+		order_by="creation desc",
+		limit=limit
+	)
+
+	return _cache_result(key, logs, LOGS_EXPIRY)
+
+
+def conditional(result, etag=None):
+	"""
+	Conditional response for a cached result
+
+	Returns:
+		dict: {"etag", "data"}, or {"etag", "not_modified": True} if the client has it already
+	"""
+	if etag and etag == result["etag"]:
+		return {"etag": result["etag"], "not_modified": True}
+	return result
+
+
+def _cache_result(key, data, expires_in_sec):
+	result = {
+		"data": data,
+		"etag": hashlib.md5(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest(),
+	}
+	frappe.cache().set_value(key, result, expires_in_sec=expires_in_sec)
+	return result
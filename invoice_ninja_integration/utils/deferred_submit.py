@@ -0,0 +1,255 @@
+"""
+Deferred submission of synced documents
+
+Submitting posts GL entries and runs ledger validation, which costs far more
+than inserting the draft. With "Submit in Background" on, inbound sync only
+inserts drafts and flags them (invoice_ninja_submit_status = Queued); the
+submission worker then submits them in batches on its own queue:
+
+- invoices first, then quotations, then payments, so payments are never
+  submitted against draft invoices; a payment whose invoice is still a draft
+  stays queued for the next batch, and is marked Failed once that invoice
+  failed to submit;
+- each document is submitted under a savepoint, and the outcome (Submitted,
+  or Failed with its error) is written back with one UPDATE per batch.
+
+The worker is enqueued after every sync transaction that queued a document,
+and the cron safety net picks up anything left when it runs out of time.
+"""
+
+import time
+
+import frappe
+
+from invoice_ninja_integration.utils.job_queues import enqueue_job
+
+
+# Submission order: documents are submitted before the documents that reference them
+SUBMIT_ORDER = ["Sales Invoice", "Quotation", "Payment Entry"]
+
+# Doctype -> Invoice Ninja Settings checkbox that enables its auto submit
+AUTO_SUBMIT_SETTINGS = {
+	"Sales Invoice": "auto_submit_invoices",
+	"Quotation": "auto_submit_quotations",
+	"Payment Entry": "auto_submit_payments",
+}
+
+SUBMIT_BATCH_SIZE = 50
+
+# Seconds per worker run; the rest is picked up by the next run
+SUBMIT_TIME_BUDGET = 900
+
+WORKER_JOB_ID = "invoice_ninja_submit_queued_documents"
+
+
+def submit_or_defer(doc):
+	"""
+	Submit a freshly synced draft if auto submit is on for its doctype
+
+	With "Submit in Background" on, the draft is queued for the submission
+	worker instead of being submitted inline.
+
+	Args:
+		doc: Inserted draft document (Sales Invoice, Quotation or Payment Entry)
+
+	Returns:
+		str: "submitted", "queued", or None if auto submit is off
+	"""
+	settings = frappe.get_cached_doc("Invoice Ninja Settings")
+	if not settings.get(AUTO_SUBMIT_SETTINGS[doc.doctype]):
+		return None
+
+	if not settings.get("defer_submission"):
+		doc.submit()
+		return "submitted"
+
+	doc.db_set("invoice_ninja_submit_status", "Queued", update_modified=False)
+	enqueue_submission_worker()
+	return "queued"
+
+
+def enqueue_submission_worker():
+	"""Start the submission worker once the current transaction commits"""
+	enqueue_job(
+		"invoice_ninja_integration.utils.deferred_submit.submit_queued_documents",
+		"submission",
+		job_id=WORKER_JOB_ID,
+		enqueue_after_commit=True,
+	)
+
+
+def submit_queued_documents():
+	"""Background job: submit queued drafts in batches, invoices before payments"""
+	cache = frappe.cache()
+	lock = cache.lock(cache.make_key(WORKER_JOB_ID), timeout=SUBMIT_TIME_BUDGET * 2)
+	if not lock.acquire(blocking=False):
+		return
+
+	started = time.monotonic()
+	totals = {"submitted": 0, "failed": 0}
+
+	try:
+		for doctype in SUBMIT_ORDER:
+			if doctype == "Payment Entry":
+				totals["failed"] += fail_blocked_payments()
+
+			while time.monotonic() - started < SUBMIT_TIME_BUDGET:
+				names = get_submittable(doctype)
+				if not names:
+					break
+
+				outcome = submit_batch(doctype, names)
+				totals["submitted"] += len(outcome["submitted"])
+				totals["failed"] += len(outcome["failed"])
+	finally:
+		try:
+			lock.release()
+		except Exception:
+			# Lock expired while the worker was running
+			pass
+
+	if totals["submitted"] or totals["failed"]:
+		frappe.logger().info(
+			f"Deferred submission: {totals['submitted']} submitted, {totals['failed']} failed "
+			f"in {time.monotonic() - started:.1f}s"
+		)
+
+	return totals
+
+
+def get_submittable(doctype, limit=SUBMIT_BATCH_SIZE):
+	"""
+	Next batch of queued drafts of a doctype that can be submitted now
+
+	Payments referencing an invoice that is still a draft are held back.
+
+	Returns:
+		list: Document names, oldest first
+	"""
+	if doctype == "Payment Entry":
+		return frappe.db.sql_list("""
+			SELECT pe.name
+			FROM `tabPayment Entry` pe
+			WHERE pe.docstatus = 0
+			AND pe.invoice_ninja_submit_status = 'Queued'
+			AND NOT EXISTS (
+				SELECT 1
+				FROM `tabPayment Entry Reference` ref
+				INNER JOIN `tabSales Invoice` si ON si.name = ref.reference_name
+				WHERE ref.parent = pe.name
+				AND ref.parenttype = 'Payment Entry'
+				AND ref.reference_doctype = 'Sales Invoice'
+				AND si.docstatus = 0
+			)
+			ORDER BY pe.creation
+			LIMIT %s
+		""", (limit,))
+
+	return frappe.get_all(
+		doctype,
+		filters={"docstatus": 0, "invoice_ninja_submit_status": "Queued"},
+		order_by="creation asc",
+		limit=limit,
+		pluck="name",
+	)
+
+
+def fail_blocked_payments():
+	"""
+	Mark queued payments whose referenced invoice failed to submit as Failed
+
+	Such payments are held back by get_submittable and would otherwise stay
+	queued forever.
+
+	Returns:
+		int: Number of payments marked Failed
+	"""
+	names = frappe.db.sql_list("""
+		SELECT DISTINCT pe.name
+		FROM `tabPayment Entry` pe
+		INNER JOIN `tabPayment Entry Reference` ref
+			ON ref.parent = pe.name
+			AND ref.parenttype = 'Payment Entry'
+			AND ref.reference_doctype = 'Sales Invoice'
+		INNER JOIN `tabSales Invoice` si ON si.name = ref.reference_name
+		WHERE pe.docstatus = 0
+		AND pe.invoice_ninja_submit_status = 'Queued'
+		AND si.docstatus = 0
+		AND si.invoice_ninja_submit_status = 'Failed'
+	""")
+	if not names:
+		return 0
+
+	outcome = {"submitted": [], "failed": {name: "Referenced invoice failed to submit" for name in names}}
+	_record_outcome("Payment Entry", outcome)
+	frappe.db.commit()
+
+	frappe.log_error(
+		f"{len(names)} queued Payment Entry documents reference an invoice that failed to submit:\n"
+		+ "\n".join(names),
+		"Deferred Submission Error"
+	)
+	return len(names)
+
+
+def submit_batch(doctype, names):
+	"""
+	Submit a batch of drafts and record each outcome
+
+	Returns:
+		dict: {"submitted": [names], "failed": {name: error}}
+	"""
+	outcome = {"submitted": [], "failed": {}}
+
+	for name in names:
+		frappe.db.savepoint("invoice_ninja_deferred_submit")
+		try:
+			frappe.get_doc(doctype, name).submit()
+			outcome["submitted"].append(name)
+		except Exception as e:
+			frappe.db.rollback(save_point="invoice_ninja_deferred_submit")
+			frappe.clear_messages()
+			outcome["failed"][name] = str(e)[:500] or type(e).__name__
+
+	_record_outcome(doctype, outcome)
+	frappe.db.commit()
+
+	if outcome["failed"]:
+		frappe.log_error(
+			f"{len(outcome['failed'])} of {len(names)} queued {doctype} documents failed to submit:\n"
+			+ "\n".join(f"{name}: {error}" for name, error in outcome["failed"].items()),
+			"Deferred Submission Error"
+		)
+
+	return outcome
+
+
+def _record_outcome(doctype, outcome):
+	"""Write the submission outcome of a batch with one UPDATE"""
+	names = outcome["submitted"] + list(outcome["failed"])
+	if not names:
+		return
+
+	if not outcome["failed"]:
+		assignments = "invoice_ninja_submit_status = 'Submitted', invoice_ninja_submit_error = NULL"
+		params = []
+	else:
+		failed_cases = " ".join(["WHEN %s THEN %s"] * len(outcome["failed"]))
+		assignments = (
+			f"invoice_ninja_submit_status = CASE WHEN name IN ({_placeholders(outcome['failed'])}) "
+			f"THEN 'Failed' ELSE 'Submitted' END, "
+			f"invoice_ninja_submit_error = CASE name {failed_cases} ELSE NULL END"
+		)
+		params = list(outcome["failed"])
+		for name, error in outcome["failed"].items():
+			params += [name, error]
+
+	frappe.db.sql(f"""
+		UPDATE `tab{doctype}`
+		SET {assignments}
+		WHERE name IN ({_placeholders(names)})
+	""", (*params, *names))
+
+
+def _placeholders(values):
+	return ", ".join(["%s"] * len(values))
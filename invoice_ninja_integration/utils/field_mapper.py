@@ -2,7 +2,6 @@ import re
 
 import frappe
 from frappe.utils import cint, flt, get_datetime, now_datetime, nowdate
-import json
 from erpnext.setup.utils import get_exchange_rate
 
 
@@ -363,6 +362,8 @@ class FieldMapper:
 			in_invoice: Invoice Ninja invoice data
 			invoice_ninja_company: Invoice_Ninja Company doc name for linking
 		"""
+		from invoice_ninja_integration.utils.task_linker import upsert_inline_tasks
+
 		# Get company mapping - use Invoice Ninja Company from sync context
 		if invoice_ninja_company:
 			company_mapping = FieldMapper.get_company_mapping_by_invoice_ninja_company_doc(
@@ -458,10 +459,13 @@ class FieldMapper:
 		if in_invoice.get("public_notes"):
 			invoice_data["other_charges_calculation"] = in_invoice.get("public_notes")
 
-		# Map line items
+		# Map line items (Items are resolved and created in one batch unless the page already did)
 		line_items = in_invoice.get("line_items", [])
+		FieldMapper.prepare_line_items(line_items, invoice_ninja_company)
+		upsert_inline_tasks(line_items, invoice_ninja_company)
+		default_uom = FieldMapper.get_default_product_uom(invoice_ninja_company)
 		for idx, item in enumerate(line_items, 1):
-			item_data = FieldMapper.map_invoice_item(item, idx, invoice_ninja_company)
+			item_data = FieldMapper.map_invoice_item(item, idx, invoice_ninja_company, default_uom)
 			if item_data:
 				invoice_data["items"].append(item_data)
 
@@ -473,78 +477,41 @@ class FieldMapper:
 		return invoice_data
 
 	@staticmethod
-	def map_invoice_item(in_item, idx, invoice_ninja_company=None):
-		"""Map Invoice Ninja line item to ERPNext item - supports task-based items"""
+	def map_invoice_item(in_item, idx, invoice_ninja_company=None, default_uom=None):
+		"""
+		Map Invoice Ninja line item to ERPNext item - supports task-based items
+
+		The line item's Item is resolved (and created if missing) by prepare_line_items;
+		default_uom is passed in by the caller so it is read once per document.
+		"""
 		try:
 			# Get default UOM for this company
-			default_uom = FieldMapper.get_default_product_uom(invoice_ninja_company)
+			default_uom = default_uom or FieldMapper.get_default_product_uom(invoice_ninja_company)
 
-			# Check if this line item is task-based
-			task_id = in_item.get('task_id')
+			item_code = in_item.get("erpnext_item_code")
+			if not item_code:
+				FieldMapper.prepare_line_items([in_item], invoice_ninja_company)
+				item_code = in_item["erpnext_item_code"]
 
-			if task_id:
-				# Create/sync task inline if it doesn't exist
-				task_data = in_item.get('task')  # Invoice Ninja can include task data
-				if task_data:
-					FieldMapper.sync_task_inline(task_data, invoice_ninja_company)
+			item_data = {
+				"doctype": "Sales Invoice Item",
+				"idx": idx,
+				"invoice_ninja_line_id": str(in_item.get("_id") or ""),
+				"item_code": item_code,
+				"item_name": in_item.get("notes") or in_item.get("product_key") or "Service Item",
+				"description": in_item.get("notes") or "",
+				"qty": flt(in_item.get("quantity")) or 1.0,
+				"rate": flt(in_item.get("cost")) or 0.0,
+				"amount": flt(in_item.get("quantity", 1)) * flt(in_item.get("cost", 0)),
+				"uom": default_uom,
+			}
 
+			# Check if this line item is task-based (inline tasks are upserted per page or document)
+			task_id = in_item.get('task_id')
+			if task_id:
 				# Map line item with task reference
-				item_code = FieldMapper.get_or_create_item(in_item)
-
-				# If item doesn't exist, create it
-				if not frappe.db.exists("Item", item_code):
-					item_doc = frappe.get_doc({
-						"doctype": "Item",
-						"item_code": item_code,
-						"item_name": in_item.get("notes") or in_item.get("product_key") or "Unknown Item",
-						"item_group": "Products",
-						"stock_uom": default_uom,
-						"is_stock_item": 0
-					})
-					item_doc.insert(ignore_permissions=True)
-					frappe.db.commit()
-
-				item_data = {
-					"doctype": "Sales Invoice Item",
-					"idx": idx,
-					"item_code": item_code,
-					"item_name": in_item.get("notes") or in_item.get("product_key") or "Service Item",
-					"description": in_item.get("notes") or "",
-					"qty": flt(in_item.get("quantity")) or 1.0,
-					"rate": flt(in_item.get("cost")) or 0.0,
-					"amount": flt(in_item.get("quantity", 1)) * flt(in_item.get("cost", 0)),
-					"uom": default_uom,
-					"invoice_ninja_task_id": str(task_id),
-					"custom_is_task_based": 1,
-				}
-			else:
-				# Regular product-based line item
-				item_code = FieldMapper.get_or_create_item(in_item)
-
-				# If item doesn't exist, create it
-				if not frappe.db.exists("Item", item_code):
-					item_doc = frappe.get_doc({
-						"doctype": "Item",
-						"item_code": item_code,
-						"item_name": in_item.get("notes") or in_item.get("product_key") or "Unknown Item",
-						"item_group": "Products",
-						"stock_uom": default_uom,
-						"is_stock_item": 0
-					})
-					item_doc.insert(ignore_permissions=True)
-					frappe.db.commit()
-
-				item_data = {
-					"doctype": "Sales Invoice Item",
-					"idx": idx,
-					"item_code": item_code,
-					"item_name": in_item.get("notes") or in_item.get("product_key") or "Service Item",
-					"description": in_item.get("notes") or "",
-					"qty": flt(in_item.get("quantity")) or 1.0,
-					"rate": flt(in_item.get("cost")) or 0.0,
-					"amount": flt(in_item.get("quantity", 1)) * flt(in_item.get("cost", 0)),
-					"uom": default_uom,
-				}
+				item_data["invoice_ninja_task_id"] = str(task_id)
+				item_data["custom_is_task_based"] = 1
 
 			return item_data
 
@@ -619,27 +586,33 @@ class FieldMapper:
 			"items": [],
 		}
 
-		# Map line items
+		# Map line items (Items are resolved and created in one batch unless the page already did)
 		line_items = in_quote.get("line_items", [])
+		FieldMapper.prepare_line_items(line_items, invoice_ninja_company)
+		default_uom = FieldMapper.get_default_product_uom(invoice_ninja_company)
 		for idx, item in enumerate(line_items, 1):
-			item_data = FieldMapper.map_quotation_item(item, idx, invoice_ninja_company)
+			item_data = FieldMapper.map_quotation_item(item, idx, invoice_ninja_company, default_uom)
 			if item_data:
 				quote_data["items"].append(item_data)
 
 		return quote_data
 
 	@staticmethod
-	def map_quotation_item(in_item, idx, invoice_ninja_company=None):
+	def map_quotation_item(in_item, idx, invoice_ninja_company=None, default_uom=None):
 		"""Map Invoice Ninja quote item to ERPNext quotation item"""
 		try:
 			# Get default UOM for this company
-			default_uom = FieldMapper.get_default_product_uom(invoice_ninja_company)
+			default_uom = default_uom or FieldMapper.get_default_product_uom(invoice_ninja_company)
 
-			item_code = FieldMapper.get_or_create_item(in_item)
+			item_code = in_item.get("erpnext_item_code")
+			if not item_code:
+				FieldMapper.prepare_line_items([in_item], invoice_ninja_company)
+				item_code = in_item["erpnext_item_code"]
 
 			item_data = {
 				"doctype": "Quotation Item",
 				"idx": idx,
+				"invoice_ninja_line_id": str(in_item.get("_id") or ""),
 				"item_code": item_code,
 				"item_name": in_item.get("notes") or in_item.get("product_key") or "Service Item",
 				"description": in_item.get("notes") or "",
@@ -711,59 +684,109 @@ class FieldMapper:
 			return "Nos"  # Fallback on any error
 
 	@staticmethod
-	def get_or_create_item(in_item):
-		"""Get existing item or create item code for line item"""
+	def prepare_line_items(line_items, invoice_ninja_company=None):
+		"""
+		Resolve the ERPNext Item of every line item with one query, creating the missing ones
 
-		# Debug logging to identify Invoice Ninja line item structure
-		frappe.log_error(
-			f"Line item structure: {json.dumps(in_item, indent=2)}",
-			"Invoice Line Item Debug"
-		)
+		Each line item gets its item code in "erpnext_item_code". Line items are
+		matched, in order, by Invoice Ninja product ID, by product_key (item code, as
+		the database compares it: case-insensitive, ignoring trailing spaces),
+		then to the generic "SERVICE" item when they have no product_key. Unmatched
+		product keys become new Items; description-only lines get a generated code.
 
-		# Strategy 1: Look up by Invoice Ninja product ID
-		# Invoice Ninja line items may have product references in various fields
-		product_id = (
-			in_item.get("product_cost")  # Common field name
-			or in_item.get("product_id")  # Alternative field name
-			or in_item.get("id")  # Some line items have their own ID
-		)
+		Only the lookups are batched: each missing Item is still inserted as a
+		document, since Item validation fills in its UOM conversions and defaults.
+		All of them are committed together.
 
-		if product_id:
-			existing_item = frappe.db.get_value(
-				"Item",
-				{"invoice_ninja_id": str(product_id)},
-				"name"
-			)
-			if existing_item:
-				return existing_item
-
-		# Strategy 2: Try to find existing item by product_key (item_code)
-		if in_item.get("product_key"):
-			existing_item = frappe.db.get_value(
-				"Item",
-				{"item_code": in_item.get("product_key")},
-				"name"
+		Args:
+			line_items: Invoice Ninja line item dicts, e.g. of every invoice in a page
+			invoice_ninja_company: Invoice Ninja Company doc name (for the default UOM)
+
+		Returns:
+			list: Item codes that were created
+		"""
+		pending = [item for item in line_items if not item.get("erpnext_item_code")]
+		if not pending:
+			return []
+
+		product_ids = {
+			str(product_id)
+			for product_id in (FieldMapper._line_item_product_id(item) for item in pending)
+			if product_id
+		}
+		product_keys = {item["product_key"] for item in pending if item.get("product_key")}
+
+		conditions = ["item_code = 'SERVICE'"]
+		params = []
+		if product_ids:
+			conditions.append(f"invoice_ninja_id IN ({', '.join(['%s'] * len(product_ids))})")
+			params += list(product_ids)
+		if product_keys:
+			conditions.append(f"item_code IN ({', '.join(['%s'] * len(product_keys))})")
+			params += list(product_keys)
+
+		by_id = {}
+		# Keyed like the database compares item codes (case-insensitive, trailing spaces ignored)
+		by_code = {}
+		for row in frappe.db.sql(
+			f"SELECT name, item_code, invoice_ninja_id FROM `tabItem` WHERE {' OR '.join(conditions)}",
+			params,
+			as_dict=True,
+		):
+			if row.invoice_ninja_id:
+				by_id[str(row.invoice_ninja_id)] = row.name
+			by_code[FieldMapper._item_code_key(row.item_code)] = row.name
+
+		# Item code -> item name of the Items to create
+		to_create = {}
+		resolved = []
+		for item in pending:
+			product_id = FieldMapper._line_item_product_id(item)
+			product_key = item.get("product_key")
+
+			item_code = (
+				(product_id and by_id.get(str(product_id)))
+				or (product_key and by_code.get(FieldMapper._item_code_key(product_key)))
+				or (not product_key and by_code.get(FieldMapper._item_code_key("SERVICE")))
 			)
-			if existing_item:
-				return existing_item
+			if not item_code:
+				# Description-only line items without a generic service item get their own Item
+				item_code = product_key or f"IN-ITEM-{frappe.generate_hash(length=8)}"
+				to_create[item_code] = item.get("notes") or product_key or "Unknown Item"
+				# Later lines with the same key in another case reuse the Item queued here
+				by_code[FieldMapper._item_code_key(item_code)] = item_code
+
+			resolved.append((item, item_code))
 
-		# Strategy 3: Return a default service item for line items without product
-		# This is common for custom/description-only line items in Invoice Ninja
-		if not in_item.get("product_key"):
-			# Check if a generic "Service" item exists
-			service_item = frappe.db.get_value("Item", {"item_code": "SERVICE"}, "name")
-			if service_item:
-				return service_item
+		if to_create:
+			# Deduplicated across the page, so an Item billed on several lines is created once
+			default_uom = FieldMapper.get_default_product_uom(invoice_ninja_company)
+			for item_code, item_name in to_create.items():
+				frappe.get_doc({
+					"doctype": "Item",
+					"item_code": item_code,
+					"item_name": item_name,
+					"item_group": "Products",
+					"stock_uom": default_uom,
+					"is_stock_item": 0
+				}).insert(ignore_permissions=True)
+			frappe.db.commit()
 
-		# Strategy 4: Create new item code as last resort
-		# This will be used if the product doesn't exist in ERPNext yet
-		item_code = in_item.get("product_key") or f"IN-ITEM-{frappe.generate_hash(length=8)}"
+		# Only set once every Item exists, so a failed batch leaves the line items unresolved
+		for item, item_code in resolved:
+			item["erpnext_item_code"] = item_code
 
-		# Ensure item code is unique
-		if frappe.db.exists("Item", item_code):
-			item_code = f"{item_code}-{frappe.generate_hash(length=4)}"
+		return list(to_create)
 
-		return item_code
+	@staticmethod
+	def _item_code_key(item_code):
+		"""Item code normalized the way the database matches it"""
+		return str(item_code).casefold().strip()
+
+	@staticmethod
+	def _line_item_product_id(in_item):
+		"""Invoice Ninja product reference of a line item (line items use various field names)"""
+		return in_item.get("product_cost") or in_item.get("product_id") or in_item.get("id")
 
 	@staticmethod
 	def get_customer_by_invoice_ninja_id(client_id):
@@ -1226,8 +1249,18 @@ class FieldMapper:
 		return taxes
 
 	@staticmethod
-	def map_customer_to_invoice_ninja(customer_doc):
-		"""Map ERPNext customer to Invoice Ninja format"""
+	def map_customer_to_invoice_ninja(customer_doc, prefetched=None):
+		"""
+		Map ERPNext customer to Invoice Ninja format
+
+		Args:
+			customer_doc: Customer document (or row with the same fields)
+			prefetched: Optional dict of batch-loaded lookups (company_mapping,
+				group_id, address) used instead of per-document queries
+		"""
+		if prefetched is not None:
+			return FieldMapper._build_customer_payload(customer_doc, prefetched)
+
 		# Validate and get company mapping
 		company_mapping = FieldMapper.validate_company_mapping(customer_doc)
 
@@ -1280,13 +1313,57 @@ class FieldMapper:
 		return customer_data
 
 	@staticmethod
-	def map_invoice_to_invoice_ninja(invoice_doc):
-		"""Map ERPNext sales invoice to Invoice Ninja format"""
-		# Validate and get company mapping
-		company_mapping = FieldMapper.validate_company_mapping(invoice_doc)
+	def _build_customer_payload(customer_doc, prefetched):
+		"""Build customer payload from batch-loaded lookups (no database access)"""
+		customer_data = {
+			"name": customer_doc.customer_name,
+			"display_name": customer_doc.customer_name,
+			"email": customer_doc.email_id or "",
+			"phone": customer_doc.mobile_no or "",
+			"website": customer_doc.website or "",
+			"vat_number": customer_doc.tax_id or "",
+			"public_notes": customer_doc.customer_details or "",
+			"is_company": 1 if customer_doc.customer_type == "Company" else 0,
+			"company_id": prefetched["company_mapping"].invoice_ninja_company_id,
+		}
+
+		if prefetched.get("group_id"):
+			customer_data["group_settings_id"] = prefetched["group_id"]
+
+		address = prefetched.get("address")
+		if address:
+			customer_data.update(
+				{
+					"address1": address.address_line1 or "",
+					"address2": address.address_line2 or "",
+					"city": address.city or "",
+					"state": address.state or "",
+					"postal_code": address.pincode or "",
+					"country_id": FieldMapper.get_country_id(address.country),
+				}
+			)
+
+		return customer_data
+
+	@staticmethod
+	def map_invoice_to_invoice_ninja(invoice_doc, prefetched=None):
+		"""
+		Map ERPNext sales invoice to Invoice Ninja format
+
+		Args:
+			invoice_doc: Sales Invoice document (or row with an items list)
+			prefetched: Optional dict of batch-loaded lookups (company_mapping, client_id)
+		"""
+		if prefetched is not None:
+			company_mapping = prefetched["company_mapping"]
+			client_id = prefetched.get("client_id")
+		else:
+			# Validate and get company mapping
+			company_mapping = FieldMapper.validate_company_mapping(invoice_doc)
+
+			# Get customer's Invoice Ninja ID
+			client_id = frappe.db.get_value("Customer", invoice_doc.customer, "invoice_ninja_id")
 
-		# Get customer's Invoice Ninja ID
-		client_id = frappe.db.get_value("Customer", invoice_doc.customer, "invoice_ninja_id")
 		if not client_id:
 			frappe.throw(f"Customer {invoice_doc.customer} not synced to Invoice Ninja")
 
@@ -1317,13 +1394,24 @@ class FieldMapper:
 		return invoice_data
 
 	@staticmethod
-	def map_quotation_to_invoice_ninja(quotation_doc):
-		"""Map ERPNext quotation to Invoice Ninja format"""
-		# Validate and get company mapping
-		company_mapping = FieldMapper.validate_company_mapping(quotation_doc)
+	def map_quotation_to_invoice_ninja(quotation_doc, prefetched=None):
+		"""
+		Map ERPNext quotation to Invoice Ninja format
+
+		Args:
+			quotation_doc: Quotation document (or row with an items list)
+			prefetched: Optional dict of batch-loaded lookups (company_mapping, client_id)
+		"""
+		if prefetched is not None:
+			company_mapping = prefetched["company_mapping"]
+			client_id = prefetched.get("client_id")
+		else:
+			# Validate and get company mapping
+			company_mapping = FieldMapper.validate_company_mapping(quotation_doc)
+
+			# Get customer's Invoice Ninja ID
+			client_id = frappe.db.get_value("Customer", quotation_doc.party_name, "invoice_ninja_id")
 
-		# Get customer's Invoice Ninja ID
-		client_id = frappe.db.get_value("Customer", quotation_doc.party_name, "invoice_ninja_id")
 		if not client_id:
 			frappe.throw(f"Customer {quotation_doc.party_name} not synced to Invoice Ninja")
 
@@ -1433,7 +1521,7 @@ class FieldMapper:
 		return item_data
 
 	@staticmethod
-	def map_payment_from_invoice_ninja(in_payment, invoice_ninja_company=None):
+	def map_payment_from_invoice_ninja(in_payment, invoice_ninja_company=None, prefetched=None):
 		"""
 		Map Invoice Ninja payment to ERPNext payment entry with proper exchange rate handling
 		Supports multiple invoices via paymentables array
@@ -1441,6 +1529,8 @@ class FieldMapper:
 		Args:
 			in_payment: Invoice Ninja payment data
 			invoice_ninja_company: Invoice Ninja Company doc name for linking
+			prefetched: Optional dict of batch-loaded lookups (Sales Invoice rows keyed by
+				invoice_ninja_id, paid_to accounts keyed by company, and a conversion rate memo)
 
 		Returns:
 			dict: Payment Entry data with proper currency and exchange rate handling
@@ -1468,11 +1558,15 @@ class FieldMapper:
 				continue
 
 			# Find ERPNext Sales Invoice
-			invoice_name = frappe.db.get_value(
-				"Sales Invoice",
-				{"invoice_ninja_id": str(invoice_id)},
-				"name"
-			)
+			if prefetched is not None:
+				invoice_row = prefetched["invoices"].get(str(invoice_id))
+				invoice_name = invoice_row.name if invoice_row else None
+			else:
+				invoice_name = frappe.db.get_value(
+					"Sales Invoice",
+					{"invoice_ninja_id": str(invoice_id)},
+					"name"
+				)
 
 			if not invoice_name:
 				frappe.log_error(
@@ -1491,7 +1585,10 @@ class FieldMapper:
 
 			# Store first invoice for context (company, currency, etc.)
 			if first_invoice is None:
-				first_invoice = frappe.get_doc("Sales Invoice", invoice_name)
+				if prefetched is not None:
+					first_invoice = invoice_row
+				else:
+					first_invoice = frappe.get_doc("Sales Invoice", invoice_name)
 
 		# If no valid invoices found, skip payment
 		if not references or first_invoice is None:
@@ -1504,8 +1601,11 @@ class FieldMapper:
 		# Use first invoice for company/currency context
 		company = first_invoice.company
 
+		paid_to_accounts = prefetched.get("paid_to_accounts", {}) if prefetched is not None else {}
+
 		# Validate exchange gain/loss account is configured
-		FieldMapper.validate_exchange_gain_loss_account(company)
+		if company not in paid_to_accounts:
+			FieldMapper.validate_exchange_gain_loss_account(company)
 
 		# Get payment date and currency
 		payment_date = FieldMapper.parse_date(in_payment.get("date")) or nowdate()
@@ -1514,19 +1614,25 @@ class FieldMapper:
 
 		# Get exchange rate at PAYMENT date (not invoice date!)
 		# This is critical for accurate exchange gain/loss calculation
-		conversion_rate = FieldMapper.get_conversion_rate_for_transaction(
-			invoice_currency=payment_currency,
-			company_currency=company_currency,
-			posting_date=payment_date,
-			in_exchange_rate=in_payment.get("exchange_rate")
-		)
+		rate_key = (payment_currency, company_currency, str(payment_date), in_payment.get("exchange_rate"))
+		rate_memo = prefetched.setdefault("conversion_rates", {}) if prefetched is not None else {}
+		if rate_key not in rate_memo:
+			rate_memo[rate_key] = FieldMapper.get_conversion_rate_for_transaction(
+				invoice_currency=payment_currency,
+				company_currency=company_currency,
+				posting_date=payment_date,
+				in_exchange_rate=in_payment.get("exchange_rate")
+			)
+		conversion_rate = rate_memo[rate_key]
 
 		# Get proper accounts
 		# paid_from = First invoice's receivable account (preserves currency-specific account)
 		paid_from_account = first_invoice.debit_to
 
 		# paid_to = Company's default bank/cash account
-		paid_to_account = FieldMapper.get_default_bank_cash_account(company, account_type="Cash")
+		paid_to_account = paid_to_accounts.get(company) or FieldMapper.get_default_bank_cash_account(
+			company, account_type="Cash"
+		)
 
 		# Calculate total amounts from payment
 		total_paid_amount = flt(in_payment.get("amount", 0))
@@ -1562,13 +1668,15 @@ class FieldMapper:
 		return payment_data
 
 	@staticmethod
-	def map_task_from_invoice_ninja(in_task, invoice_ninja_company=None):
+	def map_task_from_invoice_ninja(in_task, invoice_ninja_company=None, prefetched=None):
 		"""
 		Map Invoice Ninja task to ERPNext Invoice Ninja Task
 
 		Args:
 			in_task: Invoice Ninja task data
 			invoice_ninja_company: Invoice Ninja Company doc name for linking
+			prefetched: Optional dict of batch-loaded lookups (Customer names keyed by
+				client_id, Project names keyed by project_id)
 		"""
 		# Calculate duration in hours
 		duration_seconds = int(in_task.get('duration', 0))
@@ -1577,20 +1685,26 @@ class FieldMapper:
 		# Map client to customer
 		customer = None
 		if in_task.get('client_id'):
-			customer = frappe.db.get_value(
-				"Customer",
-				{"invoice_ninja_id": str(in_task.get('client_id'))},
-				"name"
-			)
+			if prefetched is not None:
+				customer = prefetched["customers"].get(str(in_task.get('client_id')))
+			else:
+				customer = frappe.db.get_value(
+					"Customer",
+					{"invoice_ninja_id": str(in_task.get('client_id'))},
+					"name"
+				)
 
 		# Map project if available
 		project = None
 		if in_task.get('project_id'):
-			project = frappe.db.get_value(
-				"Project",
-				{"invoice_ninja_project_id": str(in_task.get('project_id'))},
-				"name"
-			)
+			if prefetched is not None:
+				project = prefetched["projects"].get(str(in_task.get('project_id')))
+			else:
+				project = frappe.db.get_value(
+					"Project",
+					{"invoice_ninja_project_id": str(in_task.get('project_id'))},
+					"name"
+				)
 
 		# Determine status
 		status = "Logged"
@@ -1624,28 +1738,6 @@ class FieldMapper:
 
 		return task_data
 
-	@staticmethod
-	def sync_task_inline(task_data, invoice_ninja_company):
-		"""
-		Create/update task record inline during invoice sync
-
-		Args:
-			task_data: Task data from Invoice Ninja (can be nested in invoice)
-			invoice_ninja_company: Company reference for the task
-		"""
-		task_id = str(task_data.get('id'))
-
-		# Check if task already exists
-		existing = frappe.db.exists("Invoice Ninja Task", {"task_id": task_id})
-
-		if not existing:
-			# Create new task record
-			task_doc_data = FieldMapper.map_task_from_invoice_ninja(task_data, invoice_ninja_company)
-			if task_doc_data:
-				doc = frappe.get_doc(task_doc_data)
-				doc.insert(ignore_permissions=True)
-				frappe.db.commit()
-
 	@staticmethod
 	def get_currency_id(currency_code):
 		"""Get Invoice Ninja currency ID from code"""
@@ -1950,9 +2042,9 @@ class FieldMapper:
 			return False, None, f"No receivable account mapping found for currency {currency}"
 
 	@staticmethod
-	def map_quote_to_invoice_ninja(quotation_doc):
+	def map_quote_to_invoice_ninja(quotation_doc, prefetched=None):
 		"""Map ERPNext quotation to Invoice Ninja quote format (alias for map_quotation_to_invoice_ninja)"""
-		return FieldMapper.map_quotation_to_invoice_ninja(quotation_doc)
+		return FieldMapper.map_quotation_to_invoice_ninja(quotation_doc, prefetched=prefetched)
 
 	@staticmethod
 	def validate_exchange_gain_loss_account(company):
@@ -2023,8 +2115,15 @@ class FieldMapper:
 		return account
 
 	@staticmethod
-	def map_payment_to_invoice_ninja(payment_doc):
-		"""Map ERPNext payment entry to Invoice Ninja payment format"""
+	def map_payment_to_invoice_ninja(payment_doc, prefetched=None):
+		"""
+		Map ERPNext payment entry to Invoice Ninja payment format
+
+		Args:
+			payment_doc: Payment Entry document (or row with a references list)
+			prefetched: Optional dict of batch-loaded lookups (invoice_ninja_ids keyed
+				by Sales Invoice name)
+		"""
 		try:
 			# Get related invoice(s)
 			invoice_refs = payment_doc.references or []
@@ -2040,11 +2139,16 @@ class FieldMapper:
 				return None
 
 			# Get Invoice Ninja invoice ID
-			invoice_doc = frappe.get_doc("Sales Invoice", main_ref.reference_name)
-			invoice_ninja_id = getattr(invoice_doc, "invoice_ninja_id", None)
+			if prefetched is not None:
+				invoice_ninja_id = prefetched.get("invoice_ninja_ids", {}).get(main_ref.reference_name)
+			else:
+				invoice_ninja_id = frappe.db.get_value(
+					"Sales Invoice", main_ref.reference_name, "invoice_ninja_id"
+				)
+
 			if not invoice_ninja_id:
 				frappe.log_error(
-					f"Invoice {invoice_doc.name} not synced to Invoice Ninja", "Payment Mapping Error"
+					f"Invoice {main_ref.reference_name} not synced to Invoice Ninja", "Payment Mapping Error"
 				)
 				return None
 
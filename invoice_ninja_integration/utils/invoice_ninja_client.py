@@ -1,7 +1,40 @@
 import requests
 import frappe
 from frappe.utils import get_datetime, now_datetime
+from requests.adapters import HTTPAdapter
 import json
+import threading
+
+
+# Connection pool size per Invoice Ninja host (matches the bulk push worker ceiling)
+DEFAULT_POOL_SIZE = 16
+
+# Process-wide HTTP sessions keyed by base URL so TCP/TLS connections are reused
+_session_pool = {}
+_session_lock = threading.Lock()
+
+
+def get_pooled_session(base_url, pool_size=DEFAULT_POOL_SIZE):
+	"""
+	Get a shared requests.Session for an Invoice Ninja host
+
+	Args:
+		base_url: Invoice Ninja base URL
+		pool_size: Maximum number of pooled connections to the host
+
+	Returns:
+		requests.Session with keep-alive connection pooling
+	"""
+	with _session_lock:
+		session = _session_pool.get(base_url)
+		if session is None:
+			session = requests.Session()
+			adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+			session.mount("http://", adapter)
+			session.mount("https://", adapter)
+			_session_pool[base_url] = session
+
+		return session
 
 
 class InvoiceNinjaClient:
@@ -66,6 +99,9 @@ class InvoiceNinjaClient:
 		if self.company_id:
 			self.headers['X-API-COMPANY'] = str(self.company_id)
 
+		# Reuse pooled connections across client instances for the same host
+		self.session = get_pooled_session(self.base_url)
+
 	@staticmethod
 	def get_client_for_company(erpnext_company=None, invoice_ninja_company_id=None):
 		"""
@@ -109,12 +145,22 @@ class InvoiceNinjaClient:
 		elif 'X-API-COMPANY' in self.headers:
 			del self.headers['X-API-COMPANY']
 
-	def _make_request(self, method, endpoint, data=None, params=None):
-		"""Make API request to Invoice Ninja"""
+	def _make_request(self, method, endpoint, data=None, params=None, log_errors=True):
+		"""
+		Make API request to Invoice Ninja
+
+		Args:
+			method: HTTP method
+			endpoint: API endpoint relative to /api/v1
+			data: JSON body
+			params: Query parameters
+			log_errors: Write failures to Error Log (disable when called outside
+				a Frappe request context, e.g. from worker threads)
+		"""
 		url = f"{self.base_url}/api/v1/{endpoint}"
 
 		try:
-			response = requests.request(
+			response = self.session.request(
 				method=method,
 				url=url,
 				headers=self.headers,
@@ -127,7 +173,8 @@ class InvoiceNinjaClient:
 				return response.json()
 			else:
 				error_msg = f"API Error {response.status_code}: {response.text}"
-				frappe.log_error(error_msg, "Invoice Ninja API Error")
+				if log_errors:
+					frappe.log_error(error_msg, "Invoice Ninja API Error")
 				# Return error info for better debugging
 				return {
 					"error": True,
@@ -138,20 +185,21 @@ class InvoiceNinjaClient:
 
 		except Exception as e:
 			error_msg = f"Request failed: {str(e)}"
-			frappe.log_error(error_msg, "Invoice Ninja API Error")
+			if log_errors:
+				frappe.log_error(error_msg, "Invoice Ninja API Error")
 			return {
 				"error": True,
 				"message": error_msg,
 				"exception": str(e)
 			}
 
-	def get(self, endpoint, params=None):
+	def get(self, endpoint, params=None, log_errors=True):
 		"""Generic GET request"""
-		return self._make_request('GET', endpoint, params=params)
+		return self._make_request('GET', endpoint, params=params, log_errors=log_errors)
 
-	def post(self, endpoint, data=None):
+	def post(self, endpoint, data=None, log_errors=True):
 		"""Generic POST request"""
-		return self._make_request('POST', endpoint, data=data)
+		return self._make_request('POST', endpoint, data=data, log_errors=log_errors)
 
 	def put(self, endpoint, data=None):
 		"""Generic PUT request"""
@@ -180,9 +228,10 @@ class InvoiceNinjaClient:
 		return self.get(f'companies/{company_id}')
 
 	# Client methods	# Customer methods
-	def get_customers(self, page=1, per_page=100, include=None):
+	def get_customers(self, page=1, per_page=100, include=None, filters=None):
 		"""Get customers from Invoice Ninja"""
 		params = {
+			**(filters or {}),
 			'page': page,
 			'per_page': per_page,
 		}
@@ -205,9 +254,10 @@ class InvoiceNinjaClient:
 		return self.put(f'clients/{customer_id}', data=customer_data)
 
 	# Invoice methods
-	def get_invoices(self, page=1, per_page=100, include=None):
+	def get_invoices(self, page=1, per_page=100, include=None, filters=None):
 		"""Get invoices from Invoice Ninja - include task data by default"""
 		params = {
+			**(filters or {}),
 			'page': page,
 			'per_page': per_page,
 			'include': include or 'client,line_items.task'  # Include nested task data by default
@@ -228,9 +278,9 @@ class InvoiceNinjaClient:
 		return self.put(f'invoices/{invoice_id}', data=invoice_data)
 
 	# Quote methods
-	def get_quotes(self, page=1, per_page=100, include=None):
+	def get_quotes(self, page=1, per_page=100, include=None, filters=None):
 		"""Get quotes from Invoice Ninja"""
-		params = {'page': page, 'per_page': per_page}
+		params = {**(filters or {}), 'page': page, 'per_page': per_page}
 		if include:
 			params['include'] = include
 		return self.get('quotes', params=params)
@@ -249,9 +299,9 @@ class InvoiceNinjaClient:
 		return self.put(f'quotes/{quote_id}', data=quote_data)
 
 	# Product methods
-	def get_products(self, page=1, per_page=100):
+	def get_products(self, page=1, per_page=100, filters=None):
 		"""Get products from Invoice Ninja"""
-		params = {'page': page, 'per_page': per_page}
+		params = {**(filters or {}), 'page': page, 'per_page': per_page}
 		return self.get('products', params=params)
 
 	def get_product(self, product_id):
@@ -267,9 +317,9 @@ class InvoiceNinjaClient:
 		return self.put(f'products/{product_id}', data=product_data)
 
 	# Payment methods
-	def get_payments(self, page=1, per_page=100, include=None):
+	def get_payments(self, page=1, per_page=100, include=None, filters=None):
 		"""Get payments from Invoice Ninja"""
-		params = {'page': page, 'per_page': per_page}
+		params = {**(filters or {}), 'page': page, 'per_page': per_page}
 		if include:
 			params['include'] = include
 		return self.get('payments', params=params)
@@ -290,9 +340,9 @@ class InvoiceNinjaClient:
 		return self.get('tax_rates', params=params)
 
 	# Task methods
-	def get_tasks(self, page=1, per_page=100, include=None):
+	def get_tasks(self, page=1, per_page=100, include=None, filters=None):
 		"""Get tasks from Invoice Ninja"""
-		params = {'page': page, 'per_page': per_page}
+		params = {**(filters or {}), 'page': page, 'per_page': per_page}
 		if include:
 			params['include'] = include
 		return self.get('tasks', params=params)
@@ -314,7 +364,7 @@ class InvoiceNinjaClient:
 		"""Download invoice PDF"""
 		url = f"{self.base_url}/api/v1/invoices/{invoice_id}/download"
 		try:
-			response = requests.get(url, headers=self.headers, timeout=30)
+			response = self.session.get(url, headers=self.headers, timeout=30)
 			if response.status_code == 200:
 				return response.content
 		except Exception as e:
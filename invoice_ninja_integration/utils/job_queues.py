@@ -0,0 +1,130 @@
+"""
+Priority job queues for Invoice Ninja Integration
+
+Background work is routed to one of four named RQ queues so that a large
+backfill can never delay real-time work:
+
+- realtime: document pushes on save, per-invoice payment checks on submit
+- interactive: syncs started by a user from the desk or dashboard
+- bulk: scheduled polls, dependency-ordered runs, backfills, reconciliation
+- submission: deferred submission of synced drafts, so ledger posting never
+  blocks ingest
+
+Each queue falls back to a standard Frappe queue when no worker is configured
+for it. Run `bench setup-invoice-ninja-workers` to add the queues to
+common_site_config.json, then `bench setup supervisor` (or add
+`bench worker --queue <name>` lines to the Procfile) to start their workers.
+
+Jobs with a job_id are deduplicated: a job that is already queued or running
+is not enqueued again. Bulk producers that pass throttle=True back off while the
+bulk queue is deep or real-time work is backing up.
+"""
+
+import frappe
+
+
+# Priority -> queue name, fallback queue, job timeout and suggested worker count
+PRIORITY_QUEUES = {
+	"realtime": {
+		"queue": "invoice_ninja_realtime",
+		"fallback": "short",
+		"timeout": 300,
+		"background_workers": 2,
+	},
+	"interactive": {
+		"queue": "invoice_ninja_interactive",
+		"fallback": "default",
+		"timeout": 1800,
+		"background_workers": 1,
+	},
+	"bulk": {
+		"queue": "invoice_ninja_bulk",
+		"fallback": "long",
+		"timeout": 3600,
+		"background_workers": 1,
+	},
+	"submission": {
+		"queue": "invoice_ninja_submission",
+		"fallback": "long",
+		"timeout": 1800,
+		"background_workers": 1,
+	},
+}
+
+# Throttled bulk producers stop enqueuing above these queue depths
+MAX_BULK_QUEUE_DEPTH = 200
+MAX_REALTIME_BACKLOG = 50
+
+
+def get_queue_name(priority):
+	"""Return the queue for a priority, falling back when no worker is configured for it"""
+	from frappe.utils.background_jobs import get_queues_timeout
+
+	config = PRIORITY_QUEUES[priority]
+	return config["queue"] if config["queue"] in get_queues_timeout() else config["fallback"]
+
+
+def get_queue_depth(priority):
+	"""Number of jobs waiting in the queue of a priority"""
+	from frappe.utils.background_jobs import get_queue
+
+	return get_queue(get_queue_name(priority)).count
+
+
+def should_throttle_bulk():
+	"""True while bulk producers should hold back"""
+	return (
+		get_queue_depth("bulk") >= MAX_BULK_QUEUE_DEPTH
+		or get_queue_depth("realtime") >= MAX_REALTIME_BACKLOG
+	)
+
+
+def is_job_running(job_id):
+	"""True while the job with this ID has been picked up by a worker and has not finished"""
+	from frappe.utils.background_jobs import get_job
+	from rq.job import JobStatus
+
+	job = get_job(job_id)
+	return bool(job) and job.get_status() == JobStatus.STARTED
+
+
+def enqueue_job(method, priority, job_id=None, throttle=False, timeout=None, **kwargs):
+	"""
+	Enqueue a job on the queue for its priority
+
+	Args:
+		method: Dotted path (or callable) of the job
+		priority: realtime, interactive, bulk or submission
+		job_id: Deduplication key; a queued or running job with the same ID is not enqueued again
+		throttle: For bulk producers: skip enqueuing while the queues are backed up
+		timeout: Job timeout (defaults to the queue's timeout)
+		**kwargs: Passed to frappe.enqueue (job arguments, now, enqueue_after_commit)
+
+	Returns:
+		Job, or None if it was deduplicated or throttled
+	"""
+	if priority not in PRIORITY_QUEUES:
+		frappe.throw(f"Unknown job priority: {priority}")
+
+	if throttle and priority == "bulk" and should_throttle_bulk():
+		return None
+
+	return frappe.enqueue(
+		method,
+		queue=get_queue_name(priority),
+		timeout=timeout or PRIORITY_QUEUES[priority]["timeout"],
+		job_id=job_id,
+		deduplicate=bool(job_id),
+		**kwargs
+	)
+
+
+def get_workers_config():
+	"""The "workers" section for common_site_config.json"""
+	return {
+		config["queue"]: {
+			"timeout": config["timeout"],
+			"background_workers": config["background_workers"],
+		}
+		for config in PRIORITY_QUEUES.values()
+	}
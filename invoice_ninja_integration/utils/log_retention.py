@@ -0,0 +1,122 @@
+"""
+Chunked log retention
+
+The nightly cleanup used to run one unbounded DELETE on the sync logs and
+one on the Error Log matched with LIKE '%Invoice Ninja%', a full table scan
+holding its locks for minutes.
+
+purge() instead walks the rows to delete in primary key order, a chunk at a
+time, and deletes each chunk by primary key in its own short transaction.
+Error Log rows raised by this app are tagged with the indexed
+invoice_ninja_log custom field when they are inserted, so they are selected
+through that index rather than a text match. Old rows can optionally be
+archived to gzip-compressed JSONL files in the private files folder before
+they are deleted.
+"""
+
+import gzip
+import json
+import os
+import sys
+
+import frappe
+from frappe.utils import now_datetime
+
+
+# Rows selected, archived and deleted per transaction
+CHUNK_SIZE = 1000
+
+# Folder of the log archives, under the site's private files
+ARCHIVE_FOLDER = "invoice_ninja_log_archive"
+
+# Error Log condition selecting the rows of this app
+APP_ERROR_LOGS = "invoice_ninja_log = 1"
+
+APP_MODULE = "invoice_ninja_integration"
+
+
+def purge(doctype, cutoff, conditions=None, archive=False, chunk_size=CHUNK_SIZE):
+	"""
+	Delete the rows of a doctype created before a cutoff, in primary key ordered chunks
+
+	Args:
+		doctype: Log doctype
+		cutoff: Rows created before this datetime are deleted
+		conditions: Extra SQL conditions selecting the rows (e.g. APP_ERROR_LOGS)
+		archive: Write the rows to a compressed JSONL file before deleting them
+		chunk_size: Rows per chunk; each chunk is committed on its own
+
+	Returns:
+		int: Number of rows deleted
+	"""
+	where = " AND ".join(["name > %(last)s", "creation < %(cutoff)s", *(conditions or [])])
+	deleted = 0
+	last = ""
+	archive_file = None
+
+	try:
+		while True:
+			names = frappe.db.sql_list(f"""
+				SELECT name FROM `tab{doctype}`
+				WHERE {where}
+				ORDER BY name
+				LIMIT {int(chunk_size)}
+			""", {"last": last, "cutoff": cutoff})
+			if not names:
+				break
+
+			if archive:
+				archive_file = archive_file or _open_archive(doctype)
+				_archive_rows(archive_file, doctype, names)
+
+			frappe.db.delete(doctype, {"name": ["in", names]})
+			frappe.db.commit()
+
+			deleted += len(names)
+			last = names[-1]
+	finally:
+		if archive_file:
+			archive_file.close()
+
+	return deleted
+
+
+def _open_archive(doctype):
+	folder = frappe.get_site_path("private", ARCHIVE_FOLDER)
+	os.makedirs(folder, exist_ok=True)
+	filename = f"{frappe.scrub(doctype)}-{now_datetime():%Y%m%d%H%M%S}.jsonl.gz"
+	return gzip.open(os.path.join(folder, filename), "at", encoding="utf-8")
+
+
+def _archive_rows(archive_file, doctype, names):
+	for row in frappe.db.sql(f"""
+		SELECT * FROM `tab{doctype}`
+		WHERE name IN ({", ".join(["%s"] * len(names))})
+		ORDER BY name
+	""", names, as_dict=True):
+		archive_file.write(json.dumps(row, default=str) + "\n")
+
+	# The chunk must be on disk before it is deleted
+	archive_file.flush()
+
+
+def tag_error_log(doc, method=None):
+	"""doc_events before_insert: tag Error Log rows raised by this app for retention"""
+	if _raised_by_app(doc):
+		doc.invoice_ninja_log = 1
+
+
+def _raised_by_app(doc):
+	error = doc.get("error") or ""
+	if APP_MODULE in error or "Invoice Ninja" in error or "Invoice Ninja" in (doc.get("method") or ""):
+		return True
+
+	# frappe.log_error called from this app's code with a plain message
+	frame = sys._getframe(1)
+	while frame:
+		module = frame.f_globals.get("__name__") or ""
+		if module.startswith(f"{APP_MODULE}.") and module != __name__:
+			return True
+		frame = frame.f_back
+
+	return False
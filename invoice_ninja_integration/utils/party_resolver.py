@@ -0,0 +1,261 @@
+"""
+Page-level address and contact resolution for customer sync
+
+Matching a customer's contacts and address used to cost up to three Contact
+lookups per contact, a get_doc per matched Contact to scan its links and an
+Address lookup per customer. PartyResolver loads every candidate for a page
+of Invoice Ninja clients up front:
+
+- Contacts matching any contact ID, email or phone of the page (one query);
+- the Customer links of those Contacts (one query);
+- Addresses matching any address title of the page (one query);
+
+and matches against in-memory indexes with the same precedence as before
+(Invoice Ninja contact ID, then email, then phone). Links to existing
+Contacts and contact IDs backfilled on Contacts without one are collected
+and written in one batch by flush(); new Contacts and Addresses are inserted
+as they are found and added to the indexes, so later clients on the page
+match them too.
+"""
+
+import frappe
+from frappe.utils import cstr, now_datetime
+
+
+# Address fields compared before saving a matched Address
+ADDRESS_FIELDS = [
+	"address_type", "address_line1", "address_line2", "city", "state", "pincode",
+	"country", "is_primary_address", "is_shipping_address",
+]
+
+
+class PartyResolver:
+	"""Resolves the Contacts and Addresses of a page of Invoice Ninja clients"""
+
+	def __init__(self):
+		self.contacts_by_id = {}
+		self.contacts_by_email = {}
+		self.contacts_by_phone = {}
+		# Contact name -> its stored Invoice Ninja contact ID ("" if none)
+		self.contact_ids = {}
+		# Contact name -> Customer names it is linked to
+		self.customer_links = {}
+		self.addresses_by_title = {}
+		self.pending_links = []
+		self.pending_contact_ids = {}
+
+	def load(self, customers):
+		"""
+		Load every candidate Contact, Customer link and Address for a page
+
+		Args:
+			customers: Invoice Ninja client dicts
+		"""
+		contact_ids = set()
+		emails = set()
+		phones = set()
+		titles = set()
+		for customer in customers:
+			titles.add(customer.get("display_name") or customer.get("name") or "Primary")
+			for contact in customer.get("contacts") or []:
+				if contact.get("id"):
+					contact_ids.add(str(contact["id"]))
+				if contact.get("email"):
+					emails.add(contact["email"])
+				if contact.get("phone"):
+					phones.add(contact["phone"])
+
+		self._load_contacts(contact_ids, emails, phones)
+		self._load_addresses(titles)
+
+	def _load_contacts(self, contact_ids, emails, phones):
+		conditions = []
+		params = []
+		candidates = (("invoice_ninja_contact_id", contact_ids), ("email_id", emails), ("phone", phones))
+		for field, values in candidates:
+			if values:
+				conditions.append(f"{field} IN ({_placeholders(values)})")
+				params += list(values)
+
+		if not conditions:
+			return
+
+		contacts = frappe.db.sql(f"""
+			SELECT name, invoice_ninja_contact_id, email_id, phone
+			FROM `tabContact`
+			WHERE {" OR ".join(conditions)}
+			ORDER BY creation
+		""", params, as_dict=True)
+
+		for contact in contacts:
+			self._index_contact(
+				contact.name, contact.invoice_ninja_contact_id, contact.email_id, contact.phone
+			)
+
+		if not contacts:
+			return
+
+		names = [contact.name for contact in contacts]
+		for link in frappe.db.sql(f"""
+			SELECT parent, link_name
+			FROM `tabDynamic Link`
+			WHERE parenttype = 'Contact'
+			AND link_doctype = 'Customer'
+			AND parent IN ({_placeholders(names)})
+		""", names, as_dict=True):
+			self.customer_links.setdefault(link.parent, set()).add(link.link_name)
+
+	def _load_addresses(self, titles):
+		if not titles:
+			return
+
+		for address in frappe.get_all(
+			"Address",
+			filters={"address_title": ["in", list(titles)]},
+			fields=["name", "address_title", *ADDRESS_FIELDS],
+			order_by="creation asc",
+		):
+			self.addresses_by_title.setdefault(address.address_title, address)
+
+	def _index_contact(self, name, contact_id, email, phone):
+		self.contact_ids[name] = cstr(contact_id)
+		# First match wins, like the per-contact lookups this replaces
+		if contact_id:
+			self.contacts_by_id.setdefault(cstr(contact_id), name)
+		if email:
+			self.contacts_by_email.setdefault(email, name)
+		if phone:
+			self.contacts_by_phone.setdefault(phone, name)
+
+	def find_contact(self, contact_data):
+		"""Existing Contact for mapped contact data: by Invoice Ninja ID, then email, then phone"""
+		contact_id = cstr(contact_data.get("invoice_ninja_contact_id"))
+		email = contact_data.get("email_id")
+		phone = contact_data.get("phone")
+		return (
+			(contact_id and self.contacts_by_id.get(contact_id))
+			or (email and self.contacts_by_email.get(email))
+			or (phone and self.contacts_by_phone.get(phone))
+			or None
+		)
+
+	def sync_contacts(self, contact_data_list, customer_name):
+		"""
+		Link or create the Contacts of a customer
+
+		Links to existing Contacts and backfilled contact IDs are queued for flush().
+
+		Args:
+			contact_data_list: Mapped Contact dicts
+			customer_name: ERPNext Customer name
+		"""
+		for contact_data in contact_data_list:
+			contact_name = self.find_contact(contact_data)
+
+			if contact_name:
+				linked = self.customer_links.setdefault(contact_name, set())
+				if customer_name not in linked:
+					linked.add(customer_name)
+					self.pending_links.append((contact_name, customer_name))
+
+				# Record the Invoice Ninja ID if matched by email/phone, unless the
+				# Contact already carries one
+				contact_id = cstr(contact_data.get("invoice_ninja_contact_id"))
+				if contact_id and not self.contact_ids.get(contact_name):
+					self.pending_contact_ids[contact_name] = contact_id
+					self.contact_ids[contact_name] = contact_id
+					self.contacts_by_id.setdefault(contact_id, contact_name)
+			else:
+				# Ensure link points to the correct doc.name
+				contact_data["links"] = [{"link_doctype": "Customer", "link_name": customer_name}]
+				new_contact = frappe.get_doc(contact_data)
+				new_contact.insert()
+
+				self._index_contact(
+					new_contact.name, contact_data.get("invoice_ninja_contact_id"),
+					contact_data.get("email_id"), contact_data.get("phone")
+				)
+				self.customer_links[new_contact.name] = {customer_name}
+
+	def sync_address(self, address_data, customer_name):
+		"""
+		Update the matching Address (by title) if it changed, or create it
+
+		Args:
+			address_data: Mapped Address dict
+			customer_name: ERPNext Customer name
+		"""
+		existing = self.addresses_by_title.get(address_data.get("address_title"))
+
+		if existing:
+			changed = [
+				f for f in ADDRESS_FIELDS
+				if f in address_data and cstr(existing.get(f)) != cstr(address_data.get(f))
+			]
+			if changed:
+				addr_doc = frappe.get_doc("Address", existing.name)
+				for key, value in address_data.items():
+					if key not in ["doctype", "links"] and hasattr(addr_doc, key):
+						setattr(addr_doc, key, value)
+				addr_doc.save()
+				existing.update({f: address_data[f] for f in ADDRESS_FIELDS if f in address_data})
+		else:
+			address_data["links"] = [{"link_doctype": "Customer", "link_name": customer_name}]
+			addr_doc = frappe.get_doc(address_data)
+			addr_doc.insert()
+			self.addresses_by_title[addr_doc.address_title] = frappe._dict(
+				{"name": addr_doc.name, **{f: addr_doc.get(f) for f in ADDRESS_FIELDS}}
+			)
+
+	def flush(self):
+		"""Write the queued Contact links and contact IDs in one batch"""
+		now = now_datetime()
+
+		if self.pending_links:
+			contacts = list({contact for contact, _ in self.pending_links})
+			next_idx = dict(frappe.db.sql(f"""
+				SELECT parent, MAX(idx)
+				FROM `tabDynamic Link`
+				WHERE parenttype = 'Contact' AND parentfield = 'links'
+				AND parent IN ({_placeholders(contacts)})
+				GROUP BY parent
+			""", contacts))
+
+			values = []
+			for contact, customer in self.pending_links:
+				next_idx[contact] = (next_idx.get(contact) or 0) + 1
+				values.append((
+					frappe.generate_hash(length=10), contact, "Contact", "links", next_idx[contact],
+					"Customer", customer, now, now, frappe.session.user, frappe.session.user,
+				))
+
+			frappe.db.bulk_insert(
+				"Dynamic Link",
+				fields=[
+					"name", "parent", "parenttype", "parentfield", "idx", "link_doctype", "link_name",
+					"creation", "modified", "owner", "modified_by",
+				],
+				values=values,
+			)
+			frappe.db.sql(f"""
+				UPDATE `tabContact` SET modified = %s
+				WHERE name IN ({_placeholders(contacts)})
+			""", (now, *contacts))
+			self.pending_links = []
+
+		if self.pending_contact_ids:
+			names = list(self.pending_contact_ids)
+			params = []
+			for name in names:
+				params += [name, self.pending_contact_ids[name]]
+
+			frappe.db.sql(f"""
+				UPDATE `tabContact`
+				SET invoice_ninja_contact_id = CASE name {" ".join(["WHEN %s THEN %s"] * len(names))} END
+				WHERE name IN ({_placeholders(names)})
+			""", (*params, *names))
+			self.pending_contact_ids = {}
+
+
+def _placeholders(values):
+	return ", ".join(["%s"] * len(values))
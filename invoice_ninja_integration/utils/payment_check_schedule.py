@@ -0,0 +1,112 @@
+"""
+Adaptive payment-check schedule for unpaid Invoice Ninja invoices
+
+Every outstanding invoice carries its own next check time and backoff level
+(invoice_ninja_next_payment_check, invoice_ninja_payment_check_backoff):
+
+- a check that finds no new payment doubles the interval, from BASE_INTERVAL
+  up to MAX_INTERVAL, so invoices that stay unpaid for months cost almost no
+  API calls;
+- a check that finds a payment resets the backoff, since partially paid
+  invoices tend to receive the rest soon;
+- around the due date the interval is capped at DUE_DATE_INTERVAL, and a long
+  backoff never skips over the start of that window;
+- an invoice modified since its last check (status change, payment entered in
+  ERPNext, re-sync from Invoice Ninja) is due immediately.
+
+The scheduler picks due invoices across all companies from one priority query
+(changed first, then near their due date, then most overdue), capped at
+MAX_PAYMENT_CHECKS_PER_RUN per run.
+"""
+
+from datetime import timedelta
+
+import frappe
+from frappe.utils import add_days, getdate, now_datetime
+
+
+# Backoff bounds (seconds)
+BASE_INTERVAL = 6 * 60 * 60
+MAX_INTERVAL = 30 * 24 * 60 * 60
+
+# Days around the due date with frequent checks, and the interval cap inside them
+DUE_DATE_WINDOW = 3
+DUE_DATE_INTERVAL = 12 * 60 * 60
+
+# Retry interval after a failed check; failures do not raise the backoff
+RETRY_INTERVAL = 60 * 60
+
+# Invoices checked per scheduler run, across all companies
+MAX_PAYMENT_CHECKS_PER_RUN = 500
+
+
+def next_payment_check(backoff, due_date=None, found_payment=False, failed=False, now=None):
+	"""
+	Compute the next check of an invoice after a payment check
+
+	Args:
+		backoff: Backoff level before the check
+		due_date: Invoice due date (optional)
+		found_payment: True if the check synced a new payment
+		failed: True if the check could not reach Invoice Ninja
+		now: Check time (defaults to now)
+
+	Returns:
+		tuple: (next check datetime, new backoff level)
+	"""
+	now = now or now_datetime()
+	backoff = backoff or 0
+
+	if failed:
+		return now + timedelta(seconds=RETRY_INTERVAL), backoff
+
+	backoff = 0 if found_payment else backoff + 1
+	interval = min(BASE_INTERVAL * 2 ** backoff, MAX_INTERVAL)
+
+	if due_date:
+		due_date = getdate(due_date)
+		window_start = add_days(due_date, -DUE_DATE_WINDOW)
+		window_end = add_days(due_date, DUE_DATE_WINDOW)
+		today = now.date()
+
+		if window_start <= today <= window_end:
+			interval = min(interval, DUE_DATE_INTERVAL)
+		elif today < window_start:
+			# Don't back off past the start of the due-date window
+			seconds_to_window = (window_start - today).days * 24 * 60 * 60
+			interval = min(interval, max(seconds_to_window, BASE_INTERVAL))
+
+	return now + timedelta(seconds=interval), backoff
+
+
+def get_due_payment_checks(limit=MAX_PAYMENT_CHECKS_PER_RUN, now=None):
+	"""
+	Outstanding invoices due for a payment check, highest priority first
+
+	Args:
+		limit: Maximum invoices to return
+		now: Reference time (defaults to now)
+
+	Returns:
+		list: dicts with name, invoice_ninja_id, invoice_ninja_company
+	"""
+	now = now or now_datetime()
+
+	return frappe.db.sql("""
+		SELECT name, invoice_ninja_id, invoice_ninja_company
+		FROM `tabSales Invoice`
+		WHERE IFNULL(invoice_ninja_id, '') != ''
+		AND IFNULL(invoice_ninja_company, '') != ''
+		AND docstatus = 1
+		AND outstanding_amount > 0
+		AND (
+			invoice_ninja_next_payment_check IS NULL
+			OR invoice_ninja_next_payment_check <= %(now)s
+			OR modified > IFNULL(invoice_ninja_last_payment_check, '1900-01-01')
+		)
+		ORDER BY
+			modified > IFNULL(invoice_ninja_last_payment_check, '1900-01-01') DESC,
+			ABS(DATEDIFF(due_date, %(now)s)) <= %(window)s DESC,
+			IFNULL(invoice_ninja_next_payment_check, '1900-01-01') ASC
+		LIMIT %(limit)s
+	""", {"now": now, "window": DUE_DATE_WINDOW, "limit": limit}, as_dict=True)
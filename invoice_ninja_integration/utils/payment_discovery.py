@@ -0,0 +1,318 @@
+"""
+Bulk payment discovery for unpaid Invoice Ninja invoices
+
+Instead of one API call and one commit per unpaid invoice, one job per
+company pages through the payments changed since the company's watermark,
+joins their paymentables against the outstanding invoices by
+invoice_ninja_id in memory, syncs only the payments that touch an
+outstanding invoice, and writes the payment tracking fields of every
+checked invoice with one UPDATE per chunk.
+
+A run matches payments against every outstanding invoice of the company, so
+the watermark never skips a payment, but only the invoices that were due
+(see utils.payment_check_schedule) or received a payment are rescheduled.
+The watermark stops just before the oldest payment that failed to sync, so
+the next run fetches it again, and is stored on the Invoice Ninja Company.
+"""
+
+import time
+from datetime import datetime, time as dt_time
+
+import frappe
+from frappe.utils import getdate, now_datetime
+
+from invoice_ninja_integration.utils.payment_check_schedule import next_payment_check
+from invoice_ninja_integration.utils.sync_pipeline import SyncPipeline
+
+
+# Seconds of API paging per company job; the watermark resumes the rest next run
+DISCOVERY_TIME_BUDGET = 600
+
+# Invoices per tracking UPDATE
+TRACKING_CHUNK_SIZE = 500
+
+
+class PaymentDiscovery:
+	"""Finds and syncs new payments for the outstanding invoices of one company"""
+
+	def __init__(self, invoice_ninja_company, due_invoices=None):
+		"""
+		Args:
+			invoice_ninja_company: Name of Invoice Ninja Company doc
+			due_invoices: Sales Invoice names due for a check (default: all outstanding)
+		"""
+		self.invoice_ninja_company = invoice_ninja_company
+		self.due_invoices = set(due_invoices) if due_invoices is not None else None
+
+	def run(self):
+		"""
+		Discover payments for all outstanding invoices of the company
+
+		Returns:
+			dict: {success, message, invoices_checked, payments_synced, invoices_with_payments}
+		"""
+		from invoice_ninja_integration.utils.sync_manager import SyncManager
+
+		outstanding = self._get_outstanding_invoices()
+		if not outstanding:
+			return {"success": True, "message": "No outstanding invoices", "invoices_checked": 0}
+
+		sync_manager = SyncManager()
+		mapping = sync_manager.company_mapper.get_company_mapping(
+			invoice_ninja_company_id=self.invoice_ninja_company
+		)
+		if not mapping:
+			return {"success": False, "message": "No company mapping found for this Invoice Ninja Company"}
+
+		client, _ = sync_manager.get_client_for_mapping(mapping)
+
+		watermark = self.get_watermark() or self._initial_watermark(outstanding)
+		# Per outstanding invoice: payments synced, failed, and the Invoice Ninja paid_to_date
+		synced_payments = {}
+		failed_invoices = set()
+		paid_to_date = {}
+		last_updated_at = watermark
+		# updated_at of the oldest relevant payment that failed to sync
+		oldest_failed = None
+
+		def process_page(payments):
+			nonlocal last_updated_at, oldest_failed
+			from invoice_ninja_integration.api import sync_entity_batch
+
+			relevant = []
+			for payment in payments:
+				invoice_ids = {
+					str(p.get("invoice_id")) for p in payment.get("paymentables") or [] if p.get("invoice_id")
+				}
+				if invoice_ids & outstanding.keys():
+					relevant.append((payment, invoice_ids & outstanding.keys()))
+
+				for invoice in payment.get("invoices") or []:
+					if str(invoice.get("id")) in outstanding:
+						paid_to_date[str(invoice["id"])] = float(invoice.get("paid_to_date") or 0)
+
+			if relevant:
+				synced_ids = []
+				sync_stats = {
+					"new_records": 0,
+					"updated_records": 0,
+					"unchanged_records": 0,
+					"skipped_records": 0,
+					"failed_records": 0,
+				}
+				sync_entity_batch(
+					[payment for payment, _ in relevant],
+					"Payment Entry",
+					self.invoice_ninja_company,
+					False,
+					sync_stats,
+					[],
+					synced_ids,
+				)
+
+				synced_ids = set(synced_ids)
+				for payment, invoice_ids in relevant:
+					synced = str(payment.get("id")) in synced_ids
+					if not synced:
+						updated_at = payment.get("updated_at") or 0
+						oldest_failed = updated_at if oldest_failed is None else min(oldest_failed, updated_at)
+
+					for invoice_id in invoice_ids:
+						if synced:
+							synced_payments[invoice_id] = synced_payments.get(invoice_id, 0) + 1
+						else:
+							failed_invoices.add(invoice_id)
+
+			frappe.db.commit()
+			last_updated_at = max([last_updated_at] + [p.get("updated_at") or 0 for p in payments])
+
+		# Oldest first, so an interrupted run resumes from the last processed payment
+		pipeline = SyncPipeline(
+			client,
+			"Payment Entry",
+			params={"updated_at": int(watermark), "sort": "updated_at|asc"},
+			time_budget=DISCOVERY_TIME_BUDGET,
+		)
+		pipeline.run(process_page)
+
+		self._update_tracking(outstanding, synced_payments, failed_invoices, paid_to_date)
+
+		if not pipeline.errors:
+			# Failed payments are fetched again by the next run
+			if oldest_failed is not None:
+				last_updated_at = max(min(last_updated_at, oldest_failed - 1), watermark)
+			self.set_watermark(last_updated_at)
+
+		payments_synced = sum(synced_payments.values())
+		return {
+			"success": not pipeline.errors,
+			"message": (
+				f"Checked {len(outstanding)} outstanding invoices: "
+				f"{payments_synced} payments synced for {len(synced_payments)} invoices"
+			),
+			"invoices_checked": len(outstanding),
+			"payments_synced": payments_synced,
+			"invoices_with_payments": len(synced_payments),
+			"complete": not pipeline.exhausted and not pipeline.errors,
+		}
+
+	def get_watermark(self):
+		watermark = frappe.db.get_value(
+			"Invoice Ninja Company", self.invoice_ninja_company, "payment_discovery_watermark"
+		)
+		# Watermarks of earlier versions were only kept in the cache
+		return watermark or frappe.cache().hget(_watermark_key(), self.invoice_ninja_company)
+
+	def set_watermark(self, value):
+		frappe.db.set_value(
+			"Invoice Ninja Company",
+			self.invoice_ninja_company,
+			"payment_discovery_watermark",
+			int(value),
+			update_modified=False,
+		)
+		frappe.db.commit()
+
+	def _get_outstanding_invoices(self):
+		"""
+		Outstanding submitted invoices of the company
+
+		Returns:
+			dict: invoice_ninja_id -> {name, posting_date, due_date, invoice_ninja_payment_check_backoff}
+		"""
+		rows = frappe.db.sql("""
+			SELECT name, invoice_ninja_id, posting_date, due_date, invoice_ninja_payment_check_backoff
+			FROM `tabSales Invoice`
+			WHERE invoice_ninja_company = %s
+			AND IFNULL(invoice_ninja_id, '') != ''
+			AND docstatus = 1
+			AND outstanding_amount > 0
+		""", (self.invoice_ninja_company,), as_dict=True)
+
+		return {str(row.invoice_ninja_id): row for row in rows}
+
+	def _initial_watermark(self, outstanding):
+		"""First run: no payment for an outstanding invoice predates the oldest of them"""
+		oldest = min(getdate(row.posting_date) for row in outstanding.values())
+		return int(datetime.combine(oldest, dt_time.min).timestamp())
+
+	def _update_tracking(self, outstanding, synced_payments, failed_invoices, paid_to_date):
+		"""Write the payment tracking fields of every checked invoice, one UPDATE per chunk"""
+		checked_at = now_datetime()
+		invoice_ids = list(outstanding)
+
+		for start in range(0, len(invoice_ids), TRACKING_CHUNK_SIZE):
+			chunk = invoice_ids[start:start + TRACKING_CHUNK_SIZE]
+			names = [outstanding[i].name for i in chunk]
+
+			synced = [outstanding[i].name for i in chunk if i in synced_payments]
+			failed = [outstanding[i].name for i in chunk if i in failed_invoices and i not in synced_payments]
+			counts = [(outstanding[i].name, synced_payments[i]) for i in chunk if i in synced_payments]
+			amounts = [(outstanding[i].name, paid_to_date[i]) for i in chunk if paid_to_date.get(i)]
+			schedules = [
+				(outstanding[i].name, *self._next_check(outstanding[i], i, synced_payments, failed_invoices, checked_at))
+				for i in chunk
+				if self._is_due(outstanding[i], i, synced_payments, failed_invoices)
+			]
+
+			params = [checked_at]
+			status_cases = []
+			for status, status_names in (("Synced", synced), ("Failed", failed)):
+				if status_names:
+					status_cases.append(f"WHEN name IN ({_placeholders(status_names)}) THEN %s")
+					params += status_names + [status]
+
+			# Invoices without new payments keep an earlier result, unless they were never checked
+			status_cases.append(
+				"WHEN IFNULL(invoice_ninja_payment_status, '') IN ('', 'Not Checked') THEN 'No Payments'"
+			)
+			assignments = [
+				"invoice_ninja_last_payment_check = %s",
+				f"invoice_ninja_payment_status = CASE {' '.join(status_cases)} "
+				"ELSE invoice_ninja_payment_status END",
+			]
+
+			if synced:
+				assignments.append(
+					f"invoice_ninja_payments_synced = CASE WHEN name IN ({_placeholders(synced)}) THEN 1 "
+					"ELSE invoice_ninja_payments_synced END"
+				)
+				params += synced
+
+				assignments.append(
+					"invoice_ninja_payment_sync_count = IFNULL(invoice_ninja_payment_sync_count, 0) + CASE name "
+					+ " ".join(["WHEN %s THEN %s"] * len(counts))
+					+ " ELSE 0 END"
+				)
+				for name, count in counts:
+					params += [name, count]
+
+			if amounts:
+				assignments.append(
+					"invoice_ninja_paid_to_date = CASE name "
+					+ " ".join(["WHEN %s THEN %s"] * len(amounts))
+					+ " ELSE invoice_ninja_paid_to_date END"
+				)
+				for name, amount in amounts:
+					params += [name, amount]
+
+			if schedules:
+				for field, index in (("invoice_ninja_next_payment_check", 1), ("invoice_ninja_payment_check_backoff", 2)):
+					assignments.append(
+						f"{field} = CASE name "
+						+ " ".join(["WHEN %s THEN %s"] * len(schedules))
+						+ f" ELSE {field} END"
+					)
+					for schedule in schedules:
+						params += [schedule[0], schedule[index]]
+
+			frappe.db.sql(f"""
+				UPDATE `tabSales Invoice`
+				SET {", ".join(assignments)}
+				WHERE name IN ({_placeholders(names)})
+			""", (*params, *names))
+
+		frappe.db.commit()
+
+	def _is_due(self, row, invoice_id, synced_payments, failed_invoices):
+		"""Invoices that were due, or got a payment anyway, are rescheduled"""
+		return (
+			self.due_invoices is None
+			or row.name in self.due_invoices
+			or invoice_id in synced_payments
+			or invoice_id in failed_invoices
+		)
+
+	def _next_check(self, row, invoice_id, synced_payments, failed_invoices, checked_at):
+		return next_payment_check(
+			row.invoice_ninja_payment_check_backoff,
+			row.due_date,
+			found_payment=invoice_id in synced_payments,
+			failed=invoice_id in failed_invoices and invoice_id not in synced_payments,
+			now=checked_at,
+		)
+
+
+def discover_payments_for_company(invoice_ninja_company, due_invoices=None):
+	"""Background job: discover and sync payments for one company's outstanding invoices"""
+	started = time.monotonic()
+	try:
+		result = PaymentDiscovery(invoice_ninja_company, due_invoices).run()
+	except Exception as e:
+		frappe.log_error(
+			f"Payment discovery failed for {invoice_ninja_company}: {e!s}", "Unpaid Invoice Payment Check Error"
+		)
+		return {"success": False, "message": str(e)}
+
+	frappe.logger().info(
+		f"Payment discovery for {invoice_ninja_company} in {time.monotonic() - started:.1f}s: {result['message']}"
+	)
+	return result
+
+
+def _watermark_key():
+	return "invoice_ninja_payment_discovery_watermark"
+
+
+def _placeholders(values):
+	return ", ".join(["%s"] * len(values))
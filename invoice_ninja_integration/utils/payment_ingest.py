@@ -0,0 +1,179 @@
+"""
+Page-level payment ingestion for Invoice Ninja Integration
+
+Payments are never updated after creation, so a page of fetched payments is
+first reduced to the IDs that do not exist in ERPNext yet (one query). Only
+those are mapped, against lookups loaded once per page:
+
+- every referenced Sales Invoice, fetched on demand if missing and then
+  resolved in one query;
+- the bank/cash account and exchange gain/loss check per ERPNext company;
+- exchange rates per (currency, date).
+
+New Payment Entries are inserted under a savepoint each, so one invalid
+payment does not roll back the page, and their sync hashes are written with
+one UPDATE before the single commit of the page. With a page-level
+SyncStateStore, payments it already knows are not looked up again, and the
+hashes go to the sync state instead.
+"""
+
+import frappe
+
+from invoice_ninja_integration.utils.deferred_submit import submit_or_defer
+from invoice_ninja_integration.utils.field_mapper import FieldMapper
+from invoice_ninja_integration.utils.sync_hash import SyncHashManager
+
+
+# Sales Invoice fields the payment mapper reads
+INVOICE_FIELDS = ["name", "invoice_ninja_id", "company", "currency", "debit_to", "customer"]
+
+
+class PaymentIngestor:
+	"""Creates the Payment Entries of a page of Invoice Ninja payments in one pass"""
+
+	def __init__(self, invoice_ninja_company, sync_state=None):
+		"""
+		Args:
+			invoice_ninja_company: Name of Invoice Ninja Company doc
+			sync_state: Optional SyncStateStore of the page, flushed by the caller
+		"""
+		self.invoice_ninja_company = invoice_ninja_company
+		self.sync_state = sync_state
+		# ERPNext company -> paid_to account, or None if the company is not configured
+		self.paid_to_accounts = {}
+		self.conversion_rates = {}
+
+	def ingest(self, payments):
+		"""
+		Create Payment Entries for the payments of a page that are not in ERPNext yet
+
+		Args:
+			payments: Invoice Ninja payment dicts
+
+		Returns:
+			dict: payment ID -> "created", "unchanged", "skipped" or the exception it failed with
+		"""
+		payment_ids = [str(p.get("id")) for p in payments if p.get("id")]
+		if not payment_ids:
+			return {}
+
+		existing = set()
+		if self.sync_state:
+			existing = {payment_id for payment_id in payment_ids if self.sync_state.get_existing(payment_id)}
+
+		unknown_ids = [payment_id for payment_id in payment_ids if payment_id not in existing]
+		if unknown_ids:
+			for row in frappe.get_all(
+				"Payment Entry",
+				filters={"invoice_ninja_id": ["in", unknown_ids]},
+				fields=["name", "invoice_ninja_id"]
+			):
+				existing.add(row.invoice_ninja_id)
+				if self.sync_state:
+					self.sync_state.record(row.invoice_ninja_id, document_name=row.name)
+
+		results = {payment_id: "unchanged" for payment_id in existing}
+
+		new_payments = [p for p in payments if p.get("id") and str(p["id"]) not in existing]
+		if not new_payments:
+			return results
+
+		prefetched = self._prefetch(new_payments)
+		hashes = {}
+
+		for payment in new_payments:
+			payment_id = str(payment["id"])
+			frappe.db.savepoint("invoice_ninja_payment_ingest")
+			try:
+				payment_doc_data = FieldMapper.map_payment_from_invoice_ninja(
+					payment, self.invoice_ninja_company, prefetched=prefetched
+				)
+				if not payment_doc_data:
+					results[payment_id] = "skipped"
+					continue
+
+				doc = frappe.get_doc(payment_doc_data)
+				doc.insert()
+				submit_or_defer(doc)
+
+				hash_value = SyncHashManager.calculate_hash(payment_doc_data, "Payment Entry")
+				if self.sync_state:
+					self.sync_state.record(payment_id, document_name=doc.name, mapped_hash=hash_value)
+				else:
+					hashes[doc.name] = hash_value
+				results[payment_id] = "created"
+
+			except Exception as e:
+				frappe.db.rollback(save_point="invoice_ninja_payment_ingest")
+				results[payment_id] = e
+
+		self._store_hashes(hashes)
+		frappe.db.commit()
+
+		return results
+
+	def _prefetch(self, payments):
+		"""
+		Batch-load the invoices and accounts the payment mapper needs
+
+		Returns:
+			dict: {"invoices", "paid_to_accounts", "conversion_rates"}
+		"""
+		from invoice_ninja_integration.api import ensure_invoices_synced
+
+		invoice_ids = list({
+			str(p.get("invoice_id"))
+			for payment in payments
+			for p in payment.get("paymentables") or []
+			if p.get("invoice_id")
+		})
+
+		# One on-demand fetch pass for every invoice the page references
+		ensure_invoices_synced(
+			{"paymentables": [{"invoice_id": invoice_id} for invoice_id in invoice_ids]},
+			self.invoice_ninja_company
+		)
+
+		invoices = {
+			str(row.invoice_ninja_id): row
+			for row in frappe.get_all(
+				"Sales Invoice",
+				filters={"invoice_ninja_id": ["in", invoice_ids]},
+				fields=INVOICE_FIELDS
+			)
+		} if invoice_ids else {}
+
+		for company in {row.company for row in invoices.values()}:
+			if company not in self.paid_to_accounts:
+				self.paid_to_accounts[company] = self._get_paid_to_account(company)
+
+		return {
+			"invoices": invoices,
+			# Unconfigured companies are left out so the mapper raises their error per payment
+			"paid_to_accounts": {c: a for c, a in self.paid_to_accounts.items() if a},
+			"conversion_rates": self.conversion_rates,
+		}
+
+	def _get_paid_to_account(self, company):
+		"""Bank/cash account for a company, or None if it is not set up for payments"""
+		try:
+			FieldMapper.validate_exchange_gain_loss_account(company)
+			return FieldMapper.get_default_bank_cash_account(company, account_type="Cash")
+		except frappe.ValidationError:
+			frappe.clear_messages()
+			return None
+
+	def _store_hashes(self, hashes):
+		"""Write the sync hashes of the created Payment Entries with one UPDATE"""
+		if not hashes:
+			return
+
+		params = []
+		for name, hash_value in hashes.items():
+			params += [name, hash_value]
+
+		frappe.db.sql(f"""
+			UPDATE `tabPayment Entry`
+			SET invoice_ninja_sync_hash = CASE name {" ".join(["WHEN %s THEN %s"] * len(hashes))} END
+			WHERE name IN ({", ".join(["%s"] * len(hashes))})
+		""", (*params, *hashes))
@@ -0,0 +1,429 @@
+"""
+Digest-based reconciliation for Invoice Ninja Integration
+
+Detects drift between Invoice Ninja and ERPNext for one entity type of one
+company without re-syncing every record:
+
+1. Walk the remote IDs and their updated_at timestamps page by page, keeping
+   only (id, updated_at) per record and applying archive/delete states of
+   each page in one statement.
+2. Load the local invoice_ninja_id / synced updated_at pairs in one query: the
+   remote updated_at stored in the Invoice Ninja Sync State when the record
+   was last synced. Local edits never hide a remote change, since only a sync
+   moves that timestamp. Records synced before the sync state existed have no
+   version to compare; they are not re-synced but get their sync state seeded
+   with the current remote updated_at.
+3. Split both sides into buckets by a stable hash of the ID and store each
+   bucket as a sorted ID list plus a compact float array of timestamps.
+4. Compare bucket digests; only buckets whose ID sets differ or which contain
+   remote changes newer than the oldest synced version are merge-joined.
+5. Re-fetch and re-sync only the missing and stale records (which records
+   their new sync state), then stamp invoice_ninja_last_sync on them in
+   chunks.
+
+Records present locally but no longer returned by Invoice Ninja at all
+(purged) are reported as extra and, when sweeping, tombstoned in bulk.
+"""
+
+import hashlib
+import time
+from bisect import bisect_left
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+from frappe.utils import now_datetime
+
+from invoice_ninja_integration.utils.entity_mapper import EntityMapper
+from invoice_ninja_integration.utils.sync_pipeline import SyncPipeline
+from invoice_ninja_integration.utils.sync_state import SyncStateStore
+from invoice_ninja_integration.utils.tombstones import (
+	DELTA_FILTERS,
+	REMOTE_STATE_STATUS,
+	SWEEP_CHUNK_SIZE,
+	apply_remote_states,
+	get_remote_state,
+	mark_deleted,
+)
+
+
+# Reports are kept for a week so the last run can be inspected from the UI
+REPORT_EXPIRY = 7 * 24 * 60 * 60
+
+# Number of IDs of each kind included in the report
+SAMPLE_SIZE = 20
+
+
+class BucketIndex:
+	"""Bucketed, sorted (id, timestamp) index for one side of a reconciliation"""
+
+	def __init__(self, bucket_count):
+		self.bucket_count = bucket_count
+		self._pending = [[] for _ in range(bucket_count)]
+		self.ids = None
+		self.versions = None
+		self.count = 0
+
+	def bucket_of(self, record_id):
+		return zlib.crc32(record_id.encode()) % self.bucket_count
+
+	def add(self, record_id, version):
+		self._pending[self.bucket_of(record_id)].append((record_id, version))
+		self.count += 1
+
+	def freeze(self):
+		"""Sort every bucket into parallel ID / timestamp arrays"""
+		self.ids = []
+		self.versions = []
+		for bucket in self._pending:
+			bucket.sort()
+			self.ids.append([record_id for record_id, _ in bucket])
+			self.versions.append(array("d", (version for _, version in bucket)))
+		self._pending = None
+		return self
+
+	def digest(self, bucket):
+		"""Digest of the ID set of a bucket"""
+		return hashlib.sha1("\n".join(self.ids[bucket]).encode()).hexdigest()
+
+	def max_version(self, bucket):
+		return max(self.versions[bucket], default=0.0)
+
+	def min_version(self, bucket):
+		return min(self.versions[bucket], default=0.0)
+
+	def version_of(self, record_id):
+		"""Timestamp of a record, or None if it is not in the index"""
+		bucket = self.bucket_of(record_id)
+		ids = self.ids[bucket]
+		position = bisect_left(ids, record_id)
+		if position < len(ids) and ids[position] == record_id:
+			return self.versions[bucket][position]
+		return None
+
+
+class ReconciliationEngine:
+	"""Compares Invoice Ninja and ERPNext for one entity type of one company"""
+
+	DEFAULT_BUCKET_COUNT = 1024
+	RESYNC_BATCH_SIZE = 50
+	RESYNC_FETCH_WORKERS = 4
+
+	def __init__(self, invoice_ninja_company, entity_type, bucket_count=None):
+		"""
+		Args:
+			invoice_ninja_company: Name of Invoice Ninja Company doc
+			entity_type: Customer, Sales Invoice, Quotation, Item, Payment Entry
+			bucket_count: Number of digest buckets
+		"""
+		from invoice_ninja_integration.api import ENTITY_SYNC_FUNCTIONS
+
+		if entity_type not in ENTITY_SYNC_FUNCTIONS:
+			frappe.throw(f"Reconciliation is not supported for {entity_type}")
+
+		self.invoice_ninja_company = invoice_ninja_company
+		self.entity_type = entity_type
+		self.bucket_count = int(bucket_count or self.DEFAULT_BUCKET_COUNT)
+		self.entity_config = EntityMapper.get_entity_config(entity_type)
+		# Invoice Ninja ID -> document name of local records without sync state
+		self.unstated = {}
+
+	def run(self, resync=True, max_resync=None, sweep=True):
+		"""
+		Reconcile the entity type and optionally re-sync the differences
+
+		Args:
+			resync: Re-fetch and re-sync missing and stale records
+			max_resync: Maximum records to re-sync (None = all)
+			sweep: Tombstone local records that no longer exist in Invoice Ninja
+
+		Returns:
+			dict: {success, message, missing_count, extra_count, stale_count, resynced_count, ...}
+		"""
+		from invoice_ninja_integration.utils.sync_manager import SyncManager
+
+		started = time.monotonic()
+		sync_manager = SyncManager()
+		mapping = sync_manager.company_mapper.get_company_mapping(
+			invoice_ninja_company_id=self.invoice_ninja_company
+		)
+		if not mapping:
+			return {"success": False, "message": "No company mapping found for this Invoice Ninja Company"}
+
+		client, _ = sync_manager.get_client_for_mapping(mapping)
+
+		remote, fetch_errors = self._load_remote_index(client)
+		if fetch_errors:
+			# An incomplete walk would report every unfetched record as extra
+			return {
+				"success": False,
+				"message": f"Failed to fetch {self.entity_type} page {fetch_errors[0]['page']}: "
+				f"{fetch_errors[0]['message']}",
+			}
+
+		local = self._load_local_index()
+		differing_buckets, missing, extra, stale = self._compare(remote, local)
+		backfilled_count = self._backfill_state(remote)
+
+		to_resync = missing + stale
+		if max_resync is not None:
+			to_resync = to_resync[:int(max_resync)]
+
+		resynced_count = resync_failed = 0
+		if resync and to_resync:
+			resynced_count, resync_failed = self._resync(client, to_resync)
+
+		if sweep and extra:
+			mark_deleted(self.entity_type, extra, self.invoice_ninja_company)
+			frappe.db.commit()
+
+		report = {
+			"success": True,
+			"invoice_ninja_company": self.invoice_ninja_company,
+			"entity_type": self.entity_type,
+			"remote_count": remote.count,
+			"local_count": local.count,
+			"bucket_count": self.bucket_count,
+			"differing_buckets": differing_buckets,
+			"missing_count": len(missing),
+			"extra_count": len(extra),
+			"stale_count": len(stale),
+			"backfilled_count": backfilled_count,
+			"resynced_count": resynced_count,
+			"resync_failed_count": resync_failed,
+			"tombstoned_count": len(extra) if sweep else 0,
+			"missing_ids": missing[:SAMPLE_SIZE],
+			"extra_ids": extra[:SAMPLE_SIZE],
+			"stale_ids": stale[:SAMPLE_SIZE],
+			"duration": round(time.monotonic() - started, 2),
+			"reconciled_at": str(now_datetime()),
+		}
+		report["message"] = (
+			f"{remote.count} remote / {local.count} local {self.entity_type}: "
+			f"{len(missing)} missing, {len(extra)} extra, {len(stale)} stale "
+			f"in {differing_buckets} of {self.bucket_count} buckets"
+		)
+
+		frappe.cache().set_value(
+			_report_key(self.invoice_ninja_company, self.entity_type), report, expires_in_sec=REPORT_EXPIRY
+		)
+		return report
+
+	def _load_remote_index(self, client):
+		"""Walk all remote records, keeping only id and updated_at of the ones not deleted"""
+		remote = BucketIndex(self.bucket_count)
+
+		def index_page(entities):
+			for entity in entities:
+				# Deleted records are tombstoned below and left out of the comparison
+				if get_remote_state(entity) != "deleted":
+					remote.add(str(entity.get("id")), float(entity.get("updated_at") or 0))
+
+			apply_remote_states(self.entity_type, entities, self.invoice_ninja_company)
+			frappe.db.commit()
+
+		# Only IDs and timestamps are needed, so related data is not included
+		pipeline = SyncPipeline(client, self.entity_type, params=DELTA_FILTERS, include=False)
+		pipeline.run(index_page)
+		return remote.freeze(), pipeline.errors
+
+	def _load_local_index(self):
+		"""Load local invoice_ninja_id / synced remote updated_at pairs of records not yet tombstoned"""
+		local = BucketIndex(self.bucket_count)
+
+		rows = frappe.db.sql(f"""
+			SELECT doc.name, doc.invoice_ninja_id, state.name, state.remote_updated_at
+			FROM `tab{self.entity_type}` doc
+			LEFT JOIN `tabInvoice Ninja Sync State` state
+				ON state.invoice_ninja_company = doc.invoice_ninja_company
+				AND state.entity_type = %s
+				AND state.invoice_ninja_id = doc.invoice_ninja_id
+			WHERE doc.invoice_ninja_company = %s
+			AND IFNULL(doc.invoice_ninja_id, '') != ''
+			AND IFNULL(doc.invoice_ninja_sync_status, '') != %s
+		""", (self.entity_type, self.invoice_ninja_company, REMOTE_STATE_STATUS["deleted"]))
+
+		for name, invoice_ninja_id, state_name, remote_updated_at in rows:
+			if not state_name:
+				# Never stale: without a synced version every record would be re-synced
+				self.unstated[str(invoice_ninja_id)] = name
+				local.add(str(invoice_ninja_id), float("inf"))
+			else:
+				local.add(str(invoice_ninja_id), float(remote_updated_at or 0))
+
+		return local.freeze()
+
+	def _compare(self, remote, local):
+		"""
+		Compare the two indexes bucket by bucket
+
+		Returns:
+			tuple: (differing_bucket_count, missing_ids, extra_ids, stale_ids)
+		"""
+		missing, extra, stale = [], [], []
+		differing_buckets = 0
+
+		for bucket in range(self.bucket_count):
+			# Same ID set and nothing changed remotely since the oldest local sync
+			if (
+				remote.digest(bucket) == local.digest(bucket)
+				and remote.max_version(bucket) <= local.min_version(bucket)
+			):
+				continue
+
+			bucket_missing, bucket_extra, bucket_stale = _merge_bucket(
+				remote.ids[bucket], remote.versions[bucket], local.ids[bucket], local.versions[bucket]
+			)
+			if bucket_missing or bucket_extra or bucket_stale:
+				differing_buckets += 1
+				missing.extend(bucket_missing)
+				extra.extend(bucket_extra)
+				stale.extend(bucket_stale)
+
+		return differing_buckets, missing, extra, stale
+
+	def _backfill_state(self, remote):
+		"""
+		Seed the sync state of local records that have none with their current remote updated_at
+
+		Returns:
+			int: Number of records whose sync state was seeded
+		"""
+		sync_state = SyncStateStore(self.invoice_ninja_company, self.entity_type)
+		for invoice_ninja_id, name in self.unstated.items():
+			remote_updated_at = remote.version_of(invoice_ninja_id)
+			if remote_updated_at is not None:
+				sync_state.record(
+					invoice_ninja_id, document_name=name, remote_updated_at=int(remote_updated_at)
+				)
+
+		backfilled_count = len(sync_state.pending)
+		sync_state.flush()
+		frappe.db.commit()
+		return backfilled_count
+
+	def _resync(self, client, record_ids):
+		"""
+		Re-fetch records by ID and sync them
+
+		Returns:
+			tuple: (synced_count, failed_count)
+		"""
+		from invoice_ninja_integration.api import sync_entity_batch
+
+		endpoint = self.entity_config["invoice_ninja_endpoint"]
+		params = {"include": self.entity_config["include_params"]} if self.entity_config["include_params"] else None
+
+		def fetch(record_id):
+			# Runs on a worker thread: HTTP only, errors are counted on the main thread
+			return client.get(f"{endpoint}/{record_id}", params=params, log_errors=False)
+
+		sync_stats = {
+			"new_records": 0,
+			"updated_records": 0,
+			"unchanged_records": 0,
+			"skipped_records": 0,
+			"failed_records": 0,
+		}
+		synced_count = failed_count = 0
+		synced_ids = []
+
+		with ThreadPoolExecutor(max_workers=self.RESYNC_FETCH_WORKERS) as executor:
+			for start in range(0, len(record_ids), self.RESYNC_BATCH_SIZE):
+				batch = record_ids[start:start + self.RESYNC_BATCH_SIZE]
+
+				entities = []
+				for record_id, response in zip(batch, executor.map(fetch, batch)):
+					if response and not response.get("error") and response.get("data"):
+						entities.append(response["data"])
+					else:
+						failed_count += 1
+						frappe.log_error(
+							f"Reconciliation could not fetch {self.entity_type} {record_id}: "
+							f"{(response or {}).get('message', 'No response')}",
+							"Reconciliation Error"
+						)
+
+				synced, failed = sync_entity_batch(
+					entities, self.entity_type, self.invoice_ninja_company, False, sync_stats, [], synced_ids
+				)
+				synced_count += synced
+				failed_count += failed
+				frappe.db.commit()
+
+		self._stamp_last_sync(synced_ids)
+		return synced_count, failed_count
+
+	def _stamp_last_sync(self, record_ids):
+		"""Stamp the last sync time of re-synced records (including unchanged ones), in chunks"""
+		now = now_datetime()
+		for start in range(0, len(record_ids), SWEEP_CHUNK_SIZE):
+			chunk = record_ids[start:start + SWEEP_CHUNK_SIZE]
+			frappe.db.sql(f"""
+				UPDATE `tab{self.entity_type}`
+				SET invoice_ninja_last_sync = %s
+				WHERE invoice_ninja_company = %s
+				AND invoice_ninja_id IN ({", ".join(["%s"] * len(chunk))})
+			""", (now, self.invoice_ninja_company, *chunk))
+			frappe.db.commit()
+
+
+def _merge_bucket(remote_ids, remote_versions, local_ids, local_versions):
+	"""
+	Merge-join two sorted buckets
+
+	Returns:
+		tuple: (missing_ids, extra_ids, stale_ids)
+	"""
+	missing, extra, stale = [], [], []
+	i = j = 0
+
+	while i < len(remote_ids) and j < len(local_ids):
+		if remote_ids[i] == local_ids[j]:
+			if remote_versions[i] > local_versions[j]:
+				stale.append(remote_ids[i])
+			i += 1
+			j += 1
+		elif remote_ids[i] < local_ids[j]:
+			missing.append(remote_ids[i])
+			i += 1
+		else:
+			extra.append(local_ids[j])
+			j += 1
+
+	missing.extend(remote_ids[i:])
+	extra.extend(local_ids[j:])
+	return missing, extra, stale
+
+
+def get_reconciliation_report(invoice_ninja_company, entity_type):
+	"""Get the last reconciliation report for a company and entity type"""
+	return frappe.cache().get_value(_report_key(invoice_ninja_company, entity_type))
+
+
+def run_reconciliation(invoice_ninja_company, entity_type, resync=True, max_resync=None):
+	"""Background job: reconcile one entity type of one company"""
+	try:
+		report = ReconciliationEngine(invoice_ninja_company, entity_type).run(
+			resync=resync, max_resync=max_resync
+		)
+	except Exception as e:
+		frappe.log_error(
+			f"Reconciliation of {entity_type} failed for {invoice_ninja_company}: {e!s}", "Reconciliation Error"
+		)
+		return {"success": False, "message": str(e)}
+
+	if not report.get("success"):
+		frappe.log_error(
+			f"Reconciliation of {entity_type} failed for {invoice_ninja_company}: {report.get('message')}",
+			"Reconciliation Error"
+		)
+	else:
+		frappe.logger().info(f"Invoice Ninja reconciliation for {invoice_ninja_company}: {report['message']}")
+
+	return report
+
+
+def _report_key(invoice_ninja_company, entity_type):
+	return f"invoice_ninja_reconciliation|{invoice_ninja_company}|{entity_type}"
@@ -5,53 +5,229 @@ import hashlib
 import json
 import frappe
 
+try:
+	import xxhash
+except ImportError:
+	xxhash = None
+
+
+# Stored hashes are "<scheme>:<digest>" and fit the 32 character sync hash fields;
+# hashes without a scheme prefix are legacy MD5 hashes (scheme "1")
+DIGEST_LENGTH = 28
+
+# Length of the per-field digests used to compute change sets
+FIELD_DIGEST_LENGTH = 12
+
+# Field, record and list separators of the canonical encoding
+FIELD_SEP = "\x1f"
+RECORD_SEP = "\x1e"
+LIST_SEP = "\x1d"
+
+# Child row keys that are part of the hash
+LINE_ITEM_KEYS = ("item_code", "qty", "rate", "amount")
+REFERENCE_KEYS = ("reference_doctype", "reference_name", "allocated_amount")
+
+
+def _digest_blake2b(data):
+	return hashlib.blake2b(data, digest_size=DIGEST_LENGTH // 2).hexdigest()
+
+
+def _digest_xxh3(data):
+	return xxhash.xxh3_128_hexdigest(data)[:DIGEST_LENGTH]
+
+
+# Tracked fields of each entity type, frozen for the schemes using them. A list is never
+# edited in place: tracking other fields means adding a new list and a new scheme for it
+TRACKED_FIELDS_V1 = {
+	"Customer": (
+		"customer_name", "customer_type", "customer_group",
+		"territory", "email_id", "mobile_no", "phone_no",
+		"website", "tax_id", "is_frozen"
+	),
+	"Sales Invoice": (
+		"customer", "posting_date", "due_date", "currency",
+		"conversion_rate", "total", "grand_total", "outstanding_amount",
+		"status", "items"  # Will hash line items separately
+	),
+	"Quotation": (
+		"party_name", "quotation_to", "transaction_date",
+		"valid_till", "currency", "grand_total", "status", "items"
+	),
+	"Item": (
+		"item_code", "item_name", "item_group", "stock_uom",
+		"description", "standard_rate", "is_stock_item"
+	),
+	"Payment Entry": (
+		"party_type", "party", "payment_type", "posting_date",
+		"paid_amount", "received_amount", "references"
+	),
+	"Invoice Ninja Task": (
+		"task_id", "description", "duration", "rate",
+		"is_invoiced", "status"
+	),
+}
+
+# Scheme -> (digest function, tracked fields). A new scheme is added whenever the encoding or
+# the tracked fields change, and old schemes are kept so stored hashes can be verified and
+# migrated lazily. "1" is the legacy MD5 hash; "2x" hashes were written by hosts with xxhash
+# installed before the scheme was pinned, and can only be verified where xxhash is available.
+SCHEMES = {
+	"1": (None, TRACKED_FIELDS_V1),
+	"2b": (_digest_blake2b, TRACKED_FIELDS_V1),
+}
+if xxhash:
+	SCHEMES["2x"] = (_digest_xxh3, TRACKED_FIELDS_V1)
+
+# Scheme of new hashes, pinned so every host writes the same hashes
+CURRENT_SCHEME = "2b"
+
+
+def versioned_digest(data):
+	"""Current-scheme "<scheme>:<digest>" of raw bytes"""
+	return f"{CURRENT_SCHEME}:{SCHEMES[CURRENT_SCHEME][0](data)}"
+
+
+def _encode_value(value):
+	"""Canonical text of a scalar or nested value"""
+	if value is None:
+		return ""
+	if isinstance(value, str):
+		return value
+	if isinstance(value, (bool, int, float)):
+		return repr(value)
+	if isinstance(value, (dict, list, tuple)):
+		return json.dumps(value, sort_keys=True, default=str)
+	return str(value)
+
+
+def _rows_encoder(keys):
+	def encode(rows):
+		if not isinstance(rows, list):
+			return _encode_value(rows)
+		return LIST_SEP.join(
+			RECORD_SEP.join(_encode_value(row.get(key)) for key in keys) for row in rows
+		)
+	return encode
+
+
+# Field -> encoder of fields that hold child rows
+FIELD_ENCODERS = {
+	"items": _rows_encoder(LINE_ITEM_KEYS),
+	"references": _rows_encoder(REFERENCE_KEYS),
+}
+
 
 class SyncHashManager:
 	"""Manages hashing and comparison for incremental sync"""
 
-	# Define which fields to track for each entity type
-	TRACKED_FIELDS = {
-		"Customer": [
-			"customer_name", "customer_type", "customer_group",
-			"territory", "email_id", "mobile_no", "phone_no",
-			"website", "tax_id", "is_frozen"
-		],
-		"Sales Invoice": [
-			"customer", "posting_date", "due_date", "currency",
-			"conversion_rate", "total", "grand_total", "outstanding_amount",
-			"status", "items"  # Will hash line items separately
-		],
-		"Quotation": [
-			"party_name", "quotation_to", "transaction_date",
-			"valid_till", "currency", "grand_total", "status", "items"
-		],
-		"Item": [
-			"item_code", "item_name", "item_group", "stock_uom",
-			"description", "standard_rate", "is_stock_item"
-		],
-		"Payment Entry": [
-			"party_type", "party", "payment_type", "posting_date",
-			"paid_amount", "received_amount", "references"
-		],
-		"Invoice Ninja Task": [
-			"task_id", "description", "duration", "rate",
-			"is_invoiced", "status"
-		]
-	}
+	# Tracked fields of the current scheme
+	TRACKED_FIELDS = SCHEMES[CURRENT_SCHEME][1]
+
+	# (scheme, entity type) -> precompiled (field, encoder) extractors, built on first use
+	_extractors = {}
 
 	@staticmethod
-	def calculate_hash(data, entity_type):
+	def calculate_hash(data, entity_type, scheme=None):
 		"""
-		Calculate hash for an entity based on tracked fields
+		Calculate the versioned hash of an entity's tracked fields
+
+		The tracked fields are encoded in one pass into a canonical string
+		(child rows included) and digested once.
 
 		Args:
 			data: Dictionary of entity data
 			entity_type: Type of entity (Customer, Sales Invoice, etc.)
+			scheme: Hash scheme, defaults to CURRENT_SCHEME
+
+		Returns:
+			str: "<scheme>:<digest>"
+		"""
+		scheme = scheme or CURRENT_SCHEME
+		if scheme == "1":
+			return SyncHashManager.calculate_legacy_hash(data, entity_type)
+
+		parts = []
+		for field, encode in SyncHashManager._get_extractors(scheme, entity_type):
+			if field in data:
+				parts.append(field + FIELD_SEP + encode(data[field]))
+
+		return f"{scheme}:{SCHEMES[scheme][0](RECORD_SEP.join(parts).encode())}"
+
+	@staticmethod
+	def calculate_field_hashes(data):
+		"""
+		Calculate a short hash of each mapped field, to compute the exact change set of an update
+
+		Args:
+			data: Dictionary of mapped entity data
+
+		Returns:
+			dict: field -> digest
+		"""
+		field_hashes = {}
+		for field, value in data.items():
+			if field != "doctype":
+				encoded = FIELD_ENCODERS.get(field, _encode_value)(value).encode()
+				field_hashes[field] = _digest_blake2b(encoded)[:FIELD_DIGEST_LENGTH]
+		return field_hashes
+
+	@staticmethod
+	def _get_extractors(scheme, entity_type):
+		extractors = SyncHashManager._extractors.get((scheme, entity_type))
+		if extractors is None:
+			extractors = [
+				(field, FIELD_ENCODERS.get(field, _encode_value))
+				for field in sorted(SCHEMES[scheme][1].get(entity_type, ()))
+			]
+			SyncHashManager._extractors[(scheme, entity_type)] = extractors
+		return extractors
+
+	@staticmethod
+	def get_scheme(hash_value):
+		"""Scheme of a stored hash ("1" for legacy unprefixed MD5 hashes)"""
+		if not hash_value:
+			return None
+		return hash_value.split(":", 1)[0] if ":" in hash_value else "1"
+
+	@staticmethod
+	def compare(stored_hash, new_hash, data, entity_type):
+		"""
+		Compare a stored hash with the current hash of the mapped data
+
+		A hash stored by an older scheme is recomputed with that scheme, so
+		records hashed before a scheme change are not reported as changed.
+
+		Args:
+			stored_hash: Hash stored at the last sync
+			new_hash: calculate_hash(data, entity_type) with the current scheme
+			data: Mapped entity data
+			entity_type: Type of entity
+
+		Returns:
+			tuple: (unchanged, needs_migration) - needs_migration is True if the
+				data is unchanged but the stored hash should be rewritten as new_hash
+		"""
+		if not stored_hash:
+			return False, False
+		if stored_hash == new_hash:
+			return True, False
+
+		scheme = SyncHashManager.get_scheme(stored_hash)
+		if scheme == SyncHashManager.get_scheme(new_hash) or scheme not in SCHEMES:
+			return False, False
+
+		unchanged = SyncHashManager.calculate_hash(data, entity_type, scheme=scheme) == stored_hash
+		return unchanged, unchanged
+
+	@staticmethod
+	def calculate_legacy_hash(data, entity_type):
+		"""
+		Calculate the legacy (scheme "1") hash of an entity, used to verify hashes stored before versioning
 
 		Returns:
 			str: MD5 hash of tracked fields
 		"""
-		tracked_fields = SyncHashManager.TRACKED_FIELDS.get(entity_type, [])
+		tracked_fields = SCHEMES["1"][1].get(entity_type, ())
 
 		# Extract only tracked fields
 		tracked_data = {}
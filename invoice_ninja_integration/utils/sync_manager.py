@@ -1,6 +1,7 @@
 import frappe
 
 from invoice_ninja_integration.utils.base_integration_service import BaseIntegrationService
+from invoice_ninja_integration.utils.bulk_push import BulkPushEngine
 from invoice_ninja_integration.utils.company_mapper import CompanyMapper
 from invoice_ninja_integration.utils.field_mapper import FieldMapper
 from invoice_ninja_integration.utils.invoice_ninja_client import InvoiceNinjaClient
@@ -678,38 +679,32 @@ class SyncManager(BaseIntegrationService):
 			frappe.log_error(f"Bulk sync failed: {e!s}", "Bulk Sync Error")
 			raise e
 
-	def sync_all_records_to_invoice_ninja(self, doc_type, limit=100):
-		"""Sync all records of a type from ERPNext to Invoice Ninja"""
-		try:
-			# Get all records of this doctype that don't have Invoice Ninja ID yet
-			filters = {"custom_invoice_ninja_id": ["is", "not set"]}
+	def sync_all_records_to_invoice_ninja(self, doc_type, limit=100, max_workers=None):
+		"""
+		Sync all unsynced records of a type from ERPNext to Invoice Ninja
 
-			# Add additional filters based on doctype
-			if doc_type == "Sales Invoice":
-				filters["docstatus"] = 1  # Only submitted invoices
-			elif doc_type == "Quotation":
-				filters["status"] = ["!=", "Cancelled"]
-			elif doc_type == "Payment Entry":
-				filters["docstatus"] = 1  # Only submitted payments
+		Uses BulkPushEngine: records are grouped by company, referenced data is
+		preloaded in batch queries, requests run concurrently over the pooled
+		client and returned IDs are written back in one UPDATE per batch.
 
-			records = frappe.get_list(doc_type, filters=filters, limit=limit, fields=["name"])
+		Args:
+			doc_type: ERPNext doctype
+			limit: Maximum number of records to push
+			max_workers: Concurrent requests per company (optional)
+		"""
+		if not self.is_sync_enabled(doc_type):
+			return {"synced": 0, "message": f"Sync disabled for {doc_type}"}
 
-			if not records:
-				return {"synced": 0, "message": "No records to sync"}
+		if not self.should_sync_from_erpnext(doc_type):
+			return {"synced": 0, "message": f"ERPNext to Invoice Ninja sync disabled for {doc_type}"}
 
-			synced_count = 0
+		try:
+			stats = BulkPushEngine(doc_type, max_workers=max_workers).run(limit=limit)
 
-			for record in records:
-				try:
-					doc = frappe.get_doc(doc_type, record.name)
-					result = self.sync_document_to_invoice_ninja(doc)
-					if result:
-						synced_count += 1
-				except Exception as e:
-					frappe.log_error(f"Failed to sync {doc_type} {record.name}: {e!s}", "Record Sync Error")
-					continue
+			if not stats["total"]:
+				return {"synced": 0, "message": "No records to sync"}
 
-			return {"synced": synced_count, "total": len(records)}
+			return {"synced": stats["synced"], "failed": stats["failed"], "total": stats["total"]}
 
 		except Exception as e:
 			frappe.log_error(f"Bulk sync to Invoice Ninja failed: {e!s}", "Bulk Sync Error")
@@ -950,10 +945,9 @@ class SyncManager(BaseIntegrationService):
 				params["include"] = entity_config["include_params"]
 
 			# Call the appropriate client method
-			if "include" in params:
-				entities_response = client_method(page=params["page"], per_page=params["per_page"], include=params["include"])
-			else:
-				entities_response = client_method(page=params["page"], per_page=params["per_page"])
+			if filters:
+				params["filters"] = filters
+			entities_response = client_method(**params)
 
 			# Validate response
 			if not entities_response:
@@ -0,0 +1,287 @@
+"""
+Staged fetch/write pipeline for Invoice Ninja Integration
+
+Streams pages of one entity type from Invoice Ninja into ERPNext with the
+network and database work overlapping instead of adding up:
+
+	fetch stage (N threads)  ->  bounded page queue  ->  write stage (1 thread)
+
+Fetcher threads claim page numbers and download them concurrently. Pages
+are claimed at most queue_size pages ahead of the next page to write, so
+fetchers block once the writer falls behind, including while it holds later
+pages back waiting for a slow early one. Pages are written in page order,
+so with a sorted listing everything before the last written record is known
+to be synced. The write stage maps and writes records on the calling thread,
+which owns the Frappe database connection (mapping reads the database, and a
+Frappe connection must not be shared across threads).
+
+Each stage exposes throughput and queue-depth metrics via metrics().
+"""
+
+import queue
+import threading
+import time
+
+from invoice_ninja_integration.utils.entity_mapper import EntityMapper
+
+
+class StageMetrics:
+	"""Thread-safe throughput counters for one pipeline stage"""
+
+	def __init__(self, name):
+		self.name = name
+		self.pages = 0
+		self.records = 0
+		self.busy_seconds = 0.0
+		self._lock = threading.Lock()
+
+	def record(self, records, seconds):
+		"""Record one processed page"""
+		with self._lock:
+			self.pages += 1
+			self.records += records
+			self.busy_seconds += seconds
+
+	def as_dict(self, elapsed):
+		return {
+			"pages": self.pages,
+			"records": self.records,
+			"busy_seconds": round(self.busy_seconds, 2),
+			"records_per_second": round(self.records / elapsed, 2) if elapsed else 0,
+		}
+
+
+class SyncPipeline:
+	"""Bounded producer/consumer pipeline for one entity type of one company"""
+
+	DEFAULT_FETCH_WORKERS = 3
+	DEFAULT_QUEUE_SIZE = 4
+
+	# Queue item that tells the writer all fetchers have finished
+	_DONE = object()
+
+	def __init__(self, client, entity_type, per_page=100, max_records=None,
+				fetch_workers=None, queue_size=None, params=None, time_budget=None, include=None):
+		"""
+		Args:
+			client: InvoiceNinjaClient for the company
+			entity_type: ERPNext doctype (Customer, Sales Invoice, ...)
+			per_page: Records per API page (max 100)
+			max_records: Stop after this many records (None = all)
+			fetch_workers: Number of concurrent fetcher threads
+			queue_size: Maximum pages buffered between fetch and write stages
+			params: Extra query parameters for every page request (filters)
+			time_budget: Stop writing new pages after this many seconds (None = no limit)
+			include: Related data to include (None = the entity's defaults, False = none)
+		"""
+		entity_config = EntityMapper.get_entity_config(entity_type)
+		self.client = client
+		self.endpoint = entity_config["invoice_ninja_endpoint"]
+		self.include = entity_config["include_params"] if include is None else include
+		self.params = params or {}
+		self.per_page = min(int(per_page), 100)
+		self.max_records = int(max_records) if max_records else None
+		self.max_pages = -(-self.max_records // self.per_page) if self.max_records else None
+		self.fetch_workers = fetch_workers or self.DEFAULT_FETCH_WORKERS
+
+		self.window = queue_size or self.DEFAULT_QUEUE_SIZE
+		self.pages = queue.Queue(maxsize=self.window)
+		self.fetch_metrics = StageMetrics("fetch")
+		self.write_metrics = StageMetrics("write")
+		self.time_budget = time_budget
+		self.max_queue_depth = 0
+		self.errors = []
+		# Record count reported by the API's pagination metadata
+		self.remote_total = None
+		# True when the time budget ran out before all pages were written
+		self.exhausted = False
+
+		self._next_page = 1
+		self._last_page = None
+		# Next page the writer needs; pages are only claimed within window of it
+		self._next_write = 1
+		self._page_lock = threading.Lock()
+		self._window_moved = threading.Condition(self._page_lock)
+		self._stop = threading.Event()
+		self._started_at = None
+		self._finished_at = None
+
+	def run(self, write_page):
+		"""
+		Run the pipeline until all pages are fetched and written
+
+		Args:
+			write_page: Callable(entities) invoked on the calling thread for each page
+
+		Returns:
+			int: Number of records written
+		"""
+		self._started_at = time.monotonic()
+		deadline = self._started_at + self.time_budget if self.time_budget else None
+		written = 0
+		# Pages that arrived ahead of their turn, by page number
+		out_of_order = {}
+		next_page = 1
+
+		fetchers = [
+			threading.Thread(target=self._fetch_loop, name=f"invoice-ninja-fetch-{i}", daemon=True)
+			for i in range(self.fetch_workers)
+		]
+		for fetcher in fetchers:
+			fetcher.start()
+
+		closer = threading.Thread(target=self._close_when_fetched, args=(fetchers,), daemon=True)
+		closer.start()
+
+		try:
+			while not self.exhausted:
+				self.max_queue_depth = max(self.max_queue_depth, self.pages.qsize())
+				item = self.pages.get()
+				if item is self._DONE:
+					break
+
+				page, entities = item
+				out_of_order[page] = entities
+
+				while next_page in out_of_order and not self.exhausted:
+					entities = out_of_order.pop(next_page)
+					next_page += 1
+					self._advance_window(next_page)
+
+					if self.max_records is not None:
+						entities = entities[:max(self.max_records - written, 0)]
+					if not entities:
+						continue
+
+					started = time.monotonic()
+					write_page(entities)
+					self.write_metrics.record(len(entities), time.monotonic() - started)
+					written += len(entities)
+
+					if deadline and time.monotonic() >= deadline:
+						self.exhausted = True
+		finally:
+			# Unblock fetchers waiting on a full queue or window if the writer stopped early
+			self._stop.set()
+			with self._window_moved:
+				self._window_moved.notify_all()
+			while not self.pages.empty():
+				self.pages.get_nowait()
+
+		self._finished_at = time.monotonic()
+		return written
+
+	@property
+	def pages_fetched(self):
+		return self.fetch_metrics.pages
+
+	def metrics(self):
+		"""
+		Throughput and queue-depth metrics for each stage
+
+		Returns:
+			dict: {elapsed_seconds, fetch: {...}, write: {...}, queue: {...}}
+		"""
+		end = self._finished_at or time.monotonic()
+		elapsed = end - self._started_at if self._started_at else 0
+
+		return {
+			"elapsed_seconds": round(elapsed, 2),
+			"fetch": {**self.fetch_metrics.as_dict(elapsed), "workers": self.fetch_workers},
+			"write": self.write_metrics.as_dict(elapsed),
+			"queue": {
+				"capacity": self.pages.maxsize,
+				"depth": self.pages.qsize(),
+				"max_depth": self.max_queue_depth,
+			},
+		}
+
+	def expected_records(self):
+		"""Number of records the run will fetch, once the first page reported the total"""
+		if self.remote_total is None:
+			return self.max_records
+		return min(self.remote_total, self.max_records) if self.max_records else self.remote_total
+
+	def _claim_page(self):
+		"""
+		Claim the next page number, or None once the end has been reached
+
+		Blocks while the page is a full window ahead of the next page to write.
+		"""
+		with self._window_moved:
+			while self._next_page >= self._next_write + self.window and not self._stop.is_set():
+				self._window_moved.wait(timeout=1)
+			if self._stop.is_set():
+				return None
+
+			page = self._next_page
+			if self._last_page is not None and page > self._last_page:
+				return None
+			if self.max_pages is not None and page > self.max_pages:
+				return None
+
+			self._next_page += 1
+			return page
+
+	def _mark_last_page(self, page):
+		with self._window_moved:
+			if self._last_page is None or page < self._last_page:
+				self._last_page = page
+			self._window_moved.notify_all()
+
+	def _advance_window(self, next_write):
+		"""Let fetchers claim pages up to a window ahead of the next page to write"""
+		with self._window_moved:
+			self._next_write = next_write
+			self._window_moved.notify_all()
+
+	def _fetch_loop(self):
+		"""Fetcher thread: download pages and push them into the bounded queue"""
+		while not self._stop.is_set():
+			page = self._claim_page()
+			if page is None:
+				return
+
+			params = {**self.params, "page": page, "per_page": self.per_page}
+			if self.include:
+				params["include"] = self.include
+
+			started = time.monotonic()
+			# Worker threads have no Frappe context, so errors are collected instead of logged
+			response = self.client.get(self.endpoint, params=params, log_errors=False)
+			elapsed = time.monotonic() - started
+
+			if not response or response.get("error"):
+				self.errors.append({"page": page, "message": (response or {}).get("message", "No response")})
+				self._mark_last_page(page - 1)
+				return
+
+			entities = response.get("data") or []
+			self.fetch_metrics.record(len(entities), elapsed)
+
+			total = ((response.get("meta") or {}).get("pagination") or {}).get("total")
+			if total is not None:
+				self.remote_total = int(total)
+
+			if len(entities) < self.per_page:
+				self._mark_last_page(page)
+
+			# Blocks while the queue is full (backpressure); re-check stop so we never hang
+			while not self._stop.is_set():
+				try:
+					self.pages.put((page, entities), timeout=1)
+					break
+				except queue.Full:
+					continue
+
+	def _close_when_fetched(self, fetchers):
+		"""Signal the writer once every fetcher has finished"""
+		for fetcher in fetchers:
+			fetcher.join()
+
+		while not self._stop.is_set():
+			try:
+				self.pages.put(self._DONE, timeout=1)
+				return
+			except queue.Full:
+				continue
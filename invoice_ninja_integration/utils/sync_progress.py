@@ -0,0 +1,148 @@
+"""
+Realtime sync progress
+
+Long syncs report their progress through frappe.publish_realtime instead of
+being polled. Events are published to the task room of the sync run ID, so a
+client only receives the runs it subscribed to (frappe.realtime.task_subscribe)
+and nothing is sent when nobody watches.
+
+Each (company, entity type) sync publishes at most a few events per second,
+carrying pages and records done, records per second, ETA and counts by
+outcome. The latest event of each run is also cached, so a client that
+subscribes late starts from the current state.
+"""
+
+import time
+
+import frappe
+
+
+PROGRESS_EVENT = "invoice_ninja_sync_progress"
+
+# Minimum seconds between two progress events of a sync
+MIN_PUBLISH_INTERVAL = 0.3
+
+# Seconds the latest progress of a run is kept for late subscribers
+PROGRESS_EXPIRY = 60 * 60
+
+# sync_stats key -> outcome reported to clients
+OUTCOMES = {
+	"new_records": "created",
+	"updated_records": "updated",
+	"unchanged_records": "unchanged",
+	"skipped_records": "skipped",
+	"failed_records": "failed",
+}
+
+
+# Cached progress entry holding the end of the run
+RUN_NODE = "__run__"
+
+
+def _progress_key(run_id):
+	return f"invoice_ninja_sync_progress|{run_id}"
+
+
+class SyncProgress:
+	"""Throttled progress events of one (company, entity type) sync"""
+
+	def __init__(self, run_id, invoice_ninja_company, entity_type, total=None):
+		"""
+		Args:
+			run_id: Sync run ID the client subscribed to
+			invoice_ninja_company: Name of Invoice Ninja Company doc
+			entity_type: Synced entity type
+			total: Expected number of records, if known (used for the ETA)
+		"""
+		self.run_id = run_id
+		self.invoice_ninja_company = invoice_ninja_company
+		self.entity_type = entity_type
+		self.total = int(total) if total else None
+		self.started = time.monotonic()
+		self.last_published = 0
+		self.pages_done = 0
+		self.records_done = 0
+
+	def page_done(self, records, sync_stats):
+		"""
+		Count a written page and publish progress unless an event was sent very recently
+
+		Args:
+			records: Number of records in the page
+			sync_stats: Statistics dict of the sync
+		"""
+		self.pages_done += 1
+		self.records_done += records
+
+		if time.monotonic() - self.last_published >= MIN_PUBLISH_INTERVAL:
+			self.publish(sync_stats)
+
+	def finish(self, sync_stats, status):
+		"""Publish the final progress of the sync, regardless of throttling"""
+		self.publish(sync_stats, status=status)
+
+	def publish(self, sync_stats, status="Running"):
+		elapsed = time.monotonic() - self.started
+		rate = self.records_done / elapsed if elapsed > 0 else 0
+		eta = None
+		if self.total and rate and status == "Running":
+			eta = round(max(self.total - self.records_done, 0) / rate)
+
+		progress = {
+			"run_id": self.run_id,
+			"invoice_ninja_company": self.invoice_ninja_company,
+			"entity_type": self.entity_type,
+			"status": status,
+			"pages_done": self.pages_done,
+			"records_done": self.records_done,
+			"total": self.total,
+			"records_per_second": round(rate, 1),
+			"eta_seconds": eta,
+			"elapsed_seconds": round(elapsed, 1),
+			"counts": {outcome: sync_stats.get(key, 0) for key, outcome in OUTCOMES.items()},
+		}
+
+		publish_progress(self.run_id, progress)
+		self.last_published = time.monotonic()
+
+
+def publish_progress(run_id, progress):
+	"""
+	Publish a progress event to the subscribers of a run and keep it for late subscribers
+
+	Args:
+		run_id: Sync run ID
+		progress: Event payload; "invoice_ninja_company" and "entity_type" identify the sync
+	"""
+	cache = frappe.cache()
+	node = f"{progress.get('invoice_ninja_company') or ''}::{progress.get('entity_type') or ''}"
+	cache.hset(_progress_key(run_id), node, progress)
+	cache.expire(cache.make_key(_progress_key(run_id)), PROGRESS_EXPIRY)
+
+	frappe.publish_realtime(PROGRESS_EVENT, progress, task_id=run_id, after_commit=False)
+
+
+def publish_run_finished(run_id, summary):
+	"""
+	Publish the end of a sync run to its subscribers
+
+	Args:
+		run_id: Sync run ID
+		summary: Run status (see SyncScheduler.get_run_status)
+	"""
+	event = {"run_id": run_id, "status": summary.get("status"), "finished": True, "summary": summary}
+	cache = frappe.cache()
+	cache.hset(_progress_key(run_id), RUN_NODE, event)
+	cache.expire(cache.make_key(_progress_key(run_id)), PROGRESS_EXPIRY)
+	frappe.publish_realtime(PROGRESS_EVENT, event, task_id=run_id, after_commit=False)
+
+
+def get_latest_progress(run_id):
+	"""
+	Latest progress of every sync of a run
+
+	Returns:
+		dict: "<company>::<entity type>" -> last progress event, plus RUN_NODE once the run finished
+	"""
+	latest = frappe.cache().hgetall(_progress_key(run_id)) or {}
+	return {(k.decode() if isinstance(k, bytes) else k): v for k, v in latest.items()}
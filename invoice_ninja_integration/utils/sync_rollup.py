@@ -0,0 +1,147 @@
+"""
+Hourly sync statistics rollup
+
+Sync statistics used to be computed from the raw sync logs (or from RQ Job
+names matched with LIKE), scanning every row of the period. Instead, each
+sync log is counted into an Invoice Ninja Sync Rollup row per (hour,
+company, entity type, direction, status) as it is written, holding the
+number of logs and their total duration. Statistics are then served from
+those few rows with indexed range queries on the hour.
+
+Rows are named after their bucket, so counting a log is a single atomic
+upsert. The rollup keeps the history of logs removed by log retention.
+"""
+
+import hashlib
+
+import frappe
+from frappe.utils import get_datetime, now_datetime
+
+
+# Fields identifying a rollup bucket
+BUCKET_FIELDS = ["hour", "invoice_ninja_company", "entity_type", "sync_direction", "status"]
+
+# Maximum rows per upsert
+WRITE_CHUNK_SIZE = 500
+
+
+def floor_to_hour(value):
+	"""Start of the hour of a datetime (or datetime string)"""
+	return get_datetime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _bucket_name(bucket):
+	key = "|".join(str(value or "") for value in bucket)
+	return hashlib.blake2b(key.encode(), digest_size=10).hexdigest()
+
+
+def add_log(log, sign=1):
+	"""
+	Count a sync log into its hourly bucket
+
+	Args:
+		log: Invoice Ninja Sync Logs doc (or dict)
+		sign: -1 to remove a previously counted log (e.g. before a status change)
+	"""
+	bucket = (
+		floor_to_hour(log.get("sync_timestamp") or now_datetime()),
+		log.get("invoice_ninja_company") or "",
+		log.get("record_type") or "",
+		log.get("sync_direction") or "",
+		log.get("status") or "",
+	)
+	upsert([(*bucket, sign, sign * (log.get("duration") or 0))])
+
+
+def upsert(rows):
+	"""
+	Add counts and durations to their buckets, creating missing buckets
+
+	Args:
+		rows: (hour, company, entity type, direction, status, count, total duration) tuples
+	"""
+	now = now_datetime()
+	user = frappe.session.user
+
+	if frappe.db.db_type == "postgres":
+		on_conflict = """ON CONFLICT (name) DO UPDATE SET
+			sync_count = `tabInvoice Ninja Sync Rollup`.sync_count + EXCLUDED.sync_count,
+			total_duration = `tabInvoice Ninja Sync Rollup`.total_duration + EXCLUDED.total_duration,
+			modified = EXCLUDED.modified"""
+	else:
+		on_conflict = """ON DUPLICATE KEY UPDATE
+			sync_count = sync_count + VALUES(sync_count),
+			total_duration = total_duration + VALUES(total_duration),
+			modified = VALUES(modified)"""
+
+	for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+		chunk = rows[start:start + WRITE_CHUNK_SIZE]
+		values = []
+		for row in chunk:
+			values += [_bucket_name(row[:5]), *row, now, now, user, user]
+
+		frappe.db.sql(f"""
+			INSERT INTO `tabInvoice Ninja Sync Rollup`
+				(name, {", ".join(BUCKET_FIELDS)}, sync_count, total_duration,
+				creation, modified, owner, modified_by)
+			VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))}
+			{on_conflict}
+		""", values)
+
+
+def rebuild():
+	"""Recompute the whole rollup from the sync logs with one grouped query"""
+	if frappe.db.db_type == "postgres":
+		hour = "date_trunc('hour', sync_timestamp)"
+	else:
+		hour = "TIMESTAMPADD(HOUR, HOUR(sync_timestamp), DATE(sync_timestamp))"
+
+	rows = frappe.db.sql(f"""
+		SELECT {hour} AS hour,
+			COALESCE(invoice_ninja_company, '') AS invoice_ninja_company,
+			COALESCE(record_type, '') AS entity_type,
+			COALESCE(sync_direction, '') AS sync_direction,
+			COALESCE(status, '') AS status,
+			COUNT(*) AS sync_count,
+			COALESCE(SUM(duration), 0) AS total_duration
+		FROM `tabInvoice Ninja Sync Logs`
+		WHERE sync_timestamp IS NOT NULL
+		GROUP BY 1, 2, 3, 4, 5
+	""")
+
+	frappe.db.delete("Invoice Ninja Sync Rollup")
+	upsert([tuple(row) for row in rows])
+
+
+def get_totals(since, group_by=("entity_type", "status"), invoice_ninja_company=None, status=None):
+	"""
+	Log counts and durations since a datetime, grouped by bucket fields
+
+	The range starts at the hour of since, so that hour is counted whole.
+
+	Args:
+		since: Start of the period
+		group_by: Bucket fields to group by
+		invoice_ninja_company: Only count this company
+		status: Only count this status
+
+	Returns:
+		list: Dicts of the group_by fields plus sync_count and total_duration
+	"""
+	conditions = ["hour >= %(since)s"]
+	if invoice_ninja_company:
+		conditions.append("invoice_ninja_company = %(invoice_ninja_company)s")
+	if status:
+		conditions.append("status = %(status)s")
+
+	columns = ", ".join(f"`{field}`" for field in group_by)
+	return frappe.db.sql(f"""
+		SELECT {columns}, SUM(sync_count) AS sync_count, SUM(total_duration) AS total_duration
+		FROM `tabInvoice Ninja Sync Rollup`
+		WHERE {" AND ".join(conditions)}
+		GROUP BY {columns}
+	""", {
+		"since": floor_to_hour(since),
+		"invoice_ninja_company": invoice_ninja_company,
+		"status": status,
+	}, as_dict=True)
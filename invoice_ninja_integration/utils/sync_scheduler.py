@@ -0,0 +1,328 @@
+"""
+Dependency-ordered sync scheduler for Invoice Ninja Integration
+
+Runs a multi-entity sync for one or more Invoice Ninja Companies as a DAG of
+background jobs, one job per (company, entity type). Entity types without
+prerequisites (reference data, customers, items) are enqueued at once and run
+concurrently on the available workers; dependent types are enqueued as soon as
+all of their prerequisites for the same company have finished. Companies are
+independent of each other, so total sync time scales with the worker count.
+
+Run state lives in Redis so that any worker can complete a node and release
+its dependents. Prerequisites that fail do not block dependents: missing
+customers and invoices are fetched on demand by ID during the dependent sync.
+
+A Redis lock per (company, entity type) prevents two runs from syncing the
+same entity of the same company at the same time.
+
+A node whose job was killed never reports a result; once it has been running
+for longer than NODE_TIMEOUT, get_run_status records it as failed and
+releases its dependents.
+"""
+
+import time
+
+import frappe
+from frappe.utils import now_datetime
+
+from invoice_ninja_integration.utils.sync_progress import publish_run_finished
+
+
+# Entity type -> entity types that must finish first
+SYNC_DEPENDENCIES = {
+	"Customer Group": [],
+	"Tax Rate": [],
+	"Customer": [],
+	"Item": [],
+	"Sales Invoice": ["Customer", "Item", "Tax Rate"],
+	"Quotation": ["Customer", "Item", "Tax Rate"],
+	"Payment Entry": ["Sales Invoice"],
+}
+
+# Reference data synced before every multi-entity run
+REFERENCE_NODES = ["Customer Group", "Tax Rate"]
+
+# Per-node job timeout; the entity lock expires with it so a killed job cannot hold it forever
+NODE_TIMEOUT = 1800
+
+# Run state is kept for a day so summaries can be inspected after completion
+RUN_STATE_EXPIRY = 24 * 60 * 60
+
+# Separator between company and entity type in node keys
+NODE_SEPARATOR = "::"
+
+
+class SyncScheduler:
+	"""Schedules multi-company, multi-entity syncs as a dependency graph of jobs"""
+
+	@staticmethod
+	def build_graph(invoice_ninja_companies, entity_types):
+		"""
+		Build the dependency graph for the requested companies and entity types
+
+		Args:
+			invoice_ninja_companies: List of Invoice Ninja Company doc names
+			entity_types: List of entity types to sync
+
+		Returns:
+			dict: Node key ("<company>::<entity type>") -> prerequisite node keys
+		"""
+		entities = [n for n in REFERENCE_NODES if n not in entity_types] + list(entity_types)
+		unknown = [n for n in entities if n not in SYNC_DEPENDENCIES]
+		if unknown:
+			frappe.throw(f"Unsupported entity types for scheduled sync: {', '.join(unknown)}")
+
+		# Prerequisites outside the run are resolved on demand instead of waited on
+		graph = {}
+		for company in invoice_ninja_companies:
+			for entity in entities:
+				graph[_node_key(company, entity)] = [
+					_node_key(company, dep) for dep in SYNC_DEPENDENCIES[entity] if dep in entities
+				]
+
+		return graph
+
+	@staticmethod
+	def start(invoice_ninja_company, entity_types, limit=100, now=False, priority="bulk"):
+		"""
+		Start a dependency-ordered sync run for one or more companies
+
+		Args:
+			invoice_ninja_company: Invoice Ninja Company doc name, or a list of them
+			entity_types: List of entity types to sync
+			limit: Records per entity type
+			now: Run jobs inline instead of enqueuing (tests / console)
+			priority: Job priority: "interactive" for user-started runs, "bulk" for scheduled ones
+
+		Returns:
+			str: Run ID
+		"""
+		if isinstance(invoice_ninja_company, str):
+			companies = [invoice_ninja_company]
+		else:
+			companies = list(invoice_ninja_company)
+
+		graph = SyncScheduler.build_graph(companies, entity_types)
+		run_id = frappe.generate_hash(length=12)
+
+		dependents = {node: [] for node in graph}
+		for node, prerequisites in graph.items():
+			for prerequisite in prerequisites:
+				dependents[prerequisite].append(node)
+
+		state = {
+			"invoice_ninja_companies": companies,
+			"limit": int(limit),
+			"graph": graph,
+			"dependents": dependents,
+			"priority": priority,
+			"started_at": str(now_datetime()),
+			"now": now,
+		}
+
+		cache = frappe.cache()
+		cache.set_value(_state_key(run_id), state, expires_in_sec=RUN_STATE_EXPIRY)
+
+		# Remaining prerequisites per node, plus the number of unfinished nodes.
+		# Stored as raw integers (not pickled) so they can be decremented atomically.
+		pending_key = cache.make_key(_pending_key(run_id))
+		cache.hincrby(pending_key, "__remaining__", len(graph))
+		for node, prerequisites in graph.items():
+			cache.hincrby(pending_key, node, len(prerequisites))
+		cache.expire(pending_key, RUN_STATE_EXPIRY)
+
+		for node, prerequisites in graph.items():
+			if not prerequisites:
+				_enqueue_node(run_id, node, state)
+
+		return run_id
+
+	@staticmethod
+	def get_run_status(run_id):
+		"""
+		Get progress and aggregated results for a run
+
+		Returns:
+			dict: {run_id, status, completed, total, synced_count, failed_count, companies}
+		"""
+		state = frappe.cache().get_value(_state_key(run_id))
+		if not state:
+			return None
+
+		results = _get_hash(_results_key(run_id))
+
+		# Nodes killed by the job timeout never write a result themselves
+		now = time.time()
+		for node, started_at in _get_hash(_started_key(run_id)).items():
+			if node not in results and now - started_at > NODE_TIMEOUT:
+				_complete_node(run_id, node, state, {
+					"success": False,
+					"message": f"No result after {NODE_TIMEOUT} seconds; the job was presumably killed",
+				})
+				results = _get_hash(_results_key(run_id))
+
+		companies = {company: {} for company in state["invoice_ninja_companies"]}
+		for node, result in results.items():
+			company, entity = node.rsplit(NODE_SEPARATOR, 1)
+			companies.setdefault(company, {})[entity] = result
+
+		total = len(state["graph"])
+		failed_nodes = [node for node, r in results.items() if not r.get("success")]
+
+		if len(results) < total:
+			status = "In Progress"
+		elif not failed_nodes:
+			status = "Success"
+		elif len(failed_nodes) == total:
+			status = "Failed"
+		else:
+			status = "Partial"
+
+		return {
+			"run_id": run_id,
+			"status": status,
+			"started_at": state["started_at"],
+			"completed": len(results),
+			"total": total,
+			"synced_count": sum(r.get("synced_count", 0) for r in results.values()),
+			"failed_count": sum(r.get("failed_count", 0) for r in results.values()),
+			"failed_nodes": failed_nodes,
+			"companies": companies,
+		}
+
+
+def run_sync_node(run_id, node):
+	"""
+	Background job: sync one (company, entity type) node of a run, then release its dependents
+
+	Args:
+		run_id: Sync run ID
+		node: Node key ("<company>::<entity type>")
+	"""
+	state = frappe.cache().get_value(_state_key(run_id))
+	if not state:
+		frappe.log_error(f"Sync run {run_id} state expired before {node} ran", "Sync Scheduler Error")
+		return
+
+	company, entity = node.rsplit(NODE_SEPARATOR, 1)
+	cache = frappe.cache()
+	cache.hset(_started_key(run_id), node, time.time())
+
+	# One sync per (company, entity) at a time across all runs
+	lock = cache.lock(cache.make_key(f"invoice_ninja_sync_lock|{node}"), timeout=NODE_TIMEOUT)
+	if lock.acquire(blocking=False):
+		try:
+			result = _execute_node(entity, company, state["limit"], run_id=run_id)
+		except Exception as e:
+			frappe.log_error(f"Scheduled {entity} sync failed for {company}: {e!s}", "Sync Scheduler Error")
+			result = {"success": False, "message": str(e)}
+		finally:
+			try:
+				lock.release()
+			except Exception:
+				# Lock expired while the job was running
+				pass
+	else:
+		result = {"success": True, "skipped": True, "message": f"{entity} sync already running for {company}"}
+
+	_complete_node(run_id, node, state, result)
+
+
+def _complete_node(run_id, node, state, result):
+	"""Store the result of a node and release its dependents, once per node"""
+	cache = frappe.cache()
+	pending_key = cache.make_key(_pending_key(run_id))
+
+	# A node recorded as timed out may still finish later; only the first completion counts
+	if cache.hincrby(pending_key, f"__finished__|{node}", 1) != 1:
+		return
+
+	cache.hset(_results_key(run_id), node, {
+		"success": bool(result.get("success")),
+		"skipped": bool(result.get("skipped")),
+		"message": result.get("message") or result.get("error"),
+		"synced_count": result.get("synced_count", 0),
+		"failed_count": result.get("failed_count", 0),
+	})
+
+	# Atomic decrement: exactly one finishing prerequisite releases each dependent
+	for dependent in state["dependents"].get(node, []):
+		if cache.hincrby(pending_key, dependent, -1) == 0:
+			_enqueue_node(run_id, dependent, state)
+
+	if cache.hincrby(pending_key, "__remaining__", -1) == 0:
+		_finish_run(run_id)
+
+
+def _execute_node(entity, invoice_ninja_company, limit, run_id=None):
+	"""Run the sync for a single entity type of a company"""
+	from invoice_ninja_integration.api import (
+		get_invoice_ninja_customer_groups,
+		get_invoice_ninja_tax_rates,
+		sync_company_entities,
+	)
+
+	if entity == "Customer Group":
+		return get_invoice_ninja_customer_groups(invoice_ninja_company)
+	elif entity == "Tax Rate":
+		return get_invoice_ninja_tax_rates(invoice_ninja_company)
+
+	return sync_company_entities(invoice_ninja_company, entity, limit=limit, progress_id=run_id)
+
+
+def _enqueue_node(run_id, node, state):
+	"""Enqueue the job for one node of a run"""
+	from invoice_ninja_integration.utils.job_queues import enqueue_job
+
+	# Never throttled: dependents are only released when this node finishes
+	enqueue_job(
+		"invoice_ninja_integration.utils.sync_scheduler.run_sync_node",
+		state.get("priority") or "bulk",
+		timeout=NODE_TIMEOUT,
+		job_id=f"invoice_ninja_sync::{run_id}::{node}",
+		now=state.get("now"),
+		run_id=run_id,
+		node=node,
+	)
+
+
+def _finish_run(run_id):
+	"""Log the run summary and notify its subscribers once the last node has finished"""
+	status = SyncScheduler.get_run_status(run_id)
+	if not status:
+		return
+
+	frappe.logger().info(
+		f"Invoice Ninja sync run {run_id} finished ({status['status']}): "
+		f"{status['synced_count']} records synced, {status['failed_count']} failed "
+		f"across {len(status['companies'])} companies"
+		+ (f"; failed: {', '.join(status['failed_nodes'])}" if status["failed_nodes"] else "")
+	)
+
+	publish_run_finished(run_id, status)
+
+
+def _node_key(company, entity):
+	return f"{company}{NODE_SEPARATOR}{entity}"
+
+
+def _state_key(run_id):
+	return f"invoice_ninja_sync_run|{run_id}"
+
+
+def _pending_key(run_id):
+	return f"invoice_ninja_sync_run_pending|{run_id}"
+
+
+def _results_key(run_id):
+	return f"invoice_ninja_sync_run_results|{run_id}"
+
+
+def _started_key(run_id):
+	return f"invoice_ninja_sync_run_started|{run_id}"
+
+
+def _get_hash(key):
+	"""All fields of a cached hash, with decoded field names"""
+	values = frappe.cache().hgetall(key) or {}
+	return {(k.decode() if isinstance(k, bytes) else k): v for k, v in values.items()}
@@ -0,0 +1,224 @@
+"""
+Compact sync state for incremental sync
+
+Instead of reading and writing invoice_ninja_sync_hash on the wide ERPNext
+transaction tables, each synced record has a narrow Invoice Ninja Sync State
+row keyed by (Invoice Ninja company, entity type, Invoice Ninja ID), holding
+the document name, the hash of the raw payload, the hash of the mapped
+document and of each of its fields, the remote updated_at and the last sync
+time. Records that fail to sync get a row too, counting their consecutive
+failed attempts.
+
+SyncStateStore preloads the rows of a page with one query, so a record whose
+payload did not change is reported unchanged without being mapped or looked
+up, and writes every new or changed row with one bulk upsert per page.
+"""
+
+import json
+
+import frappe
+from frappe.utils import now_datetime
+
+from invoice_ninja_integration.utils.sync_hash import versioned_digest
+
+
+STATE_FIELDS = [
+	"document_name", "payload_hash", "mapped_hash", "field_hashes", "remote_updated_at", "last_synced",
+	"failed_attempts",
+]
+
+# Consecutive failures after which a record no longer holds back the delta sync watermark
+MAX_SYNC_ATTEMPTS = 3
+
+# Maximum rows per INSERT/UPDATE
+WRITE_CHUNK_SIZE = 500
+
+
+def payload_hash(entity):
+	"""Hash of a raw Invoice Ninja record"""
+	return versioned_digest(json.dumps(entity, sort_keys=True, default=str).encode())
+
+
+class SyncStateStore:
+	"""Sync state rows of one entity type of one Invoice Ninja Company"""
+
+	def __init__(self, invoice_ninja_company, entity_type):
+		self.invoice_ninja_company = invoice_ninja_company
+		self.entity_type = entity_type
+		# Invoice Ninja ID -> stored row
+		self.rows = {}
+		# Invoice Ninja ID -> fields to write on flush
+		self.pending = {}
+		# Invoice Ninja ID -> payload hash, taken before mapping annotates the record
+		self.payload_hashes = {}
+
+	def preload(self, entities):
+		"""
+		Load the stored state of a page of records with one query
+
+		Args:
+			entities: Invoice Ninja record dicts of the page
+		"""
+		for entity in entities:
+			if entity.get("id"):
+				self.payload_hashes[str(entity["id"])] = payload_hash(entity)
+
+		invoice_ninja_ids = [i for i in self.payload_hashes if i not in self.rows]
+		if not invoice_ninja_ids:
+			return
+
+		for row in frappe.get_all(
+			"Invoice Ninja Sync State",
+			filters={
+				"invoice_ninja_company": self.invoice_ninja_company,
+				"entity_type": self.entity_type,
+				"invoice_ninja_id": ["in", invoice_ninja_ids],
+			},
+			fields=["name", "invoice_ninja_id", *STATE_FIELDS],
+		):
+			self.rows[row.invoice_ninja_id] = row
+
+	def get(self, invoice_ninja_id):
+		"""Stored state of a record (including unflushed changes), or None"""
+		invoice_ninja_id = str(invoice_ninja_id)
+		row = self.rows.get(invoice_ninja_id)
+		pending = self.pending.get(invoice_ninja_id)
+		if pending:
+			return frappe._dict({**(row or {}), **pending})
+		return row
+
+	def get_existing(self, invoice_ninja_id):
+		"""
+		Document name and hashes of a synced record, shaped like safe_get_with_sync_hash
+
+		Returns:
+			dict: {"name", "invoice_ninja_sync_hash", "field_hashes"}, or None if the record
+				has no state yet; field_hashes is None if they were never stored
+		"""
+		state = self.get(invoice_ninja_id)
+		if not state or not state.document_name:
+			return None
+
+		field_hashes = state.field_hashes
+		if isinstance(field_hashes, str):
+			field_hashes = json.loads(field_hashes)
+
+		return frappe._dict({
+			"name": state.document_name,
+			"invoice_ninja_sync_hash": state.mapped_hash,
+			"field_hashes": field_hashes or None,
+		})
+
+	def is_unchanged(self, entity):
+		"""True if a record was synced before and its payload has not changed since"""
+		invoice_ninja_id = str(entity.get("id"))
+		state = self.get(invoice_ninja_id)
+		return bool(
+			state and state.document_name
+			and state.payload_hash == (self.payload_hashes.get(invoice_ninja_id) or payload_hash(entity))
+		)
+
+	def record(self, invoice_ninja_id, **values):
+		"""
+		Queue state fields of a record for the next flush
+
+		Args:
+			invoice_ninja_id: Invoice Ninja ID
+			values: Any of document_name, payload_hash, mapped_hash, field_hashes (dict),
+				remote_updated_at
+		"""
+		pending = self.pending.setdefault(str(invoice_ninja_id), {})
+		pending.update(values)
+		pending["last_synced"] = now_datetime()
+
+	def record_synced(self, entity):
+		"""Queue the payload hash and remote updated_at of a successfully synced record"""
+		invoice_ninja_id = str(entity.get("id"))
+		self.record(
+			invoice_ninja_id,
+			payload_hash=self.payload_hashes.get(invoice_ninja_id) or payload_hash(entity),
+			remote_updated_at=entity.get("updated_at") or 0,
+			failed_attempts=0,
+		)
+
+	def record_failure(self, invoice_ninja_id):
+		"""
+		Queue one more failed sync attempt of a record; its synced state is left as it was
+
+		Returns:
+			int: Consecutive failed attempts of the record, including this one
+		"""
+		state = self.get(invoice_ninja_id)
+		failed_attempts = ((state and state.failed_attempts) or 0) + 1
+		self.pending.setdefault(str(invoice_ninja_id), {})["failed_attempts"] = failed_attempts
+		return failed_attempts
+
+	def flush(self):
+		"""Write the queued state: one UPDATE for known rows and one INSERT for new rows per chunk"""
+		if not self.pending:
+			return
+
+		updates = {}
+		inserts = []
+		for invoice_ninja_id, values in self.pending.items():
+			row = frappe._dict({**(self.rows.get(invoice_ninja_id) or {}), **values})
+			if isinstance(row.field_hashes, dict):
+				row.field_hashes = json.dumps(row.field_hashes, sort_keys=True)
+			if row.get("name"):
+				updates[row.name] = row
+			else:
+				row.name = frappe.generate_hash(length=10)
+				row.invoice_ninja_id = invoice_ninja_id
+				# Int columns are NOT NULL; rows of failed records have no remote updated_at yet
+				row.remote_updated_at = row.remote_updated_at or 0
+				row.failed_attempts = row.failed_attempts or 0
+				inserts.append(row)
+			self.rows[invoice_ninja_id] = row
+
+		self._update_rows(updates)
+		self._insert_rows(inserts)
+		self.pending = {}
+
+	def _update_rows(self, updates):
+		names = list(updates)
+		now = now_datetime()
+		for start in range(0, len(names), WRITE_CHUNK_SIZE):
+			chunk = names[start:start + WRITE_CHUNK_SIZE]
+			assignments = []
+			params = []
+			for field in STATE_FIELDS:
+				assignments.append(f"`{field}` = CASE name {' '.join(['WHEN %s THEN %s'] * len(chunk))} END")
+				for name in chunk:
+					params += [name, updates[name].get(field)]
+
+			frappe.db.sql(f"""
+				UPDATE `tabInvoice Ninja Sync State`
+				SET {", ".join(assignments)}, modified = %s
+				WHERE name IN ({", ".join(["%s"] * len(chunk))})
+			""", (*params, now, *chunk))
+
+	def _insert_rows(self, inserts):
+		now = now_datetime()
+		user = frappe.session.user
+		for start in range(0, len(inserts), WRITE_CHUNK_SIZE):
+			frappe.db.bulk_insert(
+				"Invoice Ninja Sync State",
+				fields=[
+					"name", "invoice_ninja_company", "entity_type", "invoice_ninja_id", *STATE_FIELDS,
+					"creation", "modified", "owner", "modified_by",
+				],
+				values=[
+					(
+						row.name, self.invoice_ninja_company, self.entity_type, row.invoice_ninja_id,
+						*(row.get(field) for field in STATE_FIELDS), now, now, user, user,
+					)
+					for row in inserts[start:start + WRITE_CHUNK_SIZE]
+				],
+				# A concurrent run may have inserted the same key; its row is as fresh as ours
+				ignore_duplicates=True,
+			)
+
+
+def delete_sync_state(doc, method=None):
+	"""doc_events on_trash: drop the sync state of a deleted ERPNext document"""
+	frappe.db.delete("Invoice Ninja Sync State", {"entity_type": doc.doctype, "document_name": doc.name})
@@ -0,0 +1,180 @@
+"""
+Set-based task linking for time-billing invoices
+
+Invoice Ninja invoices can embed the tasks they bill (line_items[].task).
+Instead of inserting and committing each task while its line item is mapped,
+and saving every task document after the invoice syncs:
+
+- upsert_inline_tasks collects the inline tasks of a whole page, resolves
+  existing tasks, customers and projects with one query each, inserts the new
+  tasks with one bulk insert and refreshes the existing ones with one UPDATE;
+- mark_tasks_invoiced links the billed tasks to their Sales Invoice with one
+  UPDATE.
+
+Tasks are written with plain SQL rather than through the ORM: Invoice Ninja
+Task has no validation or lifecycle hooks, and is only ever written by this
+sync. The one side effect skipped is the Version (change tracking) record of
+each write. New tasks still get their IN-TASK- names from the naming series.
+Switch to inserting and saving documents if the doctype ever gains hooks.
+"""
+
+import frappe
+from frappe.model.naming import set_new_name
+from frappe.utils import now_datetime
+
+from invoice_ninja_integration.utils.field_mapper import FieldMapper
+
+
+# Task fields refreshed on existing tasks; invoicing fields are owned by mark_tasks_invoiced
+REFRESH_FIELDS = [
+	"task_number", "description", "customer", "project", "duration", "duration_hours",
+	"start_time", "end_time", "is_running", "rate", "last_synced",
+]
+
+# Maximum tasks per INSERT/UPDATE
+UPDATE_CHUNK_SIZE = 500
+
+
+def upsert_inline_tasks(line_items, invoice_ninja_company=None):
+	"""
+	Create or refresh the tasks embedded in line items, in one batch
+
+	Each line item with an inline task gets the task's document name in
+	"erpnext_task", so later calls (e.g. per document after the page did the
+	batch) skip it.
+
+	Args:
+		line_items: Invoice Ninja line item dicts, e.g. of every invoice in a page
+		invoice_ninja_company: Invoice Ninja Company doc name
+
+	Returns:
+		dict: {"created": int, "updated": int}
+	"""
+	pending = [item for item in line_items if item.get("task") and not item.get("erpnext_task")]
+	if not pending:
+		return {"created": 0, "updated": 0}
+
+	# Task ID -> task data, one entry per task even if it is billed on several lines
+	tasks = {str(item["task"]["id"]): item["task"] for item in pending if item["task"].get("id")}
+	if not tasks:
+		return {"created": 0, "updated": 0}
+
+	existing = dict(frappe.get_all(
+		"Invoice Ninja Task",
+		filters={"task_id": ["in", list(tasks)]},
+		fields=["task_id", "name"],
+		as_list=True,
+	))
+
+	prefetched = {
+		"customers": _get_names_by_invoice_ninja_id(
+			"Customer", "invoice_ninja_id", {t.get("client_id") for t in tasks.values()}
+		),
+		"projects": _get_names_by_invoice_ninja_id(
+			"Project", "invoice_ninja_project_id", {t.get("project_id") for t in tasks.values()}
+		),
+	}
+
+	names = dict(existing)
+	inserts = []
+	updates = {}
+	for task_id, task_data in tasks.items():
+		task_doc_data = FieldMapper.map_task_from_invoice_ninja(
+			task_data, invoice_ninja_company, prefetched=prefetched
+		)
+		if not task_doc_data:
+			continue
+
+		if task_id in existing:
+			updates[existing[task_id]] = task_doc_data
+		else:
+			doc = frappe.get_doc(task_doc_data)
+			set_new_name(doc)
+			inserts.append({**task_doc_data, "name": doc.name})
+			names[task_id] = doc.name
+
+	_insert_tasks(inserts)
+	_refresh_tasks(updates)
+	frappe.db.commit()
+
+	for item in pending:
+		task_name = names.get(str(item["task"].get("id")))
+		if task_name:
+			item["erpnext_task"] = task_name
+
+	return {"created": len(names) - len(existing), "updated": len(updates)}
+
+
+def mark_tasks_invoiced(task_ids, sales_invoice):
+	"""
+	Mark tasks as invoiced and link them to their Sales Invoice with one UPDATE
+
+	Args:
+		task_ids: Invoice Ninja task IDs billed on the invoice
+		sales_invoice: ERPNext Sales Invoice name
+	"""
+	task_ids = list({str(task_id) for task_id in task_ids if task_id})
+	if not task_ids:
+		return
+
+	frappe.db.sql(f"""
+		UPDATE `tabInvoice Ninja Task`
+		SET status = 'Invoiced', is_invoiced = 1, sales_invoice = %s, modified = %s
+		WHERE task_id IN ({_placeholders(task_ids)})
+	""", (sales_invoice, now_datetime(), *task_ids))
+
+
+def _insert_tasks(inserts):
+	"""Insert new tasks (mapped task data plus name) with one bulk insert per chunk"""
+	if not inserts:
+		return
+
+	fields = [field for field in inserts[0] if field != "doctype"]
+	now = now_datetime()
+	user = frappe.session.user
+	for start in range(0, len(inserts), UPDATE_CHUNK_SIZE):
+		frappe.db.bulk_insert(
+			"Invoice Ninja Task",
+			fields=[*fields, "creation", "modified", "owner", "modified_by"],
+			values=[
+				(*(task.get(field) for field in fields), now, now, user, user)
+				for task in inserts[start:start + UPDATE_CHUNK_SIZE]
+			],
+		)
+
+
+def _refresh_tasks(updates):
+	"""Write the refreshed fields of existing tasks, one UPDATE per chunk"""
+	names = list(updates)
+	for start in range(0, len(names), UPDATE_CHUNK_SIZE):
+		chunk = names[start:start + UPDATE_CHUNK_SIZE]
+		assignments = []
+		params = []
+		for field in REFRESH_FIELDS:
+			assignments.append(f"`{field}` = CASE name {' '.join(['WHEN %s THEN %s'] * len(chunk))} END")
+			for name in chunk:
+				params += [name, updates[name].get(field)]
+
+		frappe.db.sql(f"""
+			UPDATE `tabInvoice Ninja Task`
+			SET {", ".join(assignments)}, modified = %s
+			WHERE name IN ({_placeholders(chunk)})
+		""", (*params, now_datetime(), *chunk))
+
+
+def _get_names_by_invoice_ninja_id(doctype, id_field, invoice_ninja_ids):
+	"""Map Invoice Ninja IDs to document names with one query"""
+	invoice_ninja_ids = [str(i) for i in invoice_ninja_ids if i]
+	if not invoice_ninja_ids:
+		return {}
+
+	return dict(frappe.get_all(
+		doctype,
+		filters={id_field: ["in", invoice_ninja_ids]},
+		fields=[id_field, "name"],
+		as_list=True,
+	))
+
+
+def _placeholders(values):
+	return ", ".join(["%s"] * len(values))
@@ -0,0 +1,129 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.utils.adaptive_scheduler import (
+	DEFAULT_INTERVAL,
+	MAX_INTERVAL,
+	MAX_POLLS_PER_TICK,
+	MIN_INTERVAL,
+	TARGET_CHANGES_PER_POLL,
+	AdaptivePollScheduler,
+	run_poll,
+)
+from invoice_ninja_integration.utils.sync_scheduler import NODE_TIMEOUT
+
+
+NOW = 1_000_000
+
+# Customer and Sales Invoice sync enabled, plus the reference data types
+SETTINGS = frappe._dict({"enable_customer_sync": 1, "enable_invoice_sync": 1})
+
+
+class TestNextInterval(FrappeTestCase):
+	def test_first_poll_aims_for_the_target_changes(self):
+		state = {"interval": DEFAULT_INTERVAL, "change_rate": None}
+		change_rate, interval = AdaptivePollScheduler.next_interval(state, 100, 3600, True)
+		self.assertAlmostEqual(change_rate, 100 / 3600)
+		self.assertEqual(interval, int(TARGET_CHANGES_PER_POLL / change_rate))
+
+	def test_change_rate_is_a_moving_average(self):
+		state = {"interval": DEFAULT_INTERVAL, "change_rate": 0.1}
+		change_rate, _interval = AdaptivePollScheduler.next_interval(state, 0, 1000, True)
+		self.assertAlmostEqual(change_rate, 0.07)
+
+	def test_idle_pair_backs_off_up_to_a_day(self):
+		state = {"interval": DEFAULT_INTERVAL, "change_rate": 0.0}
+		self.assertEqual(AdaptivePollScheduler.next_interval(state, 0, 3600, True)[1], DEFAULT_INTERVAL * 2)
+
+		state["interval"] = MAX_INTERVAL
+		self.assertEqual(AdaptivePollScheduler.next_interval(state, 0, 3600, True)[1], MAX_INTERVAL)
+
+	def test_busy_pair_is_polled_at_the_minimum_interval(self):
+		state = {"interval": DEFAULT_INTERVAL, "change_rate": None}
+		self.assertEqual(AdaptivePollScheduler.next_interval(state, 5000, 600, True)[1], MIN_INTERVAL)
+
+	def test_pair_behind_is_polled_again_soon(self):
+		state = {"interval": MAX_INTERVAL, "change_rate": 0.0}
+		self.assertEqual(AdaptivePollScheduler.next_interval(state, 1, 3600, False)[1], MIN_INTERVAL)
+
+
+class TestGetDuePolls(FrappeTestCase):
+	def get_due_polls(self, companies, states):
+		def get_state(company, entity_type):
+			return {
+				"interval": 100,
+				"next_due": NOW + 100,
+				"dispatched_at": None,
+				**states.get((company, entity_type), {}),
+			}
+
+		with (
+			patch.object(AdaptivePollScheduler, "get_state", side_effect=get_state),
+			patch("frappe.get_single", return_value=SETTINGS),
+			patch("frappe.get_all", return_value=companies),
+		):
+			return AdaptivePollScheduler.get_due_polls(NOW)
+
+	def test_companies_take_turns_most_overdue_first(self):
+		states = {
+			("A", "Customer"): {"next_due": NOW - 100},
+			("A", "Sales Invoice"): {"next_due": NOW - 1000},
+			("A", "Tax Rate"): {"next_due": NOW - 50},
+			("B", "Customer"): {"next_due": NOW - 10},
+			# Dispatched a minute ago and still running
+			("D", "Sales Invoice"): {"next_due": NOW - 1000, "dispatched_at": NOW - 60},
+			# Dispatched job presumed lost
+			("D", "Customer"): {"next_due": NOW - 10, "dispatched_at": NOW - NODE_TIMEOUT - 1},
+		}
+
+		self.assertEqual(
+			self.get_due_polls(["A", "B", "C", "D"], states),
+			[("A", "Sales Invoice"), ("B", "Customer"), ("D", "Customer"), ("A", "Customer")],
+		)
+
+	def test_overdue_is_relative_to_the_interval(self):
+		states = {
+			("A", "Customer"): {"next_due": NOW - 1000, "interval": 10_000},
+			("A", "Sales Invoice"): {"next_due": NOW - 500, "interval": 100},
+			("A", "Tax Rate"): {"next_due": NOW - 50, "interval": 100},
+		}
+
+		self.assertEqual(
+			self.get_due_polls(["A"], states), [("A", "Sales Invoice"), ("A", "Tax Rate")]
+		)
+
+	def test_tick_is_capped_after_every_company_got_a_turn(self):
+		companies = [f"Company {i:02d}" for i in range(15)]
+		states = {}
+		for company in companies:
+			states[(company, "Customer")] = {"next_due": NOW - 200}
+			states[(company, "Sales Invoice")] = {"next_due": NOW - 100}
+
+		due = self.get_due_polls(companies, states)
+		self.assertEqual(len(due), MAX_POLLS_PER_TICK)
+		self.assertEqual(due[:15], [(company, "Customer") for company in companies])
+		self.assertEqual(due[15:], [(company, "Sales Invoice") for company in companies[:5]])
+
+
+class TestRunPoll(FrappeTestCase):
+	def test_poll_skipped_while_locked_is_no_longer_dispatched(self):
+		cache = MagicMock()
+		cache.lock.return_value.acquire.return_value = False
+		state = {"interval": 100, "next_due": NOW - 10, "dispatched_at": NOW - 60}
+
+		with (
+			patch("frappe.cache", return_value=cache),
+			patch.object(AdaptivePollScheduler, "get_state", return_value=state),
+			patch.object(AdaptivePollScheduler, "save_state") as save_state,
+			patch("invoice_ninja_integration.api.sync_company_entities") as sync_company_entities,
+		):
+			run_poll("A", "Customer")
+
+		sync_company_entities.assert_not_called()
+		save_state.assert_called_once_with("A", "Customer", {**state, "dispatched_at": None})
+		self.assertEqual(state["next_due"], NOW - 10)
@@ -0,0 +1,99 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.model.document import Document
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.api import sync_customer_from_invoice_ninja
+from invoice_ninja_integration.utils.change_set import get_change_set
+from invoice_ninja_integration.utils.field_mapper import FieldMapper
+from invoice_ninja_integration.utils.sync_hash import SyncHashManager
+
+
+CUSTOMER = {
+	"doctype": "Customer",
+	"customer_name": "Acme Ltd",
+	"website": "https://acme.test",
+	"tax_id": "GB123",
+}
+
+
+class TestChangeSet(FrappeTestCase):
+	def test_unknown_stored_hashes_mean_a_full_update(self):
+		field_hashes = SyncHashManager.calculate_field_hashes(CUSTOMER)
+		self.assertIsNone(get_change_set(None, field_hashes))
+		self.assertIsNone(get_change_set({}, field_hashes))
+
+	def test_unchanged_data_has_an_empty_change_set(self):
+		field_hashes = SyncHashManager.calculate_field_hashes(CUSTOMER)
+		self.assertEqual(get_change_set(field_hashes, SyncHashManager.calculate_field_hashes(CUSTOMER)), [])
+
+	def test_only_changed_fields_are_reported(self):
+		stored = SyncHashManager.calculate_field_hashes(CUSTOMER)
+		field_hashes = SyncHashManager.calculate_field_hashes({**CUSTOMER, "tax_id": "GB456"})
+		self.assertEqual(get_change_set(stored, field_hashes), ["tax_id"])
+
+	def test_newly_mapped_fields_are_changed(self):
+		stored = SyncHashManager.calculate_field_hashes(CUSTOMER)
+		field_hashes = SyncHashManager.calculate_field_hashes({**CUSTOMER, "customer_details": "VIP"})
+		self.assertEqual(get_change_set(stored, field_hashes), ["customer_details"])
+
+	def test_fields_no_longer_mapped_are_left_alone(self):
+		stored = SyncHashManager.calculate_field_hashes(CUSTOMER)
+		field_hashes = SyncHashManager.calculate_field_hashes(
+			{key: value for key, value in CUSTOMER.items() if key != "website"}
+		)
+		self.assertEqual(get_change_set(stored, field_hashes), [])
+
+	def test_doctype_is_not_a_field(self):
+		self.assertNotIn("doctype", SyncHashManager.calculate_field_hashes(CUSTOMER))
+
+
+class TestDirectWriteUpdate(FrappeTestCase):
+	INVOICE_NINJA_ID = "change-set-test-1"
+
+	def setUp(self):
+		self.addCleanup(self.delete_customer)
+
+	def delete_customer(self):
+		name = frappe.db.get_value("Customer", {"invoice_ninja_id": self.INVOICE_NINJA_ID})
+		if name:
+			frappe.delete_doc("Customer", name, force=True, ignore_permissions=True)
+		frappe.db.delete("Invoice Ninja Sync State", {"invoice_ninja_id": self.INVOICE_NINJA_ID})
+		frappe.db.commit()
+
+	def sync(self, doc_data):
+		payload = {
+			"id": self.INVOICE_NINJA_ID,
+			"name": doc_data["customer_name"],
+			"website": doc_data["website"],
+		}
+		mapped = ({**doc_data, "invoice_ninja_id": self.INVOICE_NINJA_ID}, None, None, [])
+		with patch.object(FieldMapper, "map_customer_from_invoice_ninja", return_value=mapped):
+			return sync_customer_from_invoice_ninja(
+				payload, invoice_ninja_company="_Test Invoice Ninja Company"
+			)
+
+	def test_direct_write_field_change_skips_the_save(self):
+		customer = {**CUSTOMER, "customer_name": "_Test Change Set Customer"}
+		self.assertEqual(self.sync(customer), "created")
+
+		name = frappe.db.get_value("Customer", {"invoice_ninja_id": self.INVOICE_NINJA_ID})
+		before = frappe.db.get_value("Customer", name, "*", as_dict=True)
+		versions = {"ref_doctype": "Customer", "docname": name}
+		version_count = frappe.db.count("Version", versions)
+
+		with patch.object(Document, "save") as save:
+			result = self.sync({**customer, "website": "https://acme-ltd.test"})
+
+		self.assertEqual(result, "updated")
+		save.assert_not_called()
+
+		after = frappe.db.get_value("Customer", name, "*", as_dict=True)
+		self.assertEqual(after.website, "https://acme-ltd.test")
+		# set_value only touches the written column and the modified timestamp
+		self.assertEqual({field for field in after if after[field] != before[field]}, {"website", "modified"})
+		self.assertEqual(frappe.db.count("Version", versions), version_count)
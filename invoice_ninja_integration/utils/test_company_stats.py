@@ -0,0 +1,63 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.utils.company_stats import CompanySyncStats
+
+
+class TestCompanySyncStats(FrappeTestCase):
+	def test_counts_are_accumulated_per_counter(self):
+		stats = CompanySyncStats("Acme")
+		stats.add("Customer", 3)
+		stats.add("Customer", 2, "Success")
+		stats.add("Sales Invoice", 1)
+		stats.add("Customer Group", 4)
+
+		self.assertEqual(
+			stats.increments,
+			{"total_synced_records": 10, "customers_synced": 5, "invoices_synced": 1},
+		)
+		self.assertEqual(stats.last_sync_status, "Success")
+
+	def test_failed_syncs_are_counted_once_per_sync(self):
+		stats = CompanySyncStats("Acme")
+		stats.add("Item", 0, "Failed")
+		stats.add("Item", 2, "Partial")
+		stats.add("Payment Entry", 0, "Failed")
+
+		self.assertEqual(stats.increments["failed_syncs_count"], 2)
+		self.assertEqual(stats.last_sync_status, "Failed")
+
+	def test_flush_without_changes_writes_nothing(self):
+		stats = CompanySyncStats("Acme")
+		stats.add("Customer", 0)
+
+		with patch("frappe.db.sql") as sql:
+			stats.flush()
+
+		sql.assert_not_called()
+
+	def test_flush_increments_in_one_update_and_resets(self):
+		stats = CompanySyncStats("Acme")
+		stats.add("Customer", 3)
+		stats.add("Item", 0, "Partial")
+
+		with patch("frappe.db.sql") as sql:
+			stats.flush()
+
+		sql.assert_called_once()
+		query, values = sql.call_args.args
+		self.assertIn("`customers_synced` = COALESCE(`customers_synced`, 0) + %(customers_synced)s", query)
+		self.assertIn("`total_synced_records` = COALESCE(`total_synced_records`, 0)", query)
+		self.assertNotIn("items_synced", query)
+		self.assertIn("last_sync_status = %(last_sync_status)s", query)
+		self.assertEqual(values["name"], "Acme")
+		self.assertEqual(values["customers_synced"], 3)
+		self.assertEqual(values["total_synced_records"], 3)
+		self.assertEqual(values["last_sync_status"], "Partial")
+
+		self.assertEqual(stats.increments, {})
+		self.assertIsNone(stats.last_sync_status)
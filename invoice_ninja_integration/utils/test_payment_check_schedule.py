@@ -0,0 +1,57 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from datetime import datetime, timedelta
+
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.utils.payment_check_schedule import (
+	BASE_INTERVAL,
+	DUE_DATE_INTERVAL,
+	MAX_INTERVAL,
+	RETRY_INTERVAL,
+	next_payment_check,
+)
+
+
+NOW = datetime(2026, 3, 2, 9, 0)
+
+
+class TestNextPaymentCheck(FrappeTestCase):
+	def test_check_without_payment_doubles_the_interval(self):
+		self.assertEqual(next_payment_check(0, now=NOW), (NOW + timedelta(seconds=BASE_INTERVAL * 2), 1))
+		self.assertEqual(next_payment_check(2, now=NOW), (NOW + timedelta(seconds=BASE_INTERVAL * 8), 3))
+
+	def test_interval_is_capped(self):
+		self.assertEqual(next_payment_check(20, now=NOW), (NOW + timedelta(seconds=MAX_INTERVAL), 21))
+
+	def test_found_payment_resets_the_backoff(self):
+		self.assertEqual(
+			next_payment_check(6, found_payment=True, now=NOW), (NOW + timedelta(seconds=BASE_INTERVAL), 0)
+		)
+
+	def test_failed_check_retries_without_raising_the_backoff(self):
+		self.assertEqual(
+			next_payment_check(4, failed=True, now=NOW), (NOW + timedelta(seconds=RETRY_INTERVAL), 4)
+		)
+
+	def test_interval_is_capped_inside_the_due_date_window(self):
+		for due_date in ("2026-02-27", "2026-03-02", "2026-03-05"):
+			next_check, backoff = next_payment_check(5, due_date=due_date, now=NOW)
+			self.assertEqual(next_check, NOW + timedelta(seconds=DUE_DATE_INTERVAL), due_date)
+			self.assertEqual(backoff, 6)
+
+	def test_backoff_never_skips_the_start_of_the_due_date_window(self):
+		# Window starts on 2026-03-09, seven days out; the backoff alone would wait eight days
+		next_check, backoff = next_payment_check(4, due_date="2026-03-12", now=NOW)
+		self.assertEqual(next_check, NOW + timedelta(days=7))
+		self.assertEqual(backoff, 5)
+
+	def test_short_backoff_before_the_window_is_kept(self):
+		next_check, _backoff = next_payment_check(0, due_date="2026-03-12", now=NOW)
+		self.assertEqual(next_check, NOW + timedelta(seconds=BASE_INTERVAL * 2))
+
+	def test_long_overdue_invoices_back_off_normally(self):
+		next_check, backoff = next_payment_check(2, due_date="2025-12-01", now=NOW)
+		self.assertEqual(next_check, NOW + timedelta(seconds=BASE_INTERVAL * 8))
+		self.assertEqual(backoff, 3)
@@ -0,0 +1,91 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.utils.sync_hash import CURRENT_SCHEME, SCHEMES, SyncHashManager
+
+
+CUSTOMER = {
+	"doctype": "Customer",
+	"customer_name": "Acme Ltd",
+	"customer_type": "Company",
+	"email_id": "billing@acme.test",
+	"website": "https://acme.test",
+}
+
+INVOICE = {
+	"customer": "Acme Ltd",
+	"grand_total": 150.0,
+	"items": [
+		{"item_code": "CONSULTING", "qty": 1, "rate": 100.0, "amount": 100.0, "description": "Ignored"},
+		{"item_code": "SUPPORT", "qty": 2, "rate": 25.0, "amount": 50.0},
+	],
+}
+
+
+class TestSyncHashManager(FrappeTestCase):
+	def test_hash_is_versioned_with_the_pinned_scheme(self):
+		self.assertEqual(CURRENT_SCHEME, "2b")
+		hash_value = SyncHashManager.calculate_hash(CUSTOMER, "Customer")
+		self.assertTrue(hash_value.startswith("2b:"))
+		self.assertLessEqual(len(hash_value), 32)
+
+	def test_hash_ignores_untracked_fields_and_key_order(self):
+		reordered = dict(reversed(list(CUSTOMER.items())))
+		self.assertEqual(
+			SyncHashManager.calculate_hash(CUSTOMER, "Customer"),
+			SyncHashManager.calculate_hash({**reordered, "customer_details": "Not tracked"}, "Customer"),
+		)
+
+	def test_hash_covers_tracked_child_row_keys_only(self):
+		base = SyncHashManager.calculate_hash(INVOICE, "Sales Invoice")
+
+		items = [dict(row) for row in INVOICE["items"]]
+		items[0]["description"] = "Changed"
+		self.assertEqual(SyncHashManager.calculate_hash({**INVOICE, "items": items}, "Sales Invoice"), base)
+
+		items[1]["qty"] = 3
+		self.assertNotEqual(
+			SyncHashManager.calculate_hash({**INVOICE, "items": items}, "Sales Invoice"), base
+		)
+
+	def test_compare_same_scheme(self):
+		stored = SyncHashManager.calculate_hash(CUSTOMER, "Customer")
+		changed = {**CUSTOMER, "email_id": "accounts@acme.test"}
+
+		self.assertEqual(SyncHashManager.compare(stored, stored, CUSTOMER, "Customer"), (True, False))
+		self.assertEqual(
+			SyncHashManager.compare(
+				stored, SyncHashManager.calculate_hash(changed, "Customer"), changed, "Customer"
+			),
+			(False, False),
+		)
+		self.assertEqual(SyncHashManager.compare(None, stored, CUSTOMER, "Customer"), (False, False))
+
+	def test_compare_migrates_legacy_hash_of_unchanged_data(self):
+		legacy = SyncHashManager.calculate_legacy_hash(INVOICE, "Sales Invoice")
+		self.assertEqual(SyncHashManager.get_scheme(legacy), "1")
+
+		new_hash = SyncHashManager.calculate_hash(INVOICE, "Sales Invoice")
+		self.assertEqual(SyncHashManager.compare(legacy, new_hash, INVOICE, "Sales Invoice"), (True, True))
+
+	def test_compare_reports_changed_data_behind_legacy_hash(self):
+		legacy = SyncHashManager.calculate_legacy_hash(INVOICE, "Sales Invoice")
+		changed = {**INVOICE, "grand_total": 175.0}
+
+		new_hash = SyncHashManager.calculate_hash(changed, "Sales Invoice")
+		self.assertEqual(SyncHashManager.compare(legacy, new_hash, changed, "Sales Invoice"), (False, False))
+
+	def test_compare_unknown_scheme_is_a_change(self):
+		new_hash = SyncHashManager.calculate_hash(CUSTOMER, "Customer")
+		self.assertEqual(
+			SyncHashManager.compare("9z:0123456789", new_hash, CUSTOMER, "Customer"), (False, False)
+		)
+
+	def test_every_scheme_freezes_its_tracked_fields(self):
+		for scheme, (_digest, tracked_fields) in SCHEMES.items():
+			for entity_type, fields in tracked_fields.items():
+				self.assertIsInstance(fields, tuple, f"{scheme} {entity_type}")
+
+		self.assertIs(SyncHashManager.TRACKED_FIELDS, SCHEMES[CURRENT_SCHEME][1])
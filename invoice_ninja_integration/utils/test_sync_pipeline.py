@@ -0,0 +1,100 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import threading
+import time
+
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.utils.sync_pipeline import SyncPipeline
+
+
+class FakeClient:
+	"""Serves a fixed list of records page by page, with optional per-page delays and failures"""
+
+	def __init__(self, total, delays=None, failing_pages=()):
+		self.records = [{"id": str(i)} for i in range(1, total + 1)]
+		self.delays = delays or {}
+		self.failing_pages = set(failing_pages)
+		self.requested_pages = []
+		self._lock = threading.Lock()
+
+	def get(self, endpoint, params=None, log_errors=True):
+		page, per_page = params["page"], params["per_page"]
+		with self._lock:
+			self.requested_pages.append(page)
+
+		time.sleep(self.delays.get(page, 0))
+		if page in self.failing_pages:
+			return {"error": True, "message": f"Page {page} failed"}
+
+		start = (page - 1) * per_page
+		return {
+			"data": self.records[start:start + per_page],
+			"meta": {"pagination": {"total": len(self.records)}},
+		}
+
+
+class TestSyncPipeline(FrappeTestCase):
+	def run_pipeline(self, client, **kwargs):
+		pipeline = SyncPipeline(client, "Customer", **kwargs)
+		written = []
+		count = pipeline.run(lambda entities: written.extend(e["id"] for e in entities))
+		return pipeline, written, count
+
+	def test_pages_are_written_in_page_order(self):
+		# The first page arrives last
+		client = FakeClient(9, delays={1: 0.2})
+		pipeline, written, count = self.run_pipeline(client, per_page=2, fetch_workers=3)
+
+		self.assertEqual(written, [str(i) for i in range(1, 10)])
+		self.assertEqual(count, 9)
+		self.assertEqual(pipeline.expected_records(), 9)
+		self.assertFalse(pipeline.errors)
+		self.assertFalse(pipeline.exhausted)
+
+	def test_slow_first_page_holds_back_later_fetches(self):
+		client = FakeClient(20, delays={1: 0.3})
+		pipeline = SyncPipeline(client, "Customer", per_page=1, fetch_workers=3, queue_size=2)
+		written = []
+		ahead = []
+
+		def write_page(entities):
+			# Pages fetched but not yet written, including this one
+			ahead.append(len(client.requested_pages) - len(written))
+			written.extend(e["id"] for e in entities)
+
+		pipeline.run(write_page)
+
+		self.assertEqual(written, [str(i) for i in range(1, 21)])
+		self.assertLessEqual(max(ahead), 2)
+
+	def test_max_records_stops_fetching_and_writing(self):
+		client = FakeClient(20)
+		pipeline, written, count = self.run_pipeline(client, per_page=2, max_records=5)
+
+		self.assertEqual(written, ["1", "2", "3", "4", "5"])
+		self.assertEqual(count, 5)
+		self.assertLessEqual(max(client.requested_pages), 3)
+		self.assertEqual(pipeline.expected_records(), 5)
+
+	def test_nothing_after_a_failed_page_is_written(self):
+		client = FakeClient(10, failing_pages={3})
+		pipeline, written, _count = self.run_pipeline(client, per_page=2, fetch_workers=2)
+
+		self.assertEqual(written, ["1", "2", "3", "4"])
+		self.assertEqual([error["page"] for error in pipeline.errors], [3])
+
+	def test_time_budget_exhaustion_stops_after_the_page_in_progress(self):
+		client = FakeClient(10)
+		pipeline = SyncPipeline(client, "Customer", per_page=2, time_budget=0.05)
+		written = []
+
+		def write_page(entities):
+			time.sleep(0.1)
+			written.extend(e["id"] for e in entities)
+
+		pipeline.run(write_page)
+
+		self.assertTrue(pipeline.exhausted)
+		self.assertEqual(written, ["1", "2"])
@@ -0,0 +1,148 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.utils.sync_scheduler import (
+	NODE_TIMEOUT,
+	SyncScheduler,
+	_complete_node,
+	_pending_key,
+	_started_key,
+	_state_key,
+)
+
+
+class FakeCache:
+	"""In-memory stand-in for the few Redis calls of the scheduler"""
+
+	def __init__(self):
+		self.values = {}
+		self.hashes = {}
+
+	def make_key(self, key):
+		return key
+
+	def get_value(self, key):
+		return self.values.get(key)
+
+	def hset(self, key, field, value):
+		self.hashes.setdefault(key, {})[field] = value
+
+	def hgetall(self, key):
+		return dict(self.hashes.get(key, {}))
+
+	def hincrby(self, key, field, amount):
+		fields = self.hashes.setdefault(key, {})
+		fields[field] = fields.get(field, 0) + amount
+		return fields[field]
+
+
+class TestBuildGraph(FrappeTestCase):
+	def test_reference_data_is_always_synced_first(self):
+		graph = SyncScheduler.build_graph(["A"], ["Customer", "Item", "Sales Invoice"])
+
+		self.assertEqual(
+			graph,
+			{
+				"A::Customer Group": [],
+				"A::Tax Rate": [],
+				"A::Customer": [],
+				"A::Item": [],
+				"A::Sales Invoice": ["A::Customer", "A::Item", "A::Tax Rate"],
+			},
+		)
+
+	def test_prerequisites_outside_the_run_are_not_waited_on(self):
+		graph = SyncScheduler.build_graph(["A"], ["Payment Entry", "Quotation"])
+
+		self.assertEqual(graph["A::Payment Entry"], [])
+		self.assertEqual(graph["A::Quotation"], ["A::Tax Rate"])
+
+	def test_companies_only_depend_on_their_own_nodes(self):
+		graph = SyncScheduler.build_graph(["A", "B"], ["Customer", "Sales Invoice", "Payment Entry"])
+
+		self.assertEqual(len(graph), 2 * 5)
+		for node, prerequisites in graph.items():
+			company = node.split("::")[0]
+			self.assertTrue(all(p.startswith(f"{company}::") for p in prerequisites), node)
+		self.assertEqual(graph["B::Payment Entry"], ["B::Sales Invoice"])
+
+	def test_graph_is_acyclic(self):
+		graph = SyncScheduler.build_graph(
+			["A"], ["Customer", "Item", "Sales Invoice", "Quotation", "Payment Entry"]
+		)
+
+		done = set()
+		while len(done) < len(graph):
+			ready = [
+				node for node, prerequisites in graph.items()
+				if node not in done and set(prerequisites) <= done
+			]
+			self.assertTrue(ready, f"Cycle among {set(graph) - done}")
+			done.update(ready)
+
+	def test_unknown_entity_type_is_rejected(self):
+		with self.assertRaises(frappe.ValidationError):
+			SyncScheduler.build_graph(["A"], ["Customer", "Timesheet"])
+
+
+class TestRunStatus(FrappeTestCase):
+	def setUp(self):
+		graph = SyncScheduler.build_graph(["A"], ["Customer", "Item", "Sales Invoice"])
+		dependents = {node: [] for node in graph}
+		for node, prerequisites in graph.items():
+			for prerequisite in prerequisites:
+				dependents[prerequisite].append(node)
+
+		self.cache = FakeCache()
+		cache_patcher = patch("frappe.cache", return_value=self.cache)
+		cache_patcher.start()
+		self.addCleanup(cache_patcher.stop)
+
+		self.cache.values[_state_key("run")] = {
+			"invoice_ninja_companies": ["A"],
+			"graph": graph,
+			"dependents": dependents,
+			"started_at": "2026-10-19 12:00:00",
+		}
+		pending = self.cache.hashes.setdefault(_pending_key("run"), {"__remaining__": len(graph)})
+		pending.update({node: len(prerequisites) for node, prerequisites in graph.items()})
+
+		# Everything finished except the Item node, whose job was killed
+		for node in ("A::Customer Group", "A::Tax Rate", "A::Customer"):
+			self.complete(node, {"success": True, "synced_count": 2})
+
+	def complete(self, node, result):
+		_complete_node("run", node, self.cache.values[_state_key("run")], result)
+
+	def get_run_status(self):
+		with patch("invoice_ninja_integration.utils.sync_scheduler._enqueue_node") as enqueue_node:
+			return SyncScheduler.get_run_status("run"), enqueue_node
+
+	def test_running_node_keeps_the_run_in_progress(self):
+		self.cache.hset(_started_key("run"), "A::Item", time.time() - 60)
+
+		status, enqueue_node = self.get_run_status()
+
+		self.assertEqual(status["status"], "In Progress")
+		self.assertEqual(status["completed"], 3)
+		enqueue_node.assert_not_called()
+
+	def test_timed_out_node_fails_and_releases_its_dependents(self):
+		self.cache.hset(_started_key("run"), "A::Item", time.time() - NODE_TIMEOUT - 1)
+
+		status, enqueue_node = self.get_run_status()
+
+		self.assertEqual(status["failed_nodes"], ["A::Item"])
+		self.assertEqual(status["completed"], 4)
+		enqueue_node.assert_called_once()
+		self.assertEqual(enqueue_node.call_args.args[1], "A::Sales Invoice")
+
+		# The killed job's late result, if any, is ignored
+		self.complete("A::Item", {"success": True})
+		self.assertEqual(self.get_run_status()[0]["failed_nodes"], ["A::Item"])
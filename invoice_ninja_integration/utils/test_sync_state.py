@@ -0,0 +1,37 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from invoice_ninja_integration.utils.sync_state import SyncStateStore
+
+
+class TestSyncStateFailures(FrappeTestCase):
+	def preloaded_store(self, rows):
+		store = SyncStateStore("Acme", "Customer")
+		with patch("frappe.get_all", return_value=[frappe._dict(row) for row in rows]):
+			store.preload([{"id": row["invoice_ninja_id"]} for row in rows])
+		return store
+
+	def test_failed_attempts_are_counted_from_the_stored_state(self):
+		store = self.preloaded_store([
+			{"name": "s1", "invoice_ninja_id": "1", "document_name": "CUST-1", "failed_attempts": 2},
+		])
+
+		self.assertEqual(store.record_failure("1"), 3)
+		self.assertEqual(store.record_failure("2"), 1)
+		self.assertEqual(store.record_failure("2"), 2)
+		self.assertEqual(store.get("1").document_name, "CUST-1")
+
+	def test_successful_sync_resets_the_failed_attempts(self):
+		store = self.preloaded_store([
+			{"name": "s1", "invoice_ninja_id": "1", "document_name": "CUST-1", "failed_attempts": 2},
+		])
+
+		store.record_synced({"id": "1", "updated_at": 1700000000})
+
+		self.assertEqual(store.get("1").failed_attempts, 0)
+		self.assertEqual(store.record_failure("1"), 1)
@@ -0,0 +1,150 @@
+"""
+Deletion and archive propagation for Invoice Ninja Integration
+
+Invoice Ninja soft-deletes and archives records instead of removing them, so
+delta fetches request every state (see DELTA_FILTERS) and each fetched page is
+applied to ERPNext with a single UPDATE. Records that were purged in Invoice
+Ninja are never returned again; the reconciliation sweep finds them by ID and
+tombstones them in bulk.
+
+Tombstoned records keep their data and are only flagged through
+invoice_ninja_sync_status (and disabled for master data), because submitted
+documents can only be cancelled through their own ledger-reversing workflow.
+"""
+
+import frappe
+
+
+# List filters for delta fetches: include archived and deleted records
+DELTA_FILTERS = {"status": "active,archived,deleted"}
+
+# Remote state -> invoice_ninja_sync_status value
+REMOTE_STATE_STATUS = {
+	"archived": "Archived in Invoice Ninja",
+	"deleted": "Deleted in Invoice Ninja",
+}
+
+TOMBSTONE_STATUSES = tuple(REMOTE_STATE_STATUS.values())
+
+# Master data is disabled when it is deleted in Invoice Ninja, and re-enabled when restored
+DISABLE_ON_DELETE = {
+	"Customer": "disabled",
+	"Item": "disabled",
+}
+
+# Maximum IDs per tombstone UPDATE
+SWEEP_CHUNK_SIZE = 1000
+
+
+def get_remote_state(entity):
+	"""
+	Get the lifecycle state of an Invoice Ninja entity
+
+	Returns:
+		str: "deleted", "archived" or "active"
+	"""
+	if entity.get("is_deleted"):
+		return "deleted"
+	if entity.get("archived_at"):
+		return "archived"
+	return "active"
+
+
+def apply_remote_states(entity_type, entities, invoice_ninja_company):
+	"""
+	Apply the archive/delete state of a page of entities in one UPDATE
+
+	Records that are active again in Invoice Ninja are restored if they were tombstoned.
+
+	Args:
+		entity_type: ERPNext doctype (Customer, Sales Invoice, ...)
+		entities: Invoice Ninja entity dicts of one page
+		invoice_ninja_company: Name of Invoice Ninja Company doc
+
+	Returns:
+		dict: {"archived": int, "deleted": int} entities of the page in each state
+	"""
+	ids_by_state = {"active": [], "archived": [], "deleted": []}
+	for entity in entities:
+		if entity.get("id"):
+			ids_by_state[get_remote_state(entity)].append(str(entity["id"]))
+
+	counts = {"archived": len(ids_by_state["archived"]), "deleted": len(ids_by_state["deleted"])}
+	if not (counts["archived"] or counts["deleted"] or ids_by_state["active"]):
+		return counts
+
+	set_params = []
+	status_cases = []
+	for state in ("deleted", "archived"):
+		if ids_by_state[state]:
+			status_cases.append(f"WHEN invoice_ninja_id IN ({_placeholders(ids_by_state[state])}) THEN %s")
+			set_params += ids_by_state[state] + [REMOTE_STATE_STATUS[state]]
+
+	if status_cases:
+		assignments = [f"invoice_ninja_sync_status = CASE {' '.join(status_cases)} ELSE 'Synced' END"]
+	else:
+		assignments = ["invoice_ninja_sync_status = 'Synced'"]
+
+	disable_field = DISABLE_ON_DELETE.get(entity_type)
+	if disable_field:
+		disable_cases = []
+		for state, value in (("deleted", 1), ("active", 0)):
+			if ids_by_state[state]:
+				disable_cases.append(f"WHEN invoice_ninja_id IN ({_placeholders(ids_by_state[state])}) THEN {value}")
+				set_params += ids_by_state[state]
+		if disable_cases:
+			assignments.append(f"`{disable_field}` = CASE {' '.join(disable_cases)} ELSE `{disable_field}` END")
+
+	tombstoned = ids_by_state["deleted"] + ids_by_state["archived"]
+	where = []
+	where_params = [invoice_ninja_company]
+	if tombstoned:
+		where.append(f"invoice_ninja_id IN ({_placeholders(tombstoned)})")
+		where_params += tombstoned
+	if ids_by_state["active"]:
+		where.append(
+			f"(invoice_ninja_id IN ({_placeholders(ids_by_state['active'])}) "
+			f"AND invoice_ninja_sync_status IN ({_placeholders(TOMBSTONE_STATUSES)}))"
+		)
+		where_params += ids_by_state["active"] + list(TOMBSTONE_STATUSES)
+
+	frappe.db.sql(f"""
+		UPDATE `tab{entity_type}`
+		SET {", ".join(assignments)}
+		WHERE invoice_ninja_company = %s
+		AND ({" OR ".join(where)})
+	""", (*set_params, *where_params))
+
+	return counts
+
+
+def mark_deleted(entity_type, invoice_ninja_ids, invoice_ninja_company=None):
+	"""
+	Tombstone records deleted or purged in Invoice Ninja, in chunks
+
+	Args:
+		entity_type: ERPNext doctype (Customer, Sales Invoice, ...)
+		invoice_ninja_ids: Invoice Ninja IDs to tombstone
+		invoice_ninja_company: Restrict to this Invoice Ninja Company doc (optional)
+	"""
+	disable_field = DISABLE_ON_DELETE.get(entity_type)
+	assignments = "invoice_ninja_sync_status = %s"
+	if disable_field:
+		assignments += f", `{disable_field}` = 1"
+
+	company_condition = "AND invoice_ninja_company = %s" if invoice_ninja_company else ""
+	company_params = (invoice_ninja_company,) if invoice_ninja_company else ()
+
+	invoice_ninja_ids = [str(i) for i in invoice_ninja_ids]
+	for start in range(0, len(invoice_ninja_ids), SWEEP_CHUNK_SIZE):
+		chunk = invoice_ninja_ids[start:start + SWEEP_CHUNK_SIZE]
+		frappe.db.sql(f"""
+			UPDATE `tab{entity_type}`
+			SET {assignments}
+			WHERE invoice_ninja_id IN ({_placeholders(chunk)})
+			{company_condition}
+		""", (REMOTE_STATE_STATUS["deleted"], *chunk, *company_params))
+
+
+def _placeholders(values):
+	return ", ".join(["%s"] * len(values))
@@ -10,6 +10,8 @@ import hmac
 import hashlib
 from frappe.utils import now
 
+from invoice_ninja_integration.utils.tombstones import mark_deleted
+
 
 @frappe.whitelist()
 def handle_webhook():
@@ -317,13 +319,7 @@ def process_customer_webhook(
 			)
 
 			if existing:
-				frappe.db.set_value(
-					"Customer", existing, "disabled", 1
-				)
-				frappe.db.set_value(
-					"Customer", existing, "sync_status",
-					"Deleted in Invoice Ninja"
-				)
+				mark_deleted("Customer", [customer_id])
 				return {
 					"status": "success",
 					"action": "deleted",
@@ -377,10 +373,7 @@ def process_invoice_webhook(
 			)
 
 			if existing:
-				frappe.db.set_value(
-					"Sales Invoice", existing, "sync_status",
-					"Deleted in Invoice Ninja"
-				)
+				mark_deleted("Sales Invoice", [invoice_id])
 				return {
 					"status": "success",
 					"action": "deleted",
@@ -433,10 +426,7 @@ def process_quote_webhook(
 			)
 
 			if existing:
-				frappe.db.set_value(
-					"Quotation", existing, "sync_status",
-					"Deleted in Invoice Ninja"
-				)
+				mark_deleted("Quotation", [quote_id])
 				return {
 					"status": "success",
 					"action": "deleted",
@@ -489,13 +479,7 @@ def process_product_webhook(
 			)
 
 			if existing:
-				frappe.db.set_value(
-					"Item", existing, "disabled", 1
-				)
-				frappe.db.set_value(
-					"Item", existing, "sync_status",
-					"Deleted in Invoice Ninja"
-				)
+				mark_deleted("Item", [product_id])
 				return {
 					"status": "success",
 					"action": "deleted",
@@ -549,10 +533,7 @@ def process_payment_webhook(
 			)
 
 			if existing:
-				frappe.db.set_value(
-					"Payment Entry", existing, "sync_status",
-					"Deleted in Invoice Ninja"
-				)
+				mark_deleted("Payment Entry", [payment_id])
 				return {
 					"status": "success",
 					"action": "deleted",